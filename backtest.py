@@ -1,7 +1,11 @@
 # backtest.py
+import math
 import numpy as np
 import pandas as pd
-from utils import calmar_ratio, cagr_from_equity, max_drawdown, sharpe_ratio, sortino_ratio
+from utils import compute_all_metrics
+from profiling import stage
+from ledger import (TradeLedger, finalize_trades, EXIT_REASONS, LONG, SHORT,
+                    EXIT_SL, EXIT_TP, EXIT_SIGNAL, EXIT_FORCED)
 
 # --- Parámetros globales del backtest ---
 TX_FEE = 0.00125             # 0.125% por lado
@@ -9,13 +13,403 @@ INITIAL_CASH = 100_000.0
 MAX_NOTIONAL = 1_000_000.0
 MIN_QTY = 0.1                 # mínimo de BTC por trade
 
+# Motores disponibles: "numpy" (arreglos contiguos) y "pandas" (referencia con .iloc)
+ENGINES = ("numpy", "pandas")
+DEFAULT_ENGINE = "numpy"
+
 def backtest(df: pd.DataFrame, sl: float, tp: float, n_shares: float,
-             tx_fee: float = TX_FEE, initial_cash: float = INITIAL_CASH):
+             tx_fee: float = TX_FEE, initial_cash: float = INITIAL_CASH,
+             engine: str = DEFAULT_ENGINE, return_trades: bool = False, resolver=None):
     """
     Backtest sin apalancamiento. 1 posición a la vez (long/short).
     - sl,tp proporciones (0.01=1%).
     - n_shares es objetivo; se recorta dinámicamente por caja y tope de nocional.
     - Cierre por SL/TP y por señal contraria.
+    - engine: "numpy" (por defecto) o "pandas"; ambos dan equity y métricas idénticas.
+    - return_trades=True devuelve además el ledger de operaciones (solo motor numpy).
+    - resolver (intrabar.IntrabarResolver): si una vela cruza SL y TP, decide con velas finas
+      cuál se tocó primero (sin él se asume SL). Agrega a las métricas las estadísticas de bajada.
+    """
+    if engine == "pandas":
+        if return_trades or resolver is not None:
+            raise ValueError("return_trades/resolver requieren engine='numpy'")
+        return _backtest_pandas(df, sl, tp, n_shares, tx_fee=tx_fee, initial_cash=initial_cash)
+    if engine != "numpy":
+        raise ValueError(f"engine debe ser uno de {ENGINES}")
+
+    # Extraer columnas una sola vez como arreglos contiguos
+    high  = np.ascontiguousarray(df["High"].to_numpy(dtype=np.float64))
+    low   = np.ascontiguousarray(df["Low"].to_numpy(dtype=np.float64))
+    close = np.ascontiguousarray(df["Close"].to_numpy(dtype=np.float64))
+    buy   = np.ascontiguousarray(df["BUY_SIG"].to_numpy(dtype=bool))
+    sell  = np.ascontiguousarray(df["SELL_SIG"].to_numpy(dtype=bool))
+
+    with stage("backtest.kernel"):
+        before = resolver.stats() if resolver is not None else None
+        equity_arr, trades = _run_kernel(high, low, close, buy, sell,
+                                         sl, tp, n_shares, tx_fee, initial_cash,
+                                         _bar_times(df.index, resolver), resolver)
+    equity = pd.Series(equity_arr, index=df.index, name="Equity")
+    with stage("backtest.metrics"):
+        metrics = _build_metrics(equity, trades["pnl"])
+        if resolver is not None:
+            metrics.update(_drilldown_metrics(before, resolver.stats()))
+    if return_trades:
+        return equity, metrics, finalize_trades(trades, df.index, high, low)
+    return equity, metrics
+
+def backtest_arrays(df: pd.DataFrame, sig, sl: float, tp: float, n_shares: float,
+                    tx_fee: float = TX_FEE, initial_cash: float = INITIAL_CASH,
+                    lo: int = 0, hi: int = None, return_trades: bool = False, resolver=None):
+    """
+    Backtest directo sobre un SignalArrays (signals.compute_signal_arrays): sin copia dropna
+    ni columnas BUY_SIG/SELL_SIG. Las señales empiezan en la fila sig.start de df;
+    lo/hi recortan el tramo (en posiciones relativas a sig.start). Idéntico a backtest().
+    """
+    n_sig = len(sig.buy)
+    hi = n_sig if hi is None else min(hi, n_sig)
+    a, b = sig.start + lo, sig.start + hi
+
+    high  = df["High"].to_numpy(dtype=np.float64)[a:b]
+    low   = df["Low"].to_numpy(dtype=np.float64)[a:b]
+    close = df["Close"].to_numpy(dtype=np.float64)[a:b]
+
+    with stage("backtest.kernel"):
+        before = resolver.stats() if resolver is not None else None
+        equity_arr, trades = _run_kernel(high, low, close, sig.buy[lo:hi], sig.sell[lo:hi],
+                                         sl, tp, n_shares, tx_fee, initial_cash,
+                                         _bar_times(df.index[a:b], resolver), resolver)
+    equity = pd.Series(equity_arr, index=df.index[a:b], name="Equity")
+    with stage("backtest.metrics"):
+        metrics = _build_metrics(equity, trades["pnl"])
+        if resolver is not None:
+            metrics.update(_drilldown_metrics(before, resolver.stats()))
+    if return_trades:
+        # entry_idx/exit_idx relativos a la equity devuelta
+        return equity, metrics, finalize_trades(trades, equity.index, high, low)
+    return equity, metrics
+
+def step_bar(i: int, high: float, low: float, close: float, buy: bool, sell: bool,
+             cash: float, shares: float, entry_price, entry_i: int,
+             sl: float, tp: float, n_shares: float, tx_fee: float, ledger: TradeLedger,
+             t: int = None, resolver=None, on_fill=None):
+    """
+    Una vela de la máquina de estados long/short: SL/TP, cierre por señal contraria y apertura.
+    Es el único paso que usan _run_kernel (backtest) y paper.PaperAccount (vela a vela), con el
+    mismo orden de operaciones en punto flotante que _backtest_pandas.
+    - Las salidas se registran en ledger con posición i; on_fill(i, acción, qty, precio, motivo, caja)
+      se llama en cada salida y apertura si se da.
+    - Con resolver (y t = apertura de la vela en ns UTC), una vela que cruza SL y TP se resuelve
+      con velas finas.
+    Devuelve el estado nuevo (cash, shares, entry_price, entry_i); la equity es cash + shares * close.
+    """
+    closed_by_sl_tp = False
+
+    # ===== CIERRE por SL/TP =====
+    if shares != 0 and entry_price is not None:
+        if shares > 0:  # LONG
+            sl_price = entry_price * (1 - sl)
+            tp_price = entry_price * (1 + tp)
+            exit_price = None
+            if low <= sl_price:
+                exit_price = sl_price
+                if resolver is not None and high >= tp_price \
+                        and not resolver.sl_first(t, LONG, sl_price, tp_price):
+                    exit_price = tp_price
+            elif high >= tp_price:
+                exit_price = tp_price
+            if exit_price is not None:
+                cash = close_position(i, exit_price, EXIT_SL if exit_price == sl_price else EXIT_TP,
+                                      cash, shares, entry_price, entry_i, tx_fee, ledger, on_fill)
+                shares = 0.0
+                entry_price = None
+                closed_by_sl_tp = True
+        else:  # SHORT
+            sl_price = entry_price * (1 + sl)
+            tp_price = entry_price * (1 - tp)
+            exit_price = None
+            if high >= sl_price:
+                exit_price = sl_price
+                if resolver is not None and low <= tp_price \
+                        and not resolver.sl_first(t, SHORT, sl_price, tp_price):
+                    exit_price = tp_price
+            elif low <= tp_price:
+                exit_price = tp_price
+            if exit_price is not None:
+                cash = close_position(i, exit_price, EXIT_SL if exit_price == sl_price else EXIT_TP,
+                                      cash, shares, entry_price, entry_i, tx_fee, ledger, on_fill)
+                shares = 0.0
+                entry_price = None
+                closed_by_sl_tp = True
+
+    # ===== CIERRE por SEÑAL CONTRARIA =====
+    if entry_price is not None and not closed_by_sl_tp \
+            and ((shares > 0 and sell) or (shares < 0 and buy)):
+        cash = close_position(i, close, EXIT_SIGNAL, cash, shares, entry_price, entry_i,
+                              tx_fee, ledger, on_fill)
+        shares = 0.0
+        entry_price = None
+
+    # ===== APERTURAS (dinámicas, sin apalancamiento) =====
+    if shares == 0 and (buy or sell):
+        max_qty_by_notional = MAX_NOTIONAL / close
+        max_qty_by_cash = cash / (close * (1 + tx_fee))     # sin posición abierta: equity = caja
+        qty = min(n_shares, max_qty_by_cash, max_qty_by_notional)
+        qty = math.floor(qty * 1e6) / 1e6
+        if qty >= MIN_QTY:
+            if buy:
+                cash -= close * qty * (1 + tx_fee)
+                shares = qty
+            else:
+                cash += close * qty * (1 - tx_fee)
+                shares = -qty
+            entry_price = close
+            entry_i = i
+            if on_fill is not None:
+                on_fill(i, "BUY" if buy else "SELL", qty, close,
+                        "open_long" if buy else "open_short", cash)
+
+    return cash, shares, entry_price, entry_i
+
+def close_position(i: int, exit_price: float, reason: int, cash: float, shares: float,
+                   entry_price: float, entry_i: int, tx_fee: float, ledger: TradeLedger,
+                   on_fill=None) -> float:
+    """Cierra la posición (long si shares > 0) a exit_price, la registra en ledger y devuelve la caja."""
+    qty = abs(shares)
+    if shares > 0:
+        side = LONG
+        cash += exit_price * qty * (1 - tx_fee)
+        pnl = (exit_price - entry_price) * qty \
+              - exit_price * qty * tx_fee - entry_price * qty * tx_fee
+    else:
+        side = SHORT
+        cash -= exit_price * qty * (1 + tx_fee)
+        pnl = (entry_price - exit_price) * qty \
+              - exit_price * qty * tx_fee - entry_price * qty * tx_fee
+    ledger.add(entry_i, i, side, qty, entry_price, exit_price,
+               (exit_price + entry_price) * qty * tx_fee, pnl, reason)
+    if on_fill is not None:
+        on_fill(i, "SELL" if side == LONG else "BUY", qty, exit_price, EXIT_REASONS[reason], cash)
+    return cash
+
+def _run_kernel(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                buy: np.ndarray, sell: np.ndarray,
+                sl: float, tp: float, n_shares: float,
+                tx_fee: float, initial_cash: float,
+                times: np.ndarray = None, resolver=None):
+    """
+    step_bar sobre arreglos NumPy, escribiendo la equity en un buffer preasignado.
+    Devuelve (equity, trades), con trades un arreglo estructurado ledger.TRADE_DTYPE
+    (sin timestamps ni MAE/MFE). Con resolver, times = apertura de cada vela en ns.
+    """
+    n = len(close)
+    equity = np.empty(n, dtype=np.float64)
+    ledger = TradeLedger()
+
+    cash = initial_cash
+    shares = 0.0
+    entry_price = None
+    entry_i = -1
+
+    # El acceso escalar a listas de Python es mucho más barato que arr[i] o .iloc[i]
+    highs, lows, closes = high.tolist(), low.tolist(), close.tolist()
+    buys, sells = buy.tolist(), sell.tolist()
+    ts = times.tolist() if resolver is not None else None
+
+    for i in range(n):
+        if shares == 0 and not buys[i] and not sells[i]:
+            equity[i] = cash        # sin posición ni señales la vela no cambia nada
+            continue
+        cash, shares, entry_price, entry_i = step_bar(
+            i, highs[i], lows[i], closes[i], buys[i], sells[i], cash, shares, entry_price, entry_i,
+            sl, tp, n_shares, tx_fee, ledger, ts[i] if ts is not None else None, resolver)
+        equity[i] = cash + shares * closes[i]
+
+    # ===== Cierre forzado al final =====
+    if shares != 0 and entry_price is not None:
+        cash = close_position(n - 1, closes[-1], EXIT_FORCED, cash, shares, entry_price, entry_i,
+                              tx_fee, ledger)
+        equity[-1] = cash
+
+    return equity, ledger.to_array()
+
+def backtest_context(tx_fee: float = TX_FEE, initial_cash: float = INITIAL_CASH,
+                     engine: str = DEFAULT_ENGINE, resolver=None, **extra) -> dict:
+    """
+    Entradas del motor que cambian resultados sin ser parámetros de la estrategia
+    (para cache.result_key). Los topes se leen al llamar, así que un cambio en
+    MAX_NOTIONAL/MIN_QTY también cambia la clave.
+    """
+    return {"tx_fee": tx_fee, "initial_cash": initial_cash,
+            "max_notional": MAX_NOTIONAL, "min_qty": MIN_QTY, "engine": engine,
+            "resolver": resolver.fingerprint if resolver is not None else None, **extra}
+
+def _bar_times(index: pd.Index, resolver):
+    """Apertura de cada vela en ns UTC (sólo hace falta si hay resolver intravela)."""
+    if resolver is None:
+        return None
+    return pd.DatetimeIndex(index).as_unit("ns").asi8
+
+def _drilldown_metrics(before: dict, after: dict) -> dict:
+    """Estadísticas de bajada de resolución de esta corrida (diferencia sobre el acumulado del resolver)."""
+    return {
+        "Drilldowns": after["drilldowns"] - before["drilldowns"],
+        "DrilldownTPFirst": after["tp_first"] - before["tp_first"],
+        "DrilldownBytes": after["io_bytes"] - before["io_bytes"],
+        "DrilldownSeconds": after["seconds"] - before["seconds"],
+    }
+
+def make_param_grid(sl_values, tp_values, n_shares_values) -> pd.DataFrame:
+    """
+    Producto cartesiano de valores (sl, tp, n_shares) -> DataFrame de K filas
+    listo para backtest_batch (p.ej. mapas de sensibilidad alrededor de best_params).
+    """
+    sl_g, tp_g, ns_g = np.meshgrid(
+        np.asarray(sl_values, dtype=np.float64),
+        np.asarray(tp_values, dtype=np.float64),
+        np.asarray(n_shares_values, dtype=np.float64),
+        indexing="ij",
+    )
+    return pd.DataFrame({"sl": sl_g.ravel(), "tp": tp_g.ravel(), "n_shares": ns_g.ravel()})
+
+def backtest_batch(df: pd.DataFrame, params, tx_fee: float = TX_FEE,
+                   initial_cash: float = INITIAL_CASH):
+    """
+    Evalúa K combinaciones (sl, tp, n_shares) sobre el mismo DataFrame de señales en una sola pasada.
+    - params: DataFrame con columnas sl, tp, n_shares, o arreglo (K, 3) en ese orden.
+    - Cada carril (lane) sigue exactamente las reglas de backtest(); el estado
+      (cash, shares, entry_price) es vectorial de tamaño K.
+    Devuelve (equity KxN como np.ndarray, DataFrame de métricas por carril).
+    """
+    if isinstance(params, pd.DataFrame):
+        grid = params[["sl", "tp", "n_shares"]].to_numpy(dtype=np.float64)
+    else:
+        grid = np.asarray(params, dtype=np.float64).reshape(-1, 3)
+    sl, tp, n_shares = grid[:, 0].copy(), grid[:, 1].copy(), grid[:, 2].copy()
+    K, N = len(grid), len(df)
+
+    highs = df["High"].to_numpy(dtype=np.float64).tolist()
+    lows = df["Low"].to_numpy(dtype=np.float64).tolist()
+    closes = df["Close"].to_numpy(dtype=np.float64).tolist()
+    buys = df["BUY_SIG"].to_numpy(dtype=bool).tolist()
+    sells = df["SELL_SIG"].to_numpy(dtype=bool).tolist()
+
+    # Estado por carril (entry_price = NaN cuando no hay posición)
+    cash = np.full(K, initial_cash, dtype=np.float64)
+    shares = np.zeros(K, dtype=np.float64)
+    entry = np.full(K, np.nan, dtype=np.float64)
+    n_trades = np.zeros(K, dtype=np.int64)
+    n_wins = np.zeros(K, dtype=np.int64)
+    equity = np.empty((K, N), dtype=np.float64)
+
+    # Niveles constantes por carril
+    long_sl_f, long_tp_f = 1 - sl, 1 + tp
+    short_sl_f, short_tp_f = 1 + sl, 1 - tp
+    fee_out_long, fee_out_short = 1 - tx_fee, 1 + tx_fee
+
+    def _close(mask, exit_price, side):
+        nonlocal cash
+        qty = np.abs(shares)
+        if side > 0:
+            cash = np.where(mask, cash + exit_price * shares * fee_out_long, cash)
+            pnl = (exit_price - entry) * shares \
+                  - exit_price * shares * tx_fee - entry * shares * tx_fee
+        else:
+            cash = np.where(mask, cash - exit_price * qty * fee_out_short, cash)
+            pnl = (entry - exit_price) * qty \
+                  - exit_price * qty * tx_fee - entry * qty * tx_fee
+        n_trades[mask] += 1
+        n_wins[mask & (pnl > 0)] += 1
+        shares[mask] = 0.0
+        entry[mask] = np.nan
+
+    with np.errstate(invalid="ignore"):
+        for i in range(N):
+            price_high, price_low, price_close = highs[i], lows[i], closes[i]
+
+            # ===== CIERRE por SL/TP =====
+            is_long = shares > 0
+            is_short = shares < 0
+            closed_by_sl_tp = np.zeros(K, dtype=bool)
+            if is_long.any():
+                sl_price = entry * long_sl_f
+                tp_price = entry * long_tp_f
+                hit_sl = is_long & (price_low <= sl_price)
+                hit_tp = is_long & ~hit_sl & (price_high >= tp_price)
+                mask = hit_sl | hit_tp
+                if mask.any():
+                    _close(mask, np.where(hit_sl, sl_price, tp_price), +1)
+                    closed_by_sl_tp |= mask
+            if is_short.any():
+                sl_price = entry * short_sl_f
+                tp_price = entry * short_tp_f
+                hit_sl = is_short & (price_high >= sl_price)
+                hit_tp = is_short & ~hit_sl & (price_low <= tp_price)
+                mask = hit_sl | hit_tp
+                if mask.any():
+                    _close(mask, np.where(hit_sl, sl_price, tp_price), -1)
+                    closed_by_sl_tp |= mask
+
+            # ===== CIERRE por SEÑAL CONTRARIA =====
+            # Chequeos independientes por lado, como en step_bar (ambas señales pueden venir juntas)
+            if sells[i]:
+                mask = (shares > 0) & ~closed_by_sl_tp
+                if mask.any():
+                    _close(mask, price_close, +1)
+            if buys[i]:
+                mask = (shares < 0) & ~closed_by_sl_tp
+                if mask.any():
+                    _close(mask, price_close, -1)
+
+            # ===== APERTURAS (dinámicas, sin apalancamiento) =====
+            if buys[i] or sells[i]:
+                flat = shares == 0
+                if flat.any():
+                    max_qty_by_notional = MAX_NOTIONAL / price_close
+                    max_qty_by_cash = cash / (price_close * (1 + tx_fee))
+                    qty = np.minimum(np.minimum(n_shares, max_qty_by_cash), max_qty_by_notional)
+                    qty = np.floor(qty * 1e6) / 1e6
+                    ok = flat & (qty >= MIN_QTY)
+                    if buys[i]:
+                        cash = np.where(ok, cash - price_close * qty * (1 + tx_fee), cash)
+                        shares[ok] = qty[ok]
+                    else:
+                        cash = np.where(ok, cash + price_close * qty * (1 - tx_fee), cash)
+                        shares[ok] = -qty[ok]
+                    entry[ok] = price_close
+
+            # ===== Equity al cierre =====
+            equity[:, i] = cash + shares * price_close
+
+        # ===== Cierre forzado al final =====
+        if N:
+            last_price = closes[-1]
+            open_at_end = shares != 0
+            for side, mask in ((+1, shares > 0), (-1, shares < 0)):
+                if mask.any():
+                    _close(mask, last_price, side)
+            equity[open_at_end, -1] = cash[open_at_end]
+
+    metrics = pd.DataFrame(compute_all_metrics(equity, df.index))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        metrics["WinRate"] = np.where(n_trades > 0, n_wins / n_trades, np.nan)
+    metrics["Trades"] = n_trades.astype(int)
+    metrics.insert(0, "n_shares", n_shares)
+    metrics.insert(0, "tp", tp)
+    metrics.insert(0, "sl", sl)
+    return equity, metrics
+
+def _build_metrics(equity: pd.Series, trade_pnls) -> dict:
+    metrics = compute_all_metrics(equity.to_numpy(), equity.index)
+    metrics["WinRate"] = float((np.array(trade_pnls) > 0).mean()) if len(trade_pnls) else float("nan")
+    metrics["Trades"] = int(len(trade_pnls))
+    return metrics
+
+def _backtest_pandas(df: pd.DataFrame, sl: float, tp: float, n_shares: float,
+                     tx_fee: float = TX_FEE, initial_cash: float = INITIAL_CASH):
+    """
+    Motor original (referencia): recorre el DataFrame fila a fila con .iloc.
+    Se conserva para validar que el motor NumPy da resultados idénticos.
     """
     data = df.copy()
     cash = initial_cash
@@ -131,15 +525,4 @@ def backtest(df: pd.DataFrame, sl: float, tp: float, n_shares: float,
         equity_curve[-1] = cash
 
     equity = pd.Series(equity_curve, index=data.index, name="Equity")
-
-    metrics = {
-        "final_equity": float(equity.iloc[-1]),
-        "CAGR": cagr_from_equity(equity),
-        "MaxDD": max_drawdown(equity),
-        "Sharpe": sharpe_ratio(equity),
-        "Sortino": sortino_ratio(equity),
-        "Calmar": calmar_ratio(equity),
-        "WinRate": float((np.array(trade_pnls) > 0).mean()) if len(trade_pnls) else float("nan"),
-        "Trades": int(len(trade_pnls)),
-    }
-    return equity, metrics
+    return equity, _build_metrics(equity, trade_pnls)
@@ -0,0 +1,144 @@
+# batch.py
+import os
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import pandas as pd
+from utils import INTERVAL_MS, bar_seconds, _ann_factor_from_index
+
+# ===== Corridas por lote: varios símbolos e intervalos =====
+INTERVALS = ("1m", "5m", "15m", "1h", "4h", "1d")
+SOURCES = ("binance", "synthetic")
+SIGNAL_PARAMS = ("rsi_window", "rsi_low", "rsi_high", "sma_fast", "sma_slow",
+                 "macd_fast", "macd_slow", "macd_signal")
+# Pico medido de señales + backtest (tracemalloc) ~212 B por vela; se deja margen
+BYTES_PER_BAR = 256
+MAX_MEMORY_MB = 2048
+
+def make_universe(symbols, intervals=INTERVALS) -> list:
+    """Producto símbolos x intervalos como lista de (symbol, interval)."""
+    for iv in intervals:
+        if iv not in INTERVAL_MS:
+            raise ValueError(f"intervalo no soportado: {iv}")
+    return [(s, iv) for s in symbols for iv in intervals]
+
+def estimate_bars(start, end, interval: str) -> int:
+    start_dt = pd.Timestamp(start, tz="UTC")
+    end_dt = pd.Timestamp(end, tz="UTC") if end is not None else pd.Timestamp.now(tz="UTC")
+    span_ms = (end_dt - start_dt).total_seconds() * 1000
+    return max(int(span_ms // INTERVAL_MS[interval]), 0)
+
+def estimate_mb(n_bars: int) -> float:
+    return n_bars * BYTES_PER_BAR / 2**20
+
+def prefetch_klines(universe, start, end=None, fetcher=None):
+    """
+    Descarga en serie, en este proceso, las velas de Binance que aún no estén en cache.
+    Un único KlineFetcher (y su TokenBucket) respeta el límite de peso por minuto; si cada
+    trabajador del pool descargara lo suyo, N procesos usarían N veces el límite.
+    """
+    from data_loader import CHECKPOINT_DIR, load_klines
+    if fetcher is None:
+        from fetcher import KlineFetcher
+        fetcher = KlineFetcher(checkpoint_dir=CHECKPOINT_DIR)
+    for symbol, interval in universe:
+        load_klines(symbol, interval, start=start, end=end, fetcher=fetcher)
+
+def _load(symbol: str, interval: str, start, end, source: str, seed: int) -> pd.DataFrame:
+    if source == "synthetic":
+        from synthetic import make_ohlcv
+        # Semilla estable por instrumento (hash() de str cambia entre procesos)
+        inst_seed = seed + zlib.crc32(f"{symbol}:{interval}".encode())
+        return make_ohlcv(estimate_bars(start, end, interval), seed=inst_seed,
+                          start=start, interval=interval)
+    if source == "binance":
+        # Ya descargado por prefetch_klines: sólo lee el almacén local
+        from data_loader import load_klines
+        return load_klines(symbol, interval, start=start, end=end)
+    raise ValueError(f"source debe ser uno de {SOURCES}")
+
+def _instrument_worker(symbol: str, interval: str, start, end, source: str, seed: int,
+                       params: dict) -> dict:
+    """Carga datos, señales (camino NumPy) y backtest de un instrumento."""
+    from signals import compute_signal_arrays
+    from backtest import backtest_arrays
+
+    t0 = time.perf_counter()
+    df = _load(symbol, interval, start, end, source, seed)
+    load_s = time.perf_counter() - t0
+
+    row = {"symbol": symbol, "interval": interval, "source": source, "bars": len(df)}
+    if len(df) < 2:
+        return {**row, "error": "sin datos", "load_s": load_s, "run_s": 0.0}
+
+    t0 = time.perf_counter()
+    sig = compute_signal_arrays(df["Close"].to_numpy(), *(params[k] for k in SIGNAL_PARAMS))
+    if len(sig.buy) < 2:
+        return {**row, "error": "datos insuficientes para el calentamiento", "load_s": load_s, "run_s": 0.0}
+    _, metrics = backtest_arrays(df, sig, params["sl"], params["tp"], params["n_shares"])
+    run_s = time.perf_counter() - t0
+
+    return {
+        **row,
+        "start": df.index[0],
+        "end": df.index[-1],
+        "bar_s": bar_seconds(df.index),
+        "ann_factor": _ann_factor_from_index(df.index),
+        **metrics,
+        "load_s": load_s,
+        "run_s": run_s,
+    }
+
+def run_batch(universe, params: dict, start="2018-01-01", end=None, source: str = "synthetic",
+              n_workers=None, max_memory_mb: float = MAX_MEMORY_MB, seed: int = 42,
+              fetcher=None) -> pd.DataFrame:
+    """
+    Evalúa el pipeline señales+backtest por instrumento en un pool de procesos.
+    Control de memoria: cada trabajo reserva estimate_mb(velas estimadas) y sólo se lanzan
+    trabajos mientras la suma reservada quepa en max_memory_mb (uno demasiado grande corre solo).
+    Con source="binance" las descargas se hacen antes del pool, en serie (prefetch_klines).
+    Devuelve una tabla con una fila por instrumento (métricas anualizadas según su intervalo).
+    """
+    if source not in SOURCES:
+        raise ValueError(f"source debe ser uno de {SOURCES}")
+    if source == "binance":
+        prefetch_klines(universe, start, end, fetcher=fetcher)
+    n_workers = n_workers or os.cpu_count() or 1
+    jobs = [(sym, iv, estimate_mb(estimate_bars(start, end, iv))) for sym, iv in universe]
+    # Los más grandes primero: los chicos rellenan la memoria que queda libre
+    pending = sorted(jobs, key=lambda j: j[2], reverse=True)
+
+    rows = []
+    t_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        running = {}
+        reserved = 0.0
+        while pending or running:
+            launched = True
+            while pending and len(running) < n_workers and launched:
+                launched = False
+                for i, (sym, iv, mb) in enumerate(pending):
+                    if reserved + mb <= max_memory_mb or not running:
+                        fut = pool.submit(_instrument_worker, sym, iv, start, end, source, seed, params)
+                        running[fut] = mb
+                        reserved += mb
+                        pending.pop(i)
+                        launched = True
+                        break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                reserved -= running.pop(fut)
+                rows.append(fut.result())
+
+    table = pd.DataFrame(rows)
+    table["est_mb"] = [estimate_mb(estimate_bars(start, end, iv)) for iv in table["interval"]]
+    order = {iv: k for k, iv in enumerate(sorted(INTERVAL_MS, key=INTERVAL_MS.get))}
+    table = table.sort_values(["symbol", "interval"], key=lambda c: c.map(order) if c.name == "interval" else c)
+    table.attrs["wall_s"] = time.perf_counter() - t_start
+    return table.reset_index(drop=True)
+
+def summarize_batch(table: pd.DataFrame) -> pd.DataFrame:
+    """Agregado entre instrumentos: media, mediana, peor y mejor por métrica."""
+    cols = [c for c in ("CAGR", "MaxDD", "Sharpe", "Sortino", "Calmar", "WinRate", "Trades")
+            if c in table.columns]
+    return table[cols].agg(["mean", "median", "min", "max"]).T
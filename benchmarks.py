@@ -0,0 +1,200 @@
+# benchmarks.py
+"""
+Suite de benchmarks por etapa del pipeline sobre datos sintéticos (synthetic.make_ohlcv).
+
+Uso:
+    python benchmarks.py --sizes 10k,100k,1M --out outputs/bench.json
+    python benchmarks.py --sizes 10k,100k --compare outputs/bench_baseline.json --threshold 0.25
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from synthetic import make_ohlcv
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+BENCH_PARAMS = {
+    "rsi_window": 15, "rsi_low": 23, "rsi_high": 75,
+    "sma_fast": 10, "sma_slow": 95, "macd_fast": 11, "macd_slow": 19, "macd_signal": 11,
+    "sl": 0.026, "tp": 0.055, "n_shares": 1.5,
+}
+SIGNAL_KEYS = ("rsi_window", "rsi_low", "rsi_high", "sma_fast", "sma_slow",
+               "macd_fast", "macd_slow", "macd_signal")
+# Sobre este tamaño no se miden las etapas del objetivo (se registran como omitidas):
+# cada trial recorre el train completo y, aun con el banco acotado (indicator_bank.MAX_EAGER_MB
+# + MAX_CACHED_MB), a 10M de velas una columna ocupa 80 MB y un trial pasa de 1 GB
+OBJECTIVE_MAX_BARS = 1_000_000
+OBJECTIVE_STAGES = ("optimize.objective_factory", "optimize.objective")
+
+def _parse_size(s: str) -> int:
+    return SIZES.get(s, None) or int(float(s))
+
+def _measure(fn, repeat: int, memory: bool) -> dict:
+    """Mejor tiempo de `repeat` corridas y, opcionalmente, pico de memoria (tracemalloc) en otra corrida."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    out = {"seconds": min(times), "seconds_mean": float(np.mean(times)), "repeat": repeat}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        out["peak_mb"] = peak / 2 ** 20
+    return out
+
+def _stages(df, workdir: str, interval: str, objective: bool = True) -> dict:
+    """Etapas a medir: nombre -> callable sin argumentos (sin las del objetivo si objective=False)."""
+    import optuna
+    import utils
+    from backtest import backtest
+    from candle_store import CandleStore
+    from optimize import objective_factory
+    from plots import plot_drawdown, plot_equity, plot_panel
+    from signals import add_indicators_and_signals
+    from streaming import latency_per_bar
+
+    sig_params = {k: BENCH_PARAMS[k] for k in SIGNAL_KEYS}
+    store = CandleStore(os.path.join(workdir, "store"), interval=interval)
+    store.append(df)
+    sig = add_indicators_and_signals(df, **sig_params)
+    equity, _ = backtest(sig, BENCH_PARAMS["sl"], BENCH_PARAMS["tp"], BENCH_PARAMS["n_shares"])
+    state = {}
+
+    def build_objective():
+        state["objective"] = objective_factory(df, n_splits=5, min_trades_per_chunk=0)
+
+    def call_objective():
+        try:
+            state["objective"](optuna.trial.FixedTrial(BENCH_PARAMS))
+        except optuna.TrialPruned:
+            pass
+
+    stages = {
+        "data_loader.cache_load": lambda: store.load(),
+        "signals.add_indicators_and_signals": lambda: add_indicators_and_signals(df, **sig_params),
+        "streaming.update_per_bar": lambda: latency_per_bar(df.iloc[:100_000], sig_params),
+        "backtest.backtest": lambda: backtest(sig, BENCH_PARAMS["sl"], BENCH_PARAMS["tp"],
+                                              BENCH_PARAMS["n_shares"]),
+        "utils.cagr_from_equity": lambda: utils.cagr_from_equity(equity),
+        "utils.max_drawdown": lambda: utils.max_drawdown(equity),
+        "utils.sharpe_ratio": lambda: utils.sharpe_ratio(equity),
+        "utils.sortino_ratio": lambda: utils.sortino_ratio(equity),
+        "utils.calmar_ratio": lambda: utils.calmar_ratio(equity),
+        "utils.compute_all_metrics": lambda: utils.compute_all_metrics(equity.to_numpy(), equity.index),
+        "utils.returns_table": lambda: [utils.returns_table(equity, f) for f in ("ME", "QE", "YE")],
+        "optimize.objective_factory": build_objective,
+        "optimize.objective": call_objective,
+        "plots.plot_equity": lambda: plot_equity(equity, "bench", save="bench_equity.png"),
+        "plots.plot_drawdown": lambda: plot_drawdown(equity, "bench", save="bench_drawdown.png"),
+        "plots.plot_panel": lambda: plot_panel(equity, "bench", save="bench_panel.png"),
+    }
+    if not objective:
+        for name in OBJECTIVE_STAGES:
+            del stages[name]
+    else:
+        build_objective()
+    return stages
+
+def run(sizes, repeat: int = 3, memory: bool = True, only=None, seed: int = 42,
+        objective_max_bars: int = OBJECTIVE_MAX_BARS) -> dict:
+    results = []
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    cwd = os.getcwd()
+    os.chdir(workdir)   # plots escribe en outputs/ relativo al cwd
+    try:
+        for n in sizes:
+            # Velas de 1h desbordan datetime64[ns] pasados ~2M de velas: usar 1m en tamaños grandes
+            interval = "1h" if n <= 1_000_000 else "1m"
+            df = make_ohlcv(n, seed=seed, interval=interval)
+            with_objective = n <= objective_max_bars
+            stages = _stages(df, os.path.join(workdir, f"n{n}"), interval, objective=with_objective)
+            if not with_objective:
+                for name in OBJECTIVE_STAGES:
+                    if only and not any(name.startswith(o) for o in only):
+                        continue
+                    reason = f"omitida: {n:,} velas > objective_max_bars ({objective_max_bars:,})"
+                    results.append({"stage": name, "bars": n, "skipped": reason})
+                    print(f"[{n:>10,}] {name:<40} {reason}")
+            for name, fn in stages.items():
+                if only and not any(name.startswith(o) for o in only):
+                    continue
+                r = _measure(fn, repeat, memory)
+                r.update({"stage": name, "bars": n})
+                results.append(r)
+                mem = f" | pico {r['peak_mb']:.1f} MB" if memory else ""
+                print(f"[{n:>10,}] {name:<40} {r['seconds'] * 1e3:10.2f} ms{mem}")
+            del df, stages
+            gc.collect()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "meta": {"python": sys.version.split()[0], "numpy": np.__version__,
+                 "platform": platform.platform(), "cpu_count": os.cpu_count(),
+                 "seed": seed, "repeat": repeat, "created": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+
+def compare(current: dict, baseline: dict, threshold: float = 0.25) -> list:
+    """Etapas cuyo tiempo empeoró más de `threshold` (fracción) respecto al baseline."""
+    base = {(r["stage"], r["bars"]): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        b = base.get((r["stage"], r["bars"]))
+        if "skipped" in r or b is None or "skipped" in b or b["seconds"] <= 0:
+            continue
+        ratio = r["seconds"] / b["seconds"]
+        if ratio > 1 + threshold:
+            regressions.append({"stage": r["stage"], "bars": r["bars"], "baseline_s": b["seconds"],
+                                "current_s": r["seconds"], "ratio": ratio})
+    return regressions
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks del pipeline BTCUSDT")
+    ap.add_argument("--sizes", default="10k,100k,1M", help="p.ej. 10k,100k,1M,10M")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--no-memory", action="store_true", help="no medir memoria con tracemalloc")
+    ap.add_argument("--only", default=None, help="prefijos de etapa separados por coma")
+    ap.add_argument("--out", default="outputs/bench.json")
+    ap.add_argument("--compare", default=None, help="JSON baseline para detectar regresiones")
+    ap.add_argument("--threshold", type=float, default=0.25)
+    ap.add_argument("--objective-max-bars", type=_parse_size, default=OBJECTIVE_MAX_BARS,
+                    help="tamaño máximo con etapas del objetivo (las mayores se registran como omitidas)")
+    args = ap.parse_args(argv)
+
+    sizes = [_parse_size(s) for s in args.sizes.split(",")]
+    only = args.only.split(",") if args.only else None
+    report = run(sizes, repeat=args.repeat, memory=not args.no_memory, only=only,
+                 objective_max_bars=args.objective_max_bars)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(report, baseline, args.threshold)
+        for r in report["regressions"]:
+            print(f"REGRESIÓN {r['stage']} @ {r['bars']:,}: "
+                  f"{r['baseline_s'] * 1e3:.2f} -> {r['current_s'] * 1e3:.2f} ms (x{r['ratio']:.2f})")
+
+    if os.path.dirname(args.out):
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados en {args.out}")
+    return 1 if report.get("regressions") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# bundle.py
+import json
+import os
+import zipfile
+import numpy as np
+import pandas as pd
+
+# ===== Paquete binario de resultados (un .npz sin comprimir por corrida) =====
+BUNDLE_PATH = "outputs/results.npz"
+BUNDLE_VERSION = 1
+FREQS = {"ME": "monthly", "QE": "quarterly", "YE": "annual"}
+META_KEY = "meta"
+
+def _index_ns(index: pd.DatetimeIndex) -> np.ndarray:
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert("UTC")
+    return index.as_unit("ns").asi8
+
+def _to_index(ns: np.ndarray, tz, name) -> pd.DatetimeIndex:
+    index = pd.DatetimeIndex(np.asarray(ns).view("datetime64[ns]"), name=name)
+    return index.tz_localize("UTC").tz_convert(tz) if tz is not None else index
+
+def write_bundle(path: str, results: dict, params: dict = None, tables: dict = None) -> str:
+    """
+    Guarda en un solo .npz (sin comprimir, para poder mapear cada arreglo):
+    - por tramo: equity e índice (int64 ns UTC), ledger de operaciones, conteos de señales y
+      tablas de rendimientos ME/QE/YE (tables[tramo], de utils.returns_tables);
+    - métricas, parámetros y metadatos de índice en un JSON.
+    results: {tramo: (equity, metrics, trades, signal_counts)} como devuelve main._evaluate_splits.
+    """
+    arrays = {}
+    meta = {"version": BUNDLE_VERSION, "params": params or {}, "splits": {}}
+    for name, (eq, metrics, trades, counts) in results.items():
+        index = pd.DatetimeIndex(eq.index)
+        arrays[f"{name}/equity"] = eq.to_numpy(dtype=np.float64)
+        arrays[f"{name}/index"] = _index_ns(index)
+        arrays[f"{name}/trades"] = np.asarray(trades)
+        arrays[f"{name}/signal_counts"] = np.asarray(counts, dtype=np.int64)
+        for freq, table in (tables or {}).get(name, {}).items():
+            arrays[f"{name}/returns_{freq}"] = table["Return"].to_numpy(dtype=np.float64)
+            arrays[f"{name}/returns_{freq}_index"] = _index_ns(table.index)
+        meta["splits"][name] = {
+            "metrics": metrics,
+            "tz": str(index.tz) if index.tz is not None else None,
+            "index_name": index.name,
+            "freqs": sorted((tables or {}).get(name, {})),
+        }
+    arrays[META_KEY] = np.array(json.dumps(meta))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+    return path
+
+class ResultsBundle:
+    """
+    Lector perezoso de un paquete de write_bundle: al abrir sólo se lee el directorio del zip
+    y el JSON de metadatos; cada arreglo se mapea en memoria (np.memmap de solo lectura)
+    recién cuando se pide, sin descomprimir ni copiar el resto del archivo.
+    """
+
+    def __init__(self, path: str = BUNDLE_PATH):
+        self.path = path
+        self._members = {}
+        with zipfile.ZipFile(path) as zf, open(path, "rb") as f:
+            for info in zf.infolist():
+                if not info.filename.endswith(".npy"):
+                    continue
+                if info.compress_type != zipfile.ZIP_STORED:
+                    raise ValueError(f"{path}: el miembro {info.filename} está comprimido; no se puede mapear")
+                self._members[info.filename[:-4]] = self._locate(f, info)
+            self.meta = json.loads(str(self._read(META_KEY)))
+        if self.meta.get("version") != BUNDLE_VERSION:
+            raise ValueError(f"{path}: versión de paquete no soportada ({self.meta.get('version')})")
+
+    @staticmethod
+    def _locate(f, info):
+        # Encabezado local del zip (30 bytes + nombre + extra) y luego el encabezado .npy
+        f.seek(info.header_offset + 26)
+        name_len, extra_len = np.frombuffer(f.read(4), dtype="<u2")
+        f.seek(info.header_offset + 30 + int(name_len) + int(extra_len))
+        version = np.lib.format.read_magic(f)
+        read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                       else np.lib.format.read_array_header_2_0)
+        shape, fortran, dtype = read_header(f)
+        return f.tell(), shape, fortran, dtype
+
+    def _read(self, key: str) -> np.ndarray:
+        offset, shape, fortran, dtype = self._members[key]
+        if dtype.hasobject or dtype.kind == "U" or not shape or 0 in shape:
+            # Escalares, textos y vacíos: lectura directa (pequeños)
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                count = int(np.prod(shape)) if shape else 1
+                arr = np.fromfile(f, dtype=dtype, count=count)
+            return arr.reshape(shape, order="F" if fortran else "C")
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=offset, shape=shape,
+                         order="F" if fortran else "C")
+
+    def keys(self) -> list:
+        return sorted(self._members)
+
+    # ==== Contenido ====
+    @property
+    def splits(self) -> list:
+        return list(self.meta["splits"])
+
+    @property
+    def params(self) -> dict:
+        return self.meta["params"]
+
+    def metrics(self, split: str) -> dict:
+        return self.meta["splits"][split]["metrics"]
+
+    def _index(self, split: str, key: str) -> pd.DatetimeIndex:
+        info = self.meta["splits"][split]
+        return _to_index(self._read(f"{split}/{key}"), info["tz"], info["index_name"])
+
+    def equity(self, split: str) -> pd.Series:
+        return pd.Series(self._read(f"{split}/equity"), index=self._index(split, "index"),
+                         name="Equity", copy=False)
+
+    def trades(self, split: str) -> np.ndarray:
+        return self._read(f"{split}/trades")
+
+    def signal_counts(self, split: str) -> np.ndarray:
+        return self._read(f"{split}/signal_counts")
+
+    def returns(self, split: str, freq: str = "ME") -> pd.DataFrame:
+        """Tabla con el mismo formato que utils.returns_table(equity, freq)."""
+        if freq not in self.meta["splits"][split]["freqs"]:
+            raise KeyError(f"el paquete no tiene la tabla {freq} de {split}")
+        info = self.meta["splits"][split]
+        ret = np.asarray(self._read(f"{split}/returns_{freq}"))
+        index = _to_index(self._read(f"{split}/returns_{freq}_index"), info["tz"],
+                          info["index_name"] or "Open time")
+        index = pd.DatetimeIndex(index, freq=freq)
+        return pd.DataFrame({"Return": ret, "Return_%": ret * 100}, index=index)
+
+    def returns_tables(self, split: str) -> dict:
+        return {freq: self.returns(split, freq) for freq in self.meta["splits"][split]["freqs"]}
+
+def export_legacy(bundle, out_dir: str = "outputs") -> list:
+    """
+    Formatos anteriores a partir de un paquete (ruta o ResultsBundle): metrics_<tramo>.json,
+    equity_<tramo>.csv, returns_<tramo>_<monthly|quarterly|annual>.csv y trades_<tramo>.csv/.parquet.
+    Devuelve las rutas escritas.
+    """
+    from ledger import export_trades
+
+    if not isinstance(bundle, ResultsBundle):
+        bundle = ResultsBundle(bundle)
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for name in bundle.splits:
+        path = os.path.join(out_dir, f"metrics_{name}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(bundle.metrics(name), f, indent=2)
+        written.append(path)
+
+        eq = bundle.equity(name)
+        path = os.path.join(out_dir, f"equity_{name}.csv")
+        pd.DataFrame({"Equity": eq.values}, index=eq.index).to_csv(path)
+        written.append(path)
+
+        for freq, table in bundle.returns_tables(name).items():
+            path = os.path.join(out_dir, f"returns_{name}_{FREQS[freq]}.csv")
+            table.to_csv(path)
+            written.append(path)
+
+        trades = np.asarray(bundle.trades(name))
+        path = os.path.join(out_dir, f"trades_{name}.csv")
+        export_trades(trades, path)
+        written.append(path)
+        try:
+            export_trades(trades, os.path.join(out_dir, f"trades_{name}.parquet"))
+            written.append(os.path.join(out_dir, f"trades_{name}.parquet"))
+        except Exception as e:
+            print(f"Aviso: no se pudo exportar trades_{name}.parquet:", e)
+    return written
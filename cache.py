@@ -0,0 +1,221 @@
+# cache.py
+import hashlib
+import io
+import json
+import os
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# ===== Caché de resultados direccionada por contenido =====
+CACHE_DIR = "outputs/cache"
+CACHE_VERSION = 2           # subir al cambiar el motor o el formato: invalida las claves anteriores
+MAX_DISK_BYTES = 512 * 2**20
+MAX_MEMORY_ITEMS = 256
+FINGERPRINT_COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+
+def frame_fingerprint(df: pd.DataFrame, columns=FINGERPRINT_COLUMNS) -> str:
+    """Hash (blake2b) del índice y las columnas OHLCV del tramo de velas."""
+    h = hashlib.blake2b(digest_size=16)
+    index = np.ascontiguousarray(df.index.values)
+    h.update(str(index.dtype).encode())
+    h.update(index.tobytes())
+    for col in columns:
+        if col in df.columns:
+            h.update(col.encode())
+            h.update(np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+def _canonical(value):
+    # Tipos NumPy -> nativos; floats por repr exacto para que 0.1 y np.float64(0.1) coincidan
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(value).hex()
+    return value
+
+def result_key(data_fingerprint: str, params: dict, context: dict = None) -> str:
+    """
+    Clave = hash de CACHE_VERSION + fingerprint de datos + parámetros canonicalizados + contexto
+    del motor (comisión, caja, topes, engine, resolver...; ver backtest.backtest_context).
+    """
+    payload = json.dumps({"version": CACHE_VERSION, "data": data_fingerprint,
+                          "params": _canonical(params), "context": _canonical(context or {})},
+                         sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode(), digest_size=20).hexdigest()
+
+class ResultCache:
+    """
+    Caché de (equity, métricas[, arreglos extra]) por clave de contenido.
+    - Frente en memoria: LRU de max_memory_items entradas.
+    - Disco: un .npz comprimido por clave; LRU por fecha de acceso (mtime) acotado a max_bytes.
+    Escrituras atómicas (archivo temporal + os.replace), así que varios procesos pueden compartir root.
+    """
+
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = MAX_DISK_BYTES,
+                 max_memory_items: int = MAX_MEMORY_ITEMS):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.max_memory_items = int(max_memory_items)
+        os.makedirs(root, exist_ok=True)
+        self._mem = OrderedDict()
+        self._sizes = {}
+        for name in os.listdir(root):
+            if name.endswith(".npz"):
+                try:
+                    self._sizes[name[:-4]] = os.path.getsize(os.path.join(root, name))
+                except FileNotFoundError:
+                    pass
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key + ".npz")
+
+    # ==== Lectura ====
+    def get(self, key: str):
+        """Devuelve (equity, metrics, extra) o None si no está."""
+        if key in self._mem:
+            self._mem.move_to_end(key)
+            self.memory_hits += 1
+            return self._mem[key]
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                metrics = json.loads(str(z["metrics"]))
+                index = pd.DatetimeIndex(z["index"], name=metrics.pop("_index_name", None))
+                tz = metrics.pop("_tz", None)
+                if tz is not None:
+                    index = index.tz_localize("UTC").tz_convert(tz)
+                equity = pd.Series(z["equity"], index=index, name="Equity")
+                extra = {k[6:]: z[k] for k in z.files if k.startswith("extra_")}
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            self._sizes.pop(key, None)
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)      # marca de acceso para el LRU en disco
+        except FileNotFoundError:
+            pass
+        self.disk_hits += 1
+        value = (equity, metrics, extra)
+        self._remember(key, value)
+        return value
+
+    # ==== Escritura ====
+    def put(self, key: str, equity: pd.Series, metrics: dict, extra: dict = None):
+        extra = extra or {}
+        index = equity.index
+        meta = dict(metrics)
+        meta["_index_name"] = index.name
+        if isinstance(index, pd.DatetimeIndex) and index.tz is not None:
+            meta["_tz"] = str(index.tz)
+            index = index.tz_convert(None)
+        buf = io.BytesIO()
+        np.savez_compressed(
+            buf,
+            equity=equity.to_numpy(dtype=np.float64),
+            index=np.asarray(index.values).astype("datetime64[ns]"),
+            metrics=np.array(json.dumps(meta)),
+            **{f"extra_{k}": np.asarray(v) for k, v in extra.items()},
+        )
+        data = buf.getvalue()
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._sizes[key] = len(data)
+        self.stores += 1
+        self._remember(key, (equity, dict(metrics), extra))
+        self._evict()
+
+    def get_or_compute(self, key: str, compute):
+        """compute() -> (equity, metrics) o (equity, metrics, extra); se guarda en caso de fallo."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if len(value) == 2:
+                value = (value[0], value[1], {})
+            self.put(key, *value)
+        return value
+
+    def _remember(self, key, value):
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_memory_items:
+            self._mem.popitem(last=False)
+
+    def _evict(self):
+        total = sum(self._sizes.values())
+        if total <= self.max_bytes:
+            return
+        # Otros procesos pudieron escribir: releer tamaños y fechas de acceso del disco
+        entries = []
+        for name in os.listdir(self.root):
+            if name.endswith(".npz"):
+                try:
+                    st = os.stat(os.path.join(self.root, name))
+                except FileNotFoundError:
+                    continue        # otro proceso la desalojó entre listdir y stat
+                entries.append((st.st_mtime, name[:-4], st.st_size))
+        entries.sort()
+        self._sizes = {k: size for _, k, size in entries}
+        total = sum(self._sizes.values())
+        for _, key, size in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            total -= size
+            self._sizes.pop(key, None)
+            self._mem.pop(key, None)
+            self.evictions += 1
+
+    def clear(self):
+        for key in list(self._sizes):
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+        self._sizes.clear()
+        self._mem.clear()
+
+    # ==== Estadísticas ====
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else float("nan"),
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": len(self._sizes),
+            "disk_bytes": int(sum(self._sizes.values())),
+        }
+
+def merge_stats(stats_list) -> dict:
+    """Suma las estadísticas de varias cachés (p. ej. una por worker)."""
+    out = {}
+    for s in stats_list:
+        for k, v in s.items():
+            if k in ("entries", "disk_bytes"):
+                out[k] = max(out.get(k, 0), v)     # directorio compartido: no se suma
+            elif k != "hit_rate":
+                out[k] = out.get(k, 0) + v
+    lookups = out.get("memory_hits", 0) + out.get("disk_hits", 0) + out.get("misses", 0)
+    out["hit_rate"] = (out.get("memory_hits", 0) + out.get("disk_hits", 0)) / lookups if lookups else float("nan")
+    return out
@@ -0,0 +1,144 @@
+# candle_store.py
+import json
+import os
+import numpy as np
+import pandas as pd
+from utils import INTERVAL_MS
+
+COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+INDEX_FILE = "open_time_ns.npy"
+META_FILE = "meta.json"
+
+class CandleStore:
+    """
+    Almacén columnar de velas: un .npy por columna + índice int64 (ns desde epoch, UTC).
+    - load() abre los archivos con mmap y corta por rango de fechas sin copiar datos.
+    - append() agrega solo velas posteriores a la última 'Open time' guardada.
+    - gaps() detecta huecos según el intervalo esperado para poder rellenarlos (merge()).
+    El CSV queda como formato de importación/exportación (import_csv / export_csv).
+    """
+
+    def __init__(self, root: str, interval: str = "1h"):
+        self.root = root
+        meta = self._read_meta()
+        self.interval = meta.get("interval", interval)
+        self.interval_ns = INTERVAL_MS[self.interval] * 1_000_000
+
+    # ==== Archivos ====
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _read_meta(self) -> dict:
+        path = self._path(META_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def exists(self) -> bool:
+        return os.path.exists(self._path(INDEX_FILE))
+
+    def __len__(self) -> int:
+        return len(self.timestamps()) if self.exists() else 0
+
+    def timestamps(self) -> np.ndarray:
+        return np.load(self._path(INDEX_FILE), mmap_mode="r")
+
+    def column(self, name: str) -> np.ndarray:
+        return np.load(self._path(f"{name}.npy"), mmap_mode="r")
+
+    def last_open_time(self):
+        """Última 'Open time' guardada (Timestamp UTC) o None si el almacén está vacío."""
+        if not self.exists() or len(self) == 0:
+            return None
+        return pd.Timestamp(int(self.timestamps()[-1]), tz="UTC")
+
+    # ==== Lectura ====
+    def load(self, start=None, end=None) -> pd.DataFrame:
+        """
+        DataFrame con Open, High, Low, Close, Volume e índice 'Open time' (UTC), en [start, end].
+        Las columnas son vistas de solo lectura sobre los archivos mapeados en memoria.
+        """
+        ts = self.timestamps()
+        i0 = 0 if start is None else int(np.searchsorted(ts, _to_ns(start), side="left"))
+        i1 = len(ts) if end is None else int(np.searchsorted(ts, _to_ns(end), side="right"))
+        index = pd.DatetimeIndex(ts[i0:i1].view("datetime64[ns]"), name="Open time").tz_localize("UTC")
+        data = {c: self.column(c)[i0:i1] for c in COLUMNS}
+        return pd.DataFrame(data, index=index, copy=False)
+
+    # ==== Escritura ====
+    def _write(self, ts: np.ndarray, cols: dict):
+        os.makedirs(self.root, exist_ok=True)
+        # Escritura atómica por archivo: .tmp -> replace
+        for name, arr in [(INDEX_FILE[:-4], ts)] + [(c, cols[c]) for c in COLUMNS]:
+            tmp = self._path(f"{name}.tmp.npy")
+            np.save(tmp, np.ascontiguousarray(arr))
+            os.replace(tmp, self._path(f"{name}.npy"))
+        with open(self._path(META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"interval": self.interval, "rows": int(len(ts))}, f, indent=2)
+
+    def _current(self):
+        if not self.exists():
+            return np.empty(0, dtype=np.int64), {c: np.empty(0, dtype=np.float64) for c in COLUMNS}
+        return np.array(self.timestamps()), {c: np.array(self.column(c)) for c in COLUMNS}
+
+    def append(self, df: pd.DataFrame) -> int:
+        """Agrega solo las velas de df posteriores a la última guardada. Devuelve cuántas se agregaron."""
+        ts_new, cols_new = _frame_to_arrays(df)
+        ts, cols = self._current()
+        if len(ts):
+            keep = ts_new > ts[-1]
+            ts_new = ts_new[keep]
+            cols_new = {c: v[keep] for c, v in cols_new.items()}
+        if len(ts_new) == 0:
+            return 0
+        self._write(np.concatenate([ts, ts_new]),
+                    {c: np.concatenate([cols[c], cols_new[c]]) for c in COLUMNS})
+        return int(len(ts_new))
+
+    def merge(self, df: pd.DataFrame) -> int:
+        """Inserta velas en cualquier posición (p.ej. relleno de huecos). Devuelve cuántas eran nuevas."""
+        ts_new, cols_new = _frame_to_arrays(df)
+        ts, cols = self._current()
+        all_ts = np.concatenate([ts, ts_new])
+        uniq, first = np.unique(all_ts, return_index=True)   # conserva la versión ya guardada
+        added = int(len(uniq) - len(ts))
+        if added == 0:
+            return 0
+        self._write(uniq, {c: np.concatenate([cols[c], cols_new[c]])[first] for c in COLUMNS})
+        return added
+
+    def gaps(self) -> list:
+        """
+        Huecos en la serie: lista de (primera vela faltante, última vela faltante) como Timestamps UTC.
+        """
+        if not self.exists():
+            return []
+        ts = self.timestamps()
+        jumps = np.flatnonzero(np.diff(ts) > self.interval_ns)
+        return [
+            (pd.Timestamp(int(ts[j]) + self.interval_ns, tz="UTC"),
+             pd.Timestamp(int(ts[j + 1]) - self.interval_ns, tz="UTC"))
+            for j in jumps
+        ]
+
+    # ==== CSV (import/export) ====
+    def import_csv(self, path: str) -> int:
+        df = pd.read_csv(path, parse_dates=["Open time"]).set_index("Open time").sort_index()
+        return self.merge(df)
+
+    def export_csv(self, path: str, start=None, end=None):
+        self.load(start, end).to_csv(path, index=True)
+
+def _to_ns(ts) -> int:
+    t = pd.Timestamp(ts)
+    t = t.tz_localize("UTC") if t.tz is None else t.tz_convert("UTC")
+    return int(t.value)
+
+def _frame_to_arrays(df: pd.DataFrame):
+    idx = pd.DatetimeIndex(df.index)
+    idx = idx.tz_localize("UTC") if idx.tz is None else idx.tz_convert("UTC")
+    order = np.argsort(idx.as_unit("ns").asi8, kind="stable")
+    ts = idx.as_unit("ns").asi8[order]
+    cols = {c: df[c].to_numpy(dtype=np.float64)[order] for c in COLUMNS}
+    return ts, cols
@@ -1,72 +1,101 @@
 # data_loader.py
 import os
-import time
 from datetime import datetime, timezone
-import requests
+from typing import TYPE_CHECKING
 import pandas as pd
-from tqdm import tqdm
+from candle_store import CandleStore
+from utils import INTERVAL_MS
 
-BINANCE_URL = "https://api.binance.com/api/v3/klines"
+# requests/tqdm (fetcher) sólo se importan si hay que descargar
+if TYPE_CHECKING:
+    from fetcher import KlineFetcher
 
-def _fetch_chunk(start_ms: int, symbol="BTCUSDT", interval="1h", limit=1000):
-    params = dict(symbol=symbol, interval=interval, limit=limit, startTime=start_ms)
-    r = requests.get(BINANCE_URL, params=params, timeout=30)
-    r.raise_for_status()
-    return r.json()
+CHECKPOINT_DIR = "data/_checkpoints"
 
-def load_btcusdt_hourly(start="2018-01-01", end=None, cache_path="data/BTCUSDT_1h.csv") -> pd.DataFrame:
+def _now_ms() -> int:
+    return int(datetime.now(timezone.utc).timestamp() * 1000)
+
+def _download_range(start_ms: int, end_ms: int, symbol="BTCUSDT", interval="1h",
+                    fetcher: "KlineFetcher" = None) -> pd.DataFrame:
+    """Descarga velas con Open time en [start_ms, end_ms) y las devuelve como DataFrame."""
+    if fetcher is None:
+        from fetcher import KlineFetcher
+        fetcher = KlineFetcher(checkpoint_dir=CHECKPOINT_DIR)
+    return _rows_to_frame(fetcher.fetch(symbol, interval, start_ms, end_ms))
+
+def _rows_to_frame(rows) -> pd.DataFrame:
+    cols = [
+        "Open time","Open","High","Low","Close","Volume",
+        "Close time","Quote asset volume","Number of trades",
+        "Taker buy base asset volume","Taker buy quote asset volume","Ignore"
+    ]
+    df = pd.DataFrame(rows, columns=cols)
+    df["Open time"] = pd.to_datetime(df["Open time"], unit="ms", utc=True)
+    for c in ["Open","High","Low","Close","Volume"]:
+        df[c] = df[c].astype(float)
+
+    return df[["Open time","Open","High","Low","Close","Volume"]] \
+             .set_index("Open time").sort_index()
+
+def load_klines(symbol: str = "BTCUSDT", interval: str = "1h", start="2018-01-01", end=None,
+                cache_path=None, store_path=None, update: bool = False,
+                fetcher: "KlineFetcher" = None) -> pd.DataFrame:
     """
-    Descarga (y cachea) velas 1h de Binance Spot.
+    Descarga (y cachea) velas de Binance Spot para cualquier símbolo/intervalo.
     Devuelve DataFrame con columnas: Open, High, Low, Close, Volume y datetime index (UTC).
+    - El cache principal es un almacén columnar (CandleStore en store_path) que se abre con mmap.
+    - Si solo existe el CSV antiguo (cache_path) se importa una vez al almacén.
+    - update=True agrega las velas posteriores a la última guardada y rellena huecos detectados.
     """
-    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    cache_path = cache_path or f"data/{symbol}_{interval}.csv"
+    store_path = store_path or f"data/{symbol}_{interval}"
+    store = CandleStore(store_path, interval=interval)
+    step_ms = INTERVAL_MS[interval]
 
-    # Si ya existe el cache, úsalo
-    if os.path.exists(cache_path):
-        df = pd.read_csv(cache_path, parse_dates=["Open time"])
-        df = df.set_index("Open time").sort_index()
-        return df
+    def download(a_ms, b_ms):
+        return _download_range(a_ms, b_ms, symbol=symbol, interval=interval, fetcher=fetcher)
 
     start_dt = pd.Timestamp(start, tz="UTC")
+    now_ms = _now_ms()
     if end is None:
-        end_dt = datetime.now(timezone.utc)
+        end_dt = pd.Timestamp(now_ms, unit="ms", tz="UTC")
     else:
         end_dt = pd.Timestamp(end, tz="UTC")
+    # Sólo velas cerradas: la que sigue abierta trae OHLCV parcial y, una vez guardada,
+    # append no la reemplaza (sólo agrega velas posteriores a la última)
+    end_ms = min(int(end_dt.timestamp() * 1000), now_ms // step_ms * step_ms)
 
-    start_ms = int(start_dt.timestamp() * 1000)
-    end_ms = int(end_dt.timestamp() * 1000)
+    if not store.exists() and os.path.exists(cache_path):
+        store.import_csv(cache_path)
 
-    rows = []
-    cur = start_ms
-    pbar = tqdm(total=None, desc="Descargando BTCUSDT 1h")
-    while cur < end_ms:
-        data = _fetch_chunk(cur)
-        if not data:
-            break
-        rows.extend(data)
-        last_open = data[-1][0]
-        # siguiente vela (1h)
-        cur = last_open + 60 * 60 * 1000
-        pbar.update(1)
-        time.sleep(0.1)  # cortesía para no saturar
+    if not store.exists():
+        df = download(int(start_dt.timestamp() * 1000), end_ms)
+        if df.empty:
+            raise RuntimeError("No se pudo descargar datos de Binance.")
+        store.append(df)
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        store.export_csv(cache_path)
 
-    pbar.close()
+    elif update:
+        # Relleno de huecos
+        for gap_start, gap_end in store.gaps():
+            gap = download(int(gap_start.timestamp() * 1000), int(gap_end.timestamp() * 1000) + 1)
+            if not gap.empty:
+                store.merge(gap)
+        # Velas nuevas después de la última guardada
+        next_ms = int(store.last_open_time().timestamp() * 1000) + step_ms
+        if next_ms < end_ms:
+            new = download(next_ms, end_ms)
+            if not new.empty:
+                store.append(new)
 
-    if not rows:
-        raise RuntimeError("No se pudo descargar datos de Binance.")
+    return store.load(start=start_dt, end=None if end is None else end_dt)
 
-    cols = [
-        "Open time","Open","High","Low","Close","Volume",
-        "Close time","Quote asset volume","Number of trades",
-        "Taker buy base asset volume","Taker buy quote asset volume","Ignore"
-    ]
-    df = pd.DataFrame(rows, columns=cols)
-    df["Open time"] = pd.to_datetime(df["Open time"], unit="ms", utc=True)
-    for c in ["Open","High","Low","Close","Volume"]:
-        df[c] = df[c].astype(float)
-
-    df = df[["Open time","Open","High","Low","Close","Volume"]] \
-           .set_index("Open time").sort_index()
-
-    df.to_csv(cache_path, index=True)
-    return df
+def load_btcusdt_hourly(start="2018-01-01", end=None, cache_path="data/BTCUSDT_1h.csv",
+                        store_path="data/BTCUSDT_1h", update: bool = False) -> pd.DataFrame:
+    """
+    Descarga (y cachea) velas 1h de Binance Spot.
+    Devuelve DataFrame con columnas: Open, High, Low, Close, Volume y datetime index (UTC).
+    """
+    return load_klines("BTCUSDT", "1h", start=start, end=end, cache_path=cache_path,
+                       store_path=store_path, update=update)
@@ -0,0 +1,160 @@
+# fetcher.py
+import json
+import os
+import random
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+from utils import INTERVAL_MS
+
+BINANCE_URL = "https://api.binance.com/api/v3/klines"
+
+KLINES_LIMIT = 1000
+KLINES_WEIGHT = 2               # peso de /api/v3/klines con limit 101–1000
+WEIGHT_PER_MINUTE = 1200        # límite conservador de peso por IP
+RETRY_STATUS = {418, 429, 500, 502, 503, 504}
+
+def plan_windows(start_ms: int, end_ms: int, interval: str = "1h", limit: int = KLINES_LIMIT) -> list:
+    """Ventanas [ini, fin) de hasta `limit` velas que cubren [start_ms, end_ms)."""
+    span = INTERVAL_MS[interval] * limit
+    return [(s, min(s + span, end_ms)) for s in range(int(start_ms), int(end_ms), span)]
+
+class TokenBucket:
+    """Limitador por peso: `capacity` tokens que se recargan a `rate` tokens/seg (thread-safe)."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, weight: float = 1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= weight:
+                    self._tokens -= weight
+                    return
+                wait = (weight - self._tokens) / self.rate
+            time.sleep(wait)
+
+class KlineFetcher:
+    """
+    Descarga concurrente de klines:
+    - planifica todas las ventanas de `limit` velas por adelantado,
+    - las pide en paralelo (pool de hilos) sobre una sesión HTTP con pool de conexiones,
+    - limita por peso con un token bucket,
+    - reintenta con backoff exponencial (respeta Retry-After en 429/418),
+    - guarda cada ventana descargada en checkpoint_dir para reanudar si se interrumpe.
+    base_url es configurable (p.ej. un servidor local que reproduce páginas grabadas).
+    """
+
+    def __init__(self, base_url: str = BINANCE_URL, max_workers: int = 8,
+                 weight_per_minute: float = WEIGHT_PER_MINUTE, request_weight: float = KLINES_WEIGHT,
+                 max_retries: int = 5, backoff: float = 0.5, timeout: float = 30,
+                 checkpoint_dir=None, session=None, progress: bool = True):
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.request_weight = request_weight
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.checkpoint_dir = checkpoint_dir
+        self.progress = progress
+        self.bucket = TokenBucket(capacity=weight_per_minute, rate=weight_per_minute / 60.0)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.stats = {"requests": 0, "retries": 0, "from_checkpoint": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    # ==== HTTP con reintentos ====
+    def _get(self, params: dict):
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire(self.request_weight)
+            self._count("requests")
+            try:
+                r = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+            else:
+                if r.status_code not in RETRY_STATUS:
+                    r.raise_for_status()
+                    return r.json()
+                if attempt == self.max_retries:
+                    r.raise_for_status()
+                retry_after = r.headers.get("Retry-After")
+                delay = float(retry_after) if retry_after else self.backoff * 2 ** attempt
+            self._count("retries")
+            time.sleep(delay * (1 + 0.1 * random.random()))
+
+    # ==== Checkpoints por ventana ====
+    def _checkpoint_path(self, symbol: str, interval: str, window) -> str:
+        # Clave (inicio, fin): con end=None ("ahora") la última ventana cambia entre corridas y
+        # una ventana truncada de una corrida previa no debe reusarse como si estuviera completa
+        return os.path.join(self.checkpoint_dir, f"{symbol}_{interval}", f"{window[0]}_{window[1]}.json")
+
+    def _fetch_window(self, symbol: str, interval: str, window) -> list:
+        path = self._checkpoint_path(symbol, interval, window) if self.checkpoint_dir else None
+        if path and os.path.exists(path):
+            self._count("from_checkpoint")
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        rows = self._get(dict(symbol=symbol, interval=interval, limit=KLINES_LIMIT,
+                              startTime=window[0], endTime=window[1] - 1))
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(rows, f)
+            os.replace(tmp, path)
+        return rows
+
+    # ==== API pública ====
+    def fetch(self, symbol: str, interval: str, start_ms: int, end_ms: int,
+              keep_checkpoint: bool = False) -> list:
+        """
+        Filas crudas de klines con Open time en [start_ms, end_ms), ordenadas y sin duplicados.
+        Si todas las ventanas se descargan, se borra el checkpoint (salvo keep_checkpoint=True).
+        """
+        windows = plan_windows(start_ms, end_ms, interval)
+        pages = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool, \
+             tqdm(total=len(windows), desc=f"Descargando {symbol} {interval}",
+                  disable=not self.progress) as pbar:
+            futures = {pool.submit(self._fetch_window, symbol, interval, w): w for w in windows}
+            for fut in as_completed(futures):
+                pages[futures[fut][0]] = fut.result()
+                pbar.update(1)
+
+        rows, seen = [], set()
+        for w in windows:
+            for row in pages[w[0]]:
+                if start_ms <= row[0] < end_ms and row[0] not in seen:
+                    seen.add(row[0])
+                    rows.append(row)
+        rows.sort(key=lambda r: r[0])
+
+        if self.checkpoint_dir and not keep_checkpoint:
+            shutil.rmtree(os.path.join(self.checkpoint_dir, f"{symbol}_{interval}"), ignore_errors=True)
+        return rows
+
+    def fetch_many(self, jobs) -> dict:
+        """jobs: iterable de (symbol, interval, start_ms, end_ms) -> {(symbol, interval): filas}."""
+        return {(sym, itv): self.fetch(sym, itv, s, e) for sym, itv, s, e in jobs}
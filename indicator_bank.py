@@ -0,0 +1,123 @@
+# indicator_bank.py
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import ta
+
+# Rangos por defecto = espacio de búsqueda de optimize.objective_factory
+RSI_WINDOWS = tuple(range(8, 21))
+SMA_WINDOWS = tuple(range(8, 121))
+EMA_WINDOWS = tuple(range(8, 15)) + tuple(range(18, 31))   # macd_fast 8–14, macd_slow 18–30
+MAX_CACHED_COLUMNS = 64
+MAX_EAGER_MB = 256          # bloque fijo de columnas (RSI, EMA y luego SMA, en ese orden)
+MAX_CACHED_MB = 256         # LRU de columnas fuera del bloque
+MIN_CACHED_COLUMNS = 8      # un trial usa hasta 6 columnas (RSI, 2 SMA, 2 EMA, señal MACD)
+
+class IndicatorBank:
+    """
+    Indicadores compartidos entre trials, calculados una sola vez por dataset y ventana.
+    - Bloque fijo: un arreglo 2-D float64 (orden Fortran) con una columna por ventana de los
+      rangos, en orden RSI (ta), EMA (spans de MACD) y SMA, hasta max_eager_mb. Cada columna
+      se calcula la primera vez que se pide, así que construir el banco no calcula nada.
+    - El resto (SMAs que no entran, ventanas fuera de rango, líneas de señal de MACD) va a un
+      LRU acotado a max_cached columnas y max_cached_mb, para que la memoria sea predecible
+      también con millones de velas.
+    Los valores son idénticos a los que calcula add_indicators_and_signals.
+    """
+
+    def __init__(self, df: pd.DataFrame,
+                 rsi_windows=RSI_WINDOWS, sma_windows=SMA_WINDOWS, ema_windows=EMA_WINDOWS,
+                 max_cached: int = MAX_CACHED_COLUMNS, max_eager_mb: float = MAX_EAGER_MB,
+                 max_cached_mb: float = MAX_CACHED_MB):
+        self.df = df
+        self._close = df["Close"]
+        col_bytes = 8 * max(len(df), 1)
+        self.max_cached = max(MIN_CACHED_COLUMNS,
+                              min(int(max_cached), int(max_cached_mb * 2**20 // col_bytes)))
+
+        keys = [("rsi", int(w)) for w in rsi_windows] \
+             + [("ema", int(w)) for w in ema_windows] \
+             + [("sma", int(w)) for w in sma_windows]
+        keys = keys[:int(max_eager_mb * 2**20 // col_bytes)]
+        self._columns = {key: j for j, key in enumerate(keys)}
+        self._values = np.empty((len(df), len(keys)), dtype=np.float64, order="F")
+        self._filled = np.zeros(len(keys), dtype=bool)
+
+        self._lru = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # ==== Cálculo (mismas llamadas que signals.add_indicators_and_signals) ====
+    def _compute(self, key) -> np.ndarray:
+        kind = key[0]
+        if kind == "rsi":
+            out = ta.momentum.RSIIndicator(close=self._close, window=key[1]).rsi()
+        elif kind == "sma":
+            out = self._close.rolling(window=key[1], min_periods=key[1]).mean()
+        elif kind == "ema":
+            out = self._close.ewm(span=key[1], min_periods=key[1], adjust=False).mean()
+        elif kind == "macd_sig":
+            _, fast, slow, sign = key
+            macd_line = pd.Series(self._macd_line(fast, slow), index=self._close.index)
+            out = macd_line.ewm(span=sign, min_periods=sign, adjust=False).mean()
+        else:
+            raise KeyError(key)
+        return out.to_numpy(dtype=np.float64)
+
+    def _get(self, key) -> np.ndarray:
+        j = self._columns.get(key)
+        if j is not None:
+            if self._filled[j]:
+                self.hits += 1
+            else:
+                self.misses += 1
+                self._values[:, j] = self._compute(key)
+                self._filled[j] = True
+            return self._values[:, j]
+        col = self._lru.get(key)
+        if col is not None:
+            self.hits += 1
+            self._lru.move_to_end(key)
+            return col
+        self.misses += 1
+        col = self._compute(key)
+        self._lru[key] = col
+        while len(self._lru) > self.max_cached:
+            self._lru.popitem(last=False)
+        return col
+
+    def _macd_line(self, fast: int, slow: int) -> np.ndarray:
+        return self._get(("ema", int(fast))) - self._get(("ema", int(slow)))
+
+    # ==== API pública ====
+    def rsi(self, window: int) -> np.ndarray:
+        return self._get(("rsi", int(window)))
+
+    def sma(self, window: int) -> np.ndarray:
+        return self._get(("sma", int(window)))
+
+    def ema(self, span: int) -> np.ndarray:
+        return self._get(("ema", int(span)))
+
+    def macd(self, fast: int, slow: int, signal: int):
+        """Devuelve (macd, macd_signal) como en ta.trend.MACD."""
+        macd_line = self._macd_line(fast, slow)
+        macd_sig = self._get(("macd_sig", int(fast), int(slow), int(signal)))
+        return macd_line, macd_sig
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes de columnas ya calculadas (bloque fijo + LRU)."""
+        filled = int(self._filled.sum()) * self._values.shape[0] * self._values.itemsize
+        return int(filled + sum(c.nbytes for c in self._lru.values()))
+
+    def cache_info(self) -> dict:
+        return {
+            "eager_columns": len(self._columns),
+            "filled_columns": int(self._filled.sum()),
+            "cached_columns": len(self._lru),
+            "max_cached": self.max_cached,
+            "hits": self.hits,
+            "misses": self.misses,
+            "nbytes": self.nbytes,
+        }
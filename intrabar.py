@@ -0,0 +1,145 @@
+# intrabar.py
+import os
+import time
+import numpy as np
+import pandas as pd
+from candle_store import CandleStore, COLUMNS
+from ledger import LONG
+from utils import INTERVAL_MS
+
+# ===== Orden intravela de SL/TP: velas finas bajo demanda =====
+OFFSETS_FILE = "offsets_{interval}.npy"
+OFFSETS_HEADER = 3          # [origen ns, largo de vela gruesa ns, filas del almacén fino]
+BYTES_PER_ROW = 16          # High + Low (float64) por vela fina leída
+BYTES_PER_LOOKUP = 16       # dos offsets int64 por vela gruesa consultada
+
+def build_offsets(ts: np.ndarray, bar_ns: int):
+    """
+    Índice por vela gruesa sobre timestamps finos ordenados: offsets[k]:offsets[k+1] son las filas
+    finas de la vela gruesa k (que abre en origin + k * bar_ns). Devuelve (origin, offsets).
+    """
+    origin = int(ts[0]) - int(ts[0]) % bar_ns
+    n_bars = (int(ts[-1]) - origin) // bar_ns + 1
+    grid = origin + np.arange(n_bars + 1, dtype=np.int64) * bar_ns
+    return origin, np.searchsorted(ts, grid, side="left").astype(np.int64)
+
+def aggregate_ohlcv(df: pd.DataFrame, interval: str = "1h") -> pd.DataFrame:
+    """Velas finas -> velas de `interval` (Open primero, High máx, Low mín, Close último, Volume suma)."""
+    bar_ns = INTERVAL_MS[interval] * 1_000_000
+    idx = pd.DatetimeIndex(df.index)
+    tz = idx.tz
+    ts = idx.as_unit("ns").asi8
+    key = ts - ts % bar_ns
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+    out = {
+        "Open": df["Open"].to_numpy(dtype=np.float64)[starts],
+        "High": np.maximum.reduceat(df["High"].to_numpy(dtype=np.float64), starts),
+        "Low": np.minimum.reduceat(df["Low"].to_numpy(dtype=np.float64), starts),
+        "Close": df["Close"].to_numpy(dtype=np.float64)[ends],
+        "Volume": np.add.reduceat(df["Volume"].to_numpy(dtype=np.float64), starts),
+    }
+    index = pd.DatetimeIndex(key[starts].view("datetime64[ns]"), name="Open time")
+    if tz is not None:
+        index = index.tz_localize("UTC").tz_convert(tz)
+    return pd.DataFrame(out, index=index)[list(COLUMNS)]
+
+class IntrabarResolver:
+    """
+    Decide qué nivel se tocó primero en una vela gruesa (p. ej. 1h) cuando su rango cruza SL y TP,
+    recorriendo sólo las velas finas (p. ej. 1m) de esa vela en un CandleStore mapeado en memoria.
+    - El índice por vela gruesa (offsets_<intervalo>.npy) se guarda junto al almacén fino y se
+      reconstruye si el almacén cambió de tamaño.
+    - Si SL y TP caen en la misma vela fina, o no hay velas finas, se asume SL primero (conservador,
+      igual que el backtest sin resolución).
+    stats() acumula cuántas velas se bajaron de resolución y cuántos bytes finos se leyeron.
+    """
+
+    def __init__(self, fine, bar_interval: str = "1h", fine_interval: str = "1m"):
+        self.store = fine if isinstance(fine, CandleStore) else CandleStore(fine, interval=fine_interval)
+        if not self.store.exists():
+            raise FileNotFoundError(f"no hay velas finas en {self.store.root}")
+        self.bar_interval = bar_interval
+        self.bar_ns = INTERVAL_MS[bar_interval] * 1_000_000
+        if self.bar_ns <= self.store.interval_ns:
+            raise ValueError(f"el almacén fino ({self.store.interval}) debe ser menor que {bar_interval}")
+        self._high = self.store.column("High")
+        self._low = self.store.column("Low")
+        self.rows = len(self._high)
+        self.origin, self._offsets = self._load_offsets()
+        self.reset_stats()
+
+    def _load_offsets(self):
+        path = self.store._path(OFFSETS_FILE.format(interval=self.bar_interval))
+        if os.path.exists(path):
+            arr = np.load(path, mmap_mode="r")
+            if len(arr) > OFFSETS_HEADER and int(arr[1]) == self.bar_ns and int(arr[2]) == self.rows:
+                return int(arr[0]), arr[OFFSETS_HEADER:]
+        origin, offsets = build_offsets(self.store.timestamps(), self.bar_ns)
+        arr = np.concatenate(([origin, self.bar_ns, self.rows], offsets)).astype(np.int64)
+        tmp = path[:-4] + ".tmp.npy"
+        np.save(tmp, arr)
+        os.replace(tmp, path)
+        return origin, np.load(path, mmap_mode="r")[OFFSETS_HEADER:]
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifica el almacén fino (para claves de caché): intervalos, filas y última vela."""
+        last = int(self.store.timestamps()[-1])
+        return f"{self.store.interval}/{self.bar_interval}:{self.rows}:{last}"
+
+    def sl_first(self, bar_open_ns: int, side: int, sl_price: float, tp_price: float) -> bool:
+        """True si el SL se tocó antes que el TP dentro de la vela gruesa que abre en bar_open_ns."""
+        t0 = time.perf_counter()
+        self.drilldowns += 1
+        k = (int(bar_open_ns) - self.origin) // self.bar_ns
+        a = b = 0
+        if 0 <= k < len(self._offsets) - 1:
+            a, b = int(self._offsets[k]), int(self._offsets[k + 1])
+            self.io_bytes += BYTES_PER_LOOKUP
+        result = True
+        if a == b:
+            self.unresolved += 1
+        else:
+            high, low = self._high[a:b], self._low[a:b]
+            self.fine_rows += b - a
+            self.io_bytes += (b - a) * BYTES_PER_ROW
+            if side == LONG:
+                sl_hit, tp_hit = low <= sl_price, high >= tp_price
+            else:
+                sl_hit, tp_hit = high >= sl_price, low <= tp_price
+            i_sl = int(sl_hit.argmax()) if sl_hit.any() else b - a
+            i_tp = int(tp_hit.argmax()) if tp_hit.any() else b - a
+            if i_tp < i_sl:
+                self.tp_first += 1
+                result = False
+            elif i_sl < i_tp:
+                self.sl_first_count += 1
+            elif i_sl == b - a:
+                self.unresolved += 1     # las velas finas no confirman ningún nivel
+            else:
+                self.ties += 1
+        self.seconds += time.perf_counter() - t0
+        return result
+
+    def reset_stats(self):
+        self.drilldowns = 0
+        self.sl_first_count = 0
+        self.tp_first = 0
+        self.ties = 0
+        self.unresolved = 0
+        self.fine_rows = 0
+        self.io_bytes = 0
+        self.seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "drilldowns": self.drilldowns,
+            "sl_first": self.sl_first_count,
+            "tp_first": self.tp_first,
+            "ties": self.ties,
+            "unresolved": self.unresolved,
+            "fine_rows": self.fine_rows,
+            "io_bytes": self.io_bytes,
+            "seconds": self.seconds,
+        }
@@ -0,0 +1,168 @@
+# ledger.py
+import numpy as np
+import pandas as pd
+
+# ===== Registro estructurado de operaciones =====
+# Motivos de salida (códigos int8 en el campo "reason")
+EXIT_SL, EXIT_TP, EXIT_SIGNAL, EXIT_FORCED = 0, 1, 2, 3
+EXIT_REASONS = ("SL", "TP", "signal", "forced")
+
+# Lado (int8 en el campo "side")
+LONG, SHORT = 1, -1
+
+TRADE_DTYPE = np.dtype([
+    ("entry_idx", np.int64),        # posición de la vela de entrada
+    ("exit_idx", np.int64),         # posición de la vela de salida
+    ("entry_time", "datetime64[ns]"),
+    ("exit_time", "datetime64[ns]"),
+    ("side", np.int8),              # 1 long / -1 short
+    ("qty", np.float64),
+    ("entry_price", np.float64),
+    ("exit_price", np.float64),
+    ("fees", np.float64),           # comisión de entrada + salida
+    ("pnl", np.float64),            # neto de comisiones
+    ("reason", np.int8),            # índice en EXIT_REASONS
+    ("mae", np.float64),            # máxima excursión adversa (fracción del precio de entrada)
+    ("mfe", np.float64),            # máxima excursión favorable (fracción del precio de entrada)
+])
+
+class TradeLedger:
+    """
+    Arreglo estructurado preasignado que crece al doble cuando se llena.
+    El motor llama add() al cerrar cada operación; to_array() devuelve la vista recortada.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self._buf = np.zeros(max(int(capacity), 1), dtype=TRADE_DTYPE)
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def add(self, entry_idx: int, exit_idx: int, side: int, qty: float,
+            entry_price: float, exit_price: float, fees: float, pnl: float, reason: int):
+        if self._n == len(self._buf):
+            grown = np.zeros(2 * len(self._buf), dtype=TRADE_DTYPE)
+            grown[:self._n] = self._buf
+            self._buf = grown
+        rec = self._buf[self._n]
+        rec["entry_idx"] = entry_idx
+        rec["exit_idx"] = exit_idx
+        rec["side"] = side
+        rec["qty"] = qty
+        rec["entry_price"] = entry_price
+        rec["exit_price"] = exit_price
+        rec["fees"] = fees
+        rec["pnl"] = pnl
+        rec["reason"] = reason
+        self._n += 1
+
+    def to_array(self) -> np.ndarray:
+        return self._buf[:self._n]
+
+def finalize_trades(trades: np.ndarray, index: pd.Index, high: np.ndarray, low: np.ndarray) -> np.ndarray:
+    """
+    Completa en sitio timestamps y MAE/MFE del ledger con operaciones vectorizadas.
+    entry_idx/exit_idx son posiciones en `index` (el mismo tramo que high/low y la equity).
+    MAE/MFE se miden sobre las velas posteriores a la entrada hasta la salida (inclusive);
+    en salidas por SL/TP la vela de salida se recorta al precio de salida.
+    """
+    if len(trades) == 0:
+        return trades
+    times = np.asarray(index.values).astype("datetime64[ns]")
+    trades["entry_time"] = times[trades["entry_idx"]]
+    trades["exit_time"] = times[trades["exit_idx"]]
+
+    # SL/TP cierran dentro de la vela: lo que el High/Low recorre más allá del precio
+    # de salida (en la dirección en que salió) no lo vivió la posición. Las salidas al
+    # cierre sí vieron toda la vela.
+    is_long = trades["side"] == LONG
+    is_sl, is_tp = trades["reason"] == EXIT_SL, trades["reason"] == EXIT_TP
+    down = (is_long & is_sl) | (~is_long & is_tp)       # salió por abajo: recortar Low
+    up = (is_long & is_tp) | (~is_long & is_sl)         # salió por arriba: recortar High
+    if down.any() or up.any():
+        high = np.array(high, dtype=np.float64)
+        low = np.array(low, dtype=np.float64)
+        x, px = trades["exit_idx"][up], trades["exit_price"][up]
+        high[x] = np.minimum(high[x], px)
+        x, px = trades["exit_idx"][down], trades["exit_price"][down]
+        low[x] = np.maximum(low[x], px)
+
+    # Extremos por operación: las operaciones no se solapan y van ordenadas, así que
+    # un reduceat sobre los pares [entrada+1, salida+1) basta.
+    n = len(high)
+    s = trades["entry_idx"] + 1
+    e = trades["exit_idx"] + 1
+    bounds = np.empty(2 * len(trades), dtype=np.int64)
+    bounds[0::2] = np.minimum(s, n - 1)
+    bounds[1::2] = np.minimum(e, n - 1)
+    hi_ext = np.maximum.reduceat(high, bounds)[0::2]
+    lo_ext = np.minimum.reduceat(low, bounds)[0::2]
+    # Salidas en la última vela: el recorte a n-1 la deja fuera del tramo
+    at_end = e == n
+    hi_ext = np.where(at_end, np.maximum(hi_ext, high[-1]), hi_ext)
+    lo_ext = np.where(at_end, np.minimum(lo_ext, low[-1]), lo_ext)
+    # Entrada y salida en la misma vela (cierre forzado): sin excursión
+    entry = trades["entry_price"]
+    valid = s < e
+    hi_ext = np.where(valid, hi_ext, entry)
+    lo_ext = np.where(valid, lo_ext, entry)
+
+    up = (hi_ext - entry) / entry
+    down = (entry - lo_ext) / entry
+    trades["mae"] = np.maximum(np.where(is_long, down, up), 0.0)
+    trades["mfe"] = np.maximum(np.where(is_long, up, down), 0.0)
+    return trades
+
+# ===== Analítica (consultas vectorizadas, sin re-simular) =====
+def trades_to_frame(trades: np.ndarray) -> pd.DataFrame:
+    """DataFrame legible: side y reason como texto, duración en horas."""
+    df = pd.DataFrame(trades)
+    df["side"] = np.where(trades["side"] == LONG, "long", "short")
+    df["reason"] = pd.Categorical.from_codes(trades["reason"], categories=list(EXIT_REASONS))
+    df["duration_h"] = holding_hours(trades)
+    return df
+
+def holding_hours(trades: np.ndarray) -> np.ndarray:
+    return (trades["exit_time"] - trades["entry_time"]) / np.timedelta64(1, "h")
+
+def win_rate_by_side(trades: np.ndarray) -> pd.DataFrame:
+    rows = {}
+    for name, code in (("long", LONG), ("short", SHORT)):
+        pnl = trades["pnl"][trades["side"] == code]
+        rows[name] = {
+            "Trades": int(len(pnl)),
+            "WinRate": float((pnl > 0).mean()) if len(pnl) else float("nan"),
+            "PnL": float(pnl.sum()),
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+def pnl_by_exit_reason(trades: np.ndarray) -> pd.DataFrame:
+    codes = trades["reason"].astype(np.int64)
+    k = len(EXIT_REASONS)
+    count = np.bincount(codes, minlength=k)
+    total = np.bincount(codes, weights=trades["pnl"], minlength=k)
+    wins = np.bincount(codes, weights=trades["pnl"] > 0, minlength=k)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = pd.DataFrame({
+            "Trades": count,
+            "PnL": total,
+            "PnL_medio": total / count,
+            "WinRate": wins / count,
+        }, index=pd.Index(EXIT_REASONS, name="reason"))
+    return out
+
+def duration_histogram(trades: np.ndarray, bins=(0, 1, 2, 4, 8, 24, 72, 168, np.inf)) -> pd.Series:
+    """Conteo de operaciones por duración (horas), en intervalos [a, b)."""
+    bins = np.asarray(bins, dtype=float)
+    counts, _ = np.histogram(holding_hours(trades), bins=bins)
+    labels = [f"[{a:g}, {b:g})" for a, b in zip(bins[:-1], bins[1:])]
+    return pd.Series(counts, index=pd.Index(labels, name="horas"), name="Trades")
+
+def export_trades(trades: np.ndarray, path: str):
+    """Exporta el ledger a .parquet o .csv según la extensión."""
+    df = trades_to_frame(trades)
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
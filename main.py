@@ -1,109 +1,553 @@
 # main.py
-import os
+import argparse
 import json
-import numpy as np
-import pandas as pd
-from tqdm import tqdm
-
-from data_loader import load_btcusdt_hourly
-from utils import split_by_ratio, returns_table
-from signals import add_indicators_and_signals
-from backtest import backtest
-from optimize import objective_factory
-from plots import plot_equity, plot_drawdown
-import optuna
-
-def main():
+import os
+import sys
+import time
+
+from profiling import Profiler, stage, use_profiler
+
+# Arranque del proceso (para medir el tiempo hasta la carga de datos)
+_T0 = time.perf_counter()
+
+# numpy/pandas, ta, optuna, matplotlib, requests y tqdm se importan dentro de cada paso:
+# cada subcomando sólo paga las dependencias que usa.
+OUT_DIR = "outputs"
+PARAMS_PATH = "outputs/best_params.json"
+CACHE_DIR = "outputs/cache"
+BUNDLE_PATH = "outputs/results.npz"
+SPLITS = ("test", "validation")
+COMMANDS = ("run", "fetch", "optimize", "evaluate", "walkforward", "batch",
+            "paper", "report", "plot", "export")
+
+def main(engine: str = "numpy", chunk_order: str = "natural",
+         n_trials: int = 60, n_workers: int = 1, storage=None,
+         profile: bool = False, track_memory: bool = False, n_boot: int = 10_000,
+         cache_dir=CACHE_DIR, legacy: bool = False):
+    """Pipeline completo: datos -> optimización -> test/validación -> reporte -> gráficas."""
+    prof = Profiler(enabled=profile, track_memory=track_memory)
+    with use_profiler(prof), prof.stage("main"):
+        _pipeline(engine, chunk_order, n_trials, n_workers, storage, profile, n_boot, cache_dir, legacy)
+    _save_profile(prof)
+
+def _pipeline(engine, chunk_order, n_trials, n_workers, storage, profile, n_boot, cache_dir, legacy):
     # 1) Datos
-    print("1) Descargando datos...")
-    df = load_btcusdt_hourly(start="2018-01-01")
-    print(f"Datos: {df.index[0]} \u2192 {df.index[-1]} | {len(df)} velas")
+    with stage("1_datos"):
+        df = _load_data()
 
     # 2) Split 60/20/20
-    train_df, test_df, val_df = split_by_ratio(df, train=0.6, test=0.2)
+    with stage("2_split"):
+        train_df, test_df, val_df = _split(df)
 
     # 2.1) Optuna (Calmar, walk-forward)
+    with stage("3_optimize"):
+        p, cache_stats = _optimize(train_df, engine, chunk_order, n_trials, n_workers,
+                                   storage, profile, cache_dir)
+
+    # 3) TEST y 4) VALIDATION
+    cache = _open_cache(cache_dir)
+    results = _evaluate_splits({"test": test_df, "validation": val_df}, p, cache)
+    equities = {name: r[0] for name, r in results.items()}
+    tables = _returns_tables(equities)
+    _export_evaluation(results, p, tables, legacy)
+
+    # 5) Tablas de rendimientos y robustez
+    _report(equities, n_boot, tables)
+
+    # 6) Gráficas
+    with stage("9_plots"):
+        _plot(equities)
+
+    if cache is not None:
+        _print_cache_stats(cache_stats + [cache.stats()])
+
+# ===== Pasos =====
+def _load_data(start="2018-01-01", end=None, update: bool = False):
+    from data_loader import load_btcusdt_hourly
+
+    print("1) Descargando datos...")
+    df = load_btcusdt_hourly(start=start, end=end, update=update)
+    print(f"Datos: {df.index[0]} → {df.index[-1]} | {len(df)} velas")
+    return df
+
+def _split(df):
+    from utils import split_by_ratio
+
+    return split_by_ratio(df, train=0.6, test=0.2)
+
+def _open_cache(cache_dir):
+    if not cache_dir:
+        return None
+    from cache import ResultCache
+
+    return ResultCache(cache_dir)
+
+def _optimize(train_df, engine, chunk_order, n_trials, n_workers, storage, profile, cache_dir):
+    """Estudio Optuna sobre TRAIN; guarda best_params/best_value/optuna_trials en outputs/."""
+    import optuna
+    from optimize import objective_factory, run_parallel_study
+
     print("2) Optimizando en TRAIN (walk-forward)...")
-    study = optuna.create_study(
-        direction="maximize",
-        sampler=optuna.samplers.TPESampler(seed=42),
-        pruner=optuna.pruners.MedianPruner(n_startup_trials=10),
-    )
-    objective = objective_factory(train_df, n_splits=5, min_trades_per_chunk=15)
-    study.optimize(objective, n_trials=60, show_progress_bar=True)
+    objective_kwargs = dict(n_splits=5, min_trades_per_chunk=15,
+                            engine=engine, chunk_order=chunk_order, profile=profile,
+                            cache=cache_dir or None)
+    cache_stats = []
+    if n_workers > 1 or storage is not None:
+        # Pool de procesos + storage en archivo; sólo se reanuda con --storage explícito
+        study, worker_stats = run_parallel_study(
+            train_df, n_trials=n_trials, n_workers=n_workers,
+            storage=storage or "outputs/optuna_journal.log", resume=storage is not None,
+            **objective_kwargs,
+        )
+        for s in worker_stats:
+            print(f"  worker {s['worker']}: {s['trials']} trials en {s['seconds']:.1f}s "
+                  f"({s['trials_per_min']:.1f} trials/min)")
+            if s["cache"] is not None:
+                cache_stats.append(s["cache"])
+    else:
+        study = optuna.create_study(
+            direction="maximize",
+            sampler=optuna.samplers.TPESampler(seed=42),
+            pruner=optuna.pruners.MedianPruner(n_startup_trials=10),
+        )
+        objective = objective_factory(train_df, **objective_kwargs)
+        study.optimize(objective, n_trials=n_trials, show_progress_bar=True)
+        if objective.cache is not None:
+            cache_stats.append(objective.cache.stats())
 
     p = study.best_params
     print("\nMejores hiperparámetros:")
     for k, v in p.items():
         print(f"  {k}: {v}")
     print(f"Mejor Calmar (train): {study.best_value:.4f}")
+    pruned = [t for t in study.trials if t.state == optuna.trial.TrialState.PRUNED]
+    saved = sum(t.user_attrs.get("time_saved_s", 0.0) for t in study.trials)
+    print(f"Trials podados: {len(pruned)}/{len(study.trials)} | tiempo ahorrado (estimado): {saved:.1f}s")
 
     # Guardar resultados Optuna
-    os.makedirs("outputs", exist_ok=True)
-    with open("outputs/best_params.json", "w", encoding="utf-8") as f:
-        json.dump(p, f, indent=2)
-    with open("outputs/best_value.json", "w", encoding="utf-8") as f:
-        json.dump({"best_calmar_train": study.best_value}, f, indent=2)
-    try:
-        df_trials = study.trials_dataframe(attrs=("number","value","state","params","user_attrs","system_attrs","duration"))
-        df_trials.to_csv("outputs/optuna_trials.csv", index=False)
-    except Exception as e:
-        print("Aviso: no se pudo exportar optuna_trials.csv:", e)
-
-    # 3) TEST
-    print("\n3) TEST...")
-    test_sig = add_indicators_and_signals(
-        test_df,
-        p["rsi_window"], p["rsi_low"], p["rsi_high"],
-        p["sma_fast"], p["sma_slow"], p["macd_fast"], p["macd_slow"], p["macd_signal"],
-    )
-    eq_test, m_test = backtest(test_sig, p["sl"], p["tp"], p["n_shares"])
-    print(m_test)
-
-    # 4) VALIDATION
-    print("\n4) VALIDATION...")
-    val_sig = add_indicators_and_signals(
-        val_df,
-        p["rsi_window"], p["rsi_low"], p["rsi_high"],
-        p["sma_fast"], p["sma_slow"], p["macd_fast"], p["macd_slow"], p["macd_signal"],
-    )
-    eq_val, m_val = backtest(val_sig, p["sl"], p["tp"], p["n_shares"])
-    print(m_val)
+    with stage("3b_export_optuna"):
+        os.makedirs(OUT_DIR, exist_ok=True)
+        with open(PARAMS_PATH, "w", encoding="utf-8") as f:
+            json.dump(p, f, indent=2)
+        with open("outputs/best_value.json", "w", encoding="utf-8") as f:
+            json.dump({"best_calmar_train": study.best_value}, f, indent=2)
+        try:
+            df_trials = study.trials_dataframe(attrs=("number","value","state","params","user_attrs","system_attrs","duration"))
+            df_trials.to_csv("outputs/optuna_trials.csv", index=False)
+        except Exception as e:
+            print("Aviso: no se pudo exportar optuna_trials.csv:", e)
+    return p, cache_stats
+
+def _evaluate(df_split, p, cache, resolver=None):
+    """Señales + backtest de un tramo con los mejores parámetros, consultando la caché primero."""
+    import numpy as np
+    from signals import add_indicators_and_signals
+    from backtest import backtest, backtest_context
+
+    def _compute():
+        sig = add_indicators_and_signals(
+            df_split,
+            p["rsi_window"], p["rsi_low"], p["rsi_high"],
+            p["sma_fast"], p["sma_slow"], p["macd_fast"], p["macd_slow"], p["macd_signal"],
+        )
+        eq, m, trades = backtest(sig, p["sl"], p["tp"], p["n_shares"], return_trades=True,
+                                 resolver=resolver)
+        counts = np.array([int(sig["BUY_SIG"].sum()), int(sig["SELL_SIG"].sum())])
+        return eq, m, {"trades": trades, "signal_counts": counts}
+
+    if cache is None:
+        eq, m, extra = _compute()
+    else:
+        from cache import frame_fingerprint, result_key
+
+        key = result_key(frame_fingerprint(df_split), {**p, "eval": "full"},
+                         backtest_context(resolver=resolver))
+        eq, m, extra = cache.get_or_compute(key, _compute)
+    return eq, m, extra["trades"], extra["signal_counts"]
+
+def _evaluate_splits(splits: dict, p: dict, cache, resolver=None) -> dict:
+    """Evalúa cada tramo {nombre: df}; devuelve {nombre: (equity, metrics, trades, counts)}."""
+    from ledger import pnl_by_exit_reason, win_rate_by_side
+
+    results = {}
+    for step, (name, df_split) in enumerate(splits.items(), start=3):
+        with stage("4_test" if name == "test" else "5_validation" if name == "validation" else f"5_{name}"):
+            print(f"\n{step}) {name.upper()}...")
+            results[name] = _evaluate(df_split, p, cache, resolver)
+            print(results[name][1])
 
     # Conteos de señales (diagnóstico)
-    print("\nConteos de señales (TEST):")
-    print("BUY_SIG:", int(test_sig["BUY_SIG"].sum()), "SELL_SIG:", int(test_sig["SELL_SIG"].sum()))
-    print("\nConteos de señales (VALIDATION):")
-    print("BUY_SIG:", int(val_sig["BUY_SIG"].sum()), "SELL_SIG:", int(val_sig["SELL_SIG"].sum()))
-
-    # 5) Tablas de rendimientos (VALIDATION)
-    print("\n5) Tablas de rendimientos (VALIDATION)")
-    print(returns_table(eq_val, "ME"))
-    print(returns_table(eq_val, "QE"))
-    print(returns_table(eq_val, "YE"))
-
-    # Exportar métricas y curvas a outputs/
-    with open("outputs/metrics_test.json", "w", encoding="utf-8") as f:
-        json.dump(m_test, f, indent=2)
-    pd.DataFrame({"Equity": eq_test.values}, index=eq_test.index).to_csv("outputs/equity_test.csv")
-
-    with open("outputs/metrics_validation.json", "w", encoding="utf-8") as f:
-        json.dump(m_val, f, indent=2)
-    pd.DataFrame({"Equity": eq_val.values}, index=eq_val.index).to_csv("outputs/equity_validation.csv")
-
-    # Exportar tablas returns
-    rt_test_m = returns_table(eq_test, "ME"); rt_test_q = returns_table(eq_test, "QE"); rt_test_a = returns_table(eq_test, "YE")
-    rt_val_m  = returns_table(eq_val, "ME");  rt_val_q  = returns_table(eq_val, "QE");  rt_val_a  = returns_table(eq_val, "YE")
-    rt_test_m.to_csv("outputs/returns_test_monthly.csv"); rt_test_q.to_csv("outputs/returns_test_quarterly.csv"); rt_test_a.to_csv("outputs/returns_test_annual.csv")
-    rt_val_m.to_csv("outputs/returns_validation_monthly.csv"); rt_val_q.to_csv("outputs/returns_validation_quarterly.csv"); rt_val_a.to_csv("outputs/returns_validation_annual.csv")
+    with stage("6_diagnostico"):
+        for name, (_, _, _, counts) in results.items():
+            print(f"\nConteos de señales ({name.upper()}):")
+            print("BUY_SIG:", int(counts[0]), "SELL_SIG:", int(counts[1]))
+
+        # Analítica de operaciones sobre el ledger (sin re-simular)
+        name = "validation" if "validation" in results else list(results)[-1]
+        trades = results[name][2]
+        print(f"\nOperaciones por motivo de salida ({name.upper()}):")
+        print(pnl_by_exit_reason(trades))
+        print(win_rate_by_side(trades))
+    return results
+
+def _open_resolver(path):
+    """Resolver intravela de SL/TP sobre un almacén de velas de 1m (None si no se pidió)."""
+    if not path:
+        return None
+    from intrabar import IntrabarResolver
+
+    resolver = IntrabarResolver(path, bar_interval="1h", fine_interval="1m")
+    print(f"Resolución intravela: {resolver.rows} velas de 1m en {path}")
+    return resolver
+
+def _print_drilldown_stats(resolver):
+    st = resolver.stats()
+    print(f"\nVelas con SL y TP dentro del rango: {st['drilldowns']} bajadas a 1m "
+          f"({st['tp_first']} TP primero, {st['sl_first']} SL primero, {st['ties']} empates, "
+          f"{st['unresolved']} sin datos) | {st['fine_rows']} velas finas, "
+          f"{st['io_bytes'] / 2**10:.1f} KB extra en {st['seconds']:.3f}s")
+
+def _returns_tables(equities: dict) -> dict:
+    """{tramo: {"ME", "QE", "YE": tabla}} con una pasada agrupada por curva."""
+    from utils import returns_tables
+
+    with stage("7_returns_tables"):
+        return {name: returns_tables(eq) for name, eq in equities.items()}
+
+def _export_evaluation(results: dict, p: dict, tables: dict, legacy: bool = False):
+    """Paquete binario de la corrida (outputs/results.npz); con legacy, además los CSV/JSON de antes."""
+    from bundle import export_legacy, write_bundle
+
+    with stage("8_export"):
+        write_bundle(BUNDLE_PATH, results, params=p, tables=tables)
+        print(f"\nResultados: {BUNDLE_PATH}")
+        if legacy:
+            export_legacy(BUNDLE_PATH, OUT_DIR)
+            print("Archivos CSV/JSON (formato anterior) en outputs/")
+
+def _report(equities: dict, n_boot: int, tables: dict = None):
+    """Tablas de rendimientos (ME/QE/YE) de validación y robustez por bootstrap (exportada a outputs/)."""
+    from robustness import bootstrap_returns
+
+    tables = tables or _returns_tables(equities)
+    shown = "validation" if "validation" in equities else list(equities)[-1]
+    print(f"\n5) Tablas de rendimientos ({shown.upper()})")
+    for freq in ("ME", "QE", "YE"):
+        print(tables[shown][freq])
+
+    # 5.1) Robustez: bootstrap por bloques de los rendimientos horarios
+    if n_boot > 0:
+        with stage("7b_robustez"):
+            print(f"\n5.1) Robustez (bootstrap estacionario, {n_boot} trayectorias)")
+            for name, eq in equities.items():
+                res = bootstrap_returns(eq, n_paths=n_boot)
+                print(f"[{name}] P(ruina, DD>=50%): {res['prob_ruin']:.4f}")
+                print(res["summary"])
+                res["summary"].to_csv(f"outputs/robustness_{name}.csv")
+                with open(f"outputs/robustness_{name}.json", "w", encoding="utf-8") as f:
+                    json.dump({"n_paths": n_boot, "prob_ruin": res["prob_ruin"]}, f, indent=2)
+
+def _plot(equities: dict, n_workers=None):
+    from plots import render_many
 
-    # 6) Gráficas
     print("\n6) Graficando (guardando en carpeta outputs/)...")
-    plot_equity(eq_test, "Equity TEST", show=False, save="equity_test.png")
-    plot_drawdown(eq_test, "TEST", show=False, save="drawdown_test.png")
-    plot_equity(eq_val, "Equity VALIDATION", show=False, save="equity_validation.png")
-    plot_drawdown(eq_val, "VALIDATION", show=False, save="drawdown_validation.png")
+    jobs = []
+    for name, eq in equities.items():
+        jobs.append(("equity", eq, f"Equity {name.upper()}", f"equity_{name}.png"))
+        jobs.append(("drawdown", eq, name.upper(), f"drawdown_{name}.png"))
+        jobs.append(("panel", eq, f"Equity y drawdown {name.upper()}", f"panel_{name}.png"))
+    render_many(jobs, n_workers=n_workers)
     print("Listo. Revisa la carpeta outputs/.")
 
+def _open_bundle(path=BUNDLE_PATH, names=None):
+    """Paquete guardado por run/evaluate; comprueba que tenga los tramos pedidos."""
+    from bundle import ResultsBundle
+
+    if not os.path.exists(path):
+        raise SystemExit(f"No existe {path}: corre primero `python main.py evaluate`.")
+    bundle = ResultsBundle(path)
+    missing = [n for n in names or () if n not in bundle.splits]
+    if missing:
+        raise SystemExit(f"{path} no tiene los tramos {missing} (tiene {bundle.splits}).")
+    return bundle
+
+def _print_cache_stats(stats_list):
+    from cache import merge_stats
+
+    st = merge_stats(stats_list)
+    print(f"\nCaché de resultados: {st['memory_hits']} hits en memoria, {st['disk_hits']} en disco, "
+          f"{st['misses']} fallos (hit rate {st['hit_rate']:.1%}) | "
+          f"{st['entries']} entradas, {st['disk_bytes'] / 2**20:.1f} MB, {st['evictions']} desalojos")
+
+def _save_profile(prof: Profiler):
+    if not prof.enabled:
+        return
+    os.makedirs(OUT_DIR, exist_ok=True)
+    prof.to_json("outputs/profile.json")
+    prof.to_collapsed("outputs/profile.collapsed")
+    print("Perfil por etapa: outputs/profile.json | outputs/profile.collapsed")
+
+# ===== Subcomandos =====
+def cmd_run(args):
+    main(engine=args.engine, chunk_order=args.chunk_order, n_trials=args.n_trials,
+         n_workers=args.n_workers, storage=args.storage, profile=args.profile,
+         track_memory=args.track_memory, n_boot=args.n_boot,
+         cache_dir=None if args.no_cache else args.cache_dir, legacy=args.legacy)
+
+def cmd_fetch(args):
+    from data_loader import load_klines
+
+    df = load_klines(args.symbol, args.interval, start=args.start, end=args.end, update=True)
+    print(f"{args.symbol} {args.interval}: {df.index[0]} → {df.index[-1]} | {len(df)} velas")
+
+def cmd_optimize(args):
+    prof = Profiler(enabled=args.profile, track_memory=args.track_memory)
+    with use_profiler(prof), prof.stage("optimize"):
+        df = _load_data(args.start, args.end, update=args.update)
+        train_df, _, _ = _split(df)
+        cache_dir = None if args.no_cache else args.cache_dir
+        _, cache_stats = _optimize(train_df, args.engine, args.chunk_order, args.n_trials,
+                                   args.n_workers, args.storage, args.profile, cache_dir)
+    _save_profile(prof)
+    if cache_stats:
+        _print_cache_stats(cache_stats)
+    print(f"Parámetros guardados en {PARAMS_PATH}")
+
+def cmd_evaluate(args):
+    with open(args.params, "r", encoding="utf-8") as f:
+        p = json.load(f)
+    # Módulos del camino de evaluación (numpy/pandas); optuna, matplotlib, requests y tqdm no se cargan
+    import data_loader, backtest, cache  # noqa: F401
+    print(f"Arranque: {time.perf_counter() - _T0:.3f}s (antes de cargar datos)")
+
+    df = _load_data(args.start, args.end, update=args.update)
+    _, test_df, val_df = _split(df)
+    splits = {name: d for name, d in (("test", test_df), ("validation", val_df), ("full", df))
+              if name in args.splits}
+    cache = None if args.no_cache else _open_cache(args.cache_dir)
+    resolver = _open_resolver(args.intrabar)
+    results = _evaluate_splits(splits, p, cache, resolver)
+    tables = _returns_tables({name: r[0] for name, r in results.items()})
+    _export_evaluation(results, p, tables, args.legacy)
+    if resolver is not None:
+        _print_drilldown_stats(resolver)
+    if cache is not None:
+        _print_cache_stats([cache.stats()])
+
+def cmd_walkforward(args):
+    import pandas as pd
+    from walkforward import run_walkforward
+
+    df = _load_data(args.start, args.end, update=args.update)
+    mode = "anchored" if args.anchored else "rolling"
+    print(f"Walk-forward {mode}: train {args.train_months}m / OOS {args.test_months}m / paso {args.step_months}m")
+    results, equity, metrics = run_walkforward(
+        df, train_months=args.train_months, test_months=args.test_months,
+        step_months=args.step_months, anchored=args.anchored, n_trials=args.n_trials,
+        n_workers=args.n_workers, top_k=args.top_k, n_splits=5, min_trades_per_chunk=15,
+        engine=args.engine, cache=None if args.no_cache else args.cache_dir,
+    )
+    with pd.option_context("display.width", 200, "display.max_columns", 12):
+        print(results[["window", "test_start", "warm_start_from", "best_value",
+                       "oos_Calmar", "oos_Trades", "optimize_s", "oos_s"]])
+    print(metrics)
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    results.to_csv("outputs/walkforward_results.csv", index=False)
+    pd.DataFrame({"Equity": equity.values}, index=equity.index).to_csv("outputs/walkforward_equity.csv")
+    with open("outputs/walkforward_metrics.json", "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=2)
+    print("Resultados: outputs/walkforward_results.csv | outputs/walkforward_equity.csv")
+
+def cmd_batch(args):
+    import pandas as pd
+    from batch import make_universe, run_batch, summarize_batch
+
+    with open(args.params, "r", encoding="utf-8") as f:
+        p = json.load(f)
+    universe = make_universe(args.symbols, args.intervals)
+    print(f"Lote: {len(universe)} instrumentos ({args.source}) | tope de memoria {args.max_memory_mb} MB")
+    table = run_batch(universe, p, start=args.start, end=args.end, source=args.source,
+                      n_workers=args.n_workers, max_memory_mb=args.max_memory_mb)
+    with pd.option_context("display.width", 200, "display.max_columns", 12):
+        print(table[["symbol", "interval", "bars", "ann_factor", "CAGR", "MaxDD",
+                     "Sharpe", "Calmar", "Trades", "run_s"]])
+        print(summarize_batch(table))
+    print(f"Tiempo total: {table.attrs['wall_s']:.1f}s")
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    table.to_csv("outputs/batch_results.csv", index=False)
+    summarize_batch(table).to_csv("outputs/batch_summary.csv")
+    print("Resultados: outputs/batch_results.csv | outputs/batch_summary.csv")
+
+def cmd_paper(args):
+    import pandas as pd
+    from paper import latency_table, paper_trade, reconcile
+
+    with open(args.params, "r", encoding="utf-8") as f:
+        p = json.load(f)
+    df = _load_data(args.start, args.end, update=args.update)
+    speed = f"x{args.speed:g}" if args.speed else "sin esperas"
+    print(f"Paper trading (replay {speed}): {len(df)} velas")
+
+    def log_fill(fill):
+        if args.verbose:
+            print(f"  {fill['time']} {fill['action']:4s} {fill['qty']:.6f} @ {fill['price']:.2f} ({fill['reason']})")
+
+    resolver = _open_resolver(args.intrabar)
+    result = paper_trade(df, p, speed=args.speed, on_fill=log_fill, resolver=resolver)
+    print(f"{result['bars']} velas ({result['warmup_bars']} de calentamiento), "
+          f"{len(result['fills'])} fills, {len(result['trades'])} operaciones en {result['wall_s']:.2f}s")
+    print("Métricas:", result["metrics"])
+    lat = latency_table(result)
+    with pd.option_context("display.width", 200):
+        print("\nLatencia por vela (µs): feed -> señal -> decisión")
+        print(lat)
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    result["fills"].to_csv("outputs/paper_fills.csv", index=False)
+    lat.to_csv("outputs/paper_latency.csv")
+    with open("outputs/paper_metrics.json", "w", encoding="utf-8") as f:
+        json.dump(result["metrics"], f, indent=2)
+    hist = pd.concat({s: h.to_frame() for s, h in result["latency"].items()}, names=["stage"])
+    hist.reset_index(level=1, drop=True).to_csv("outputs/paper_latency_hist.csv")
+    if not args.no_reconcile:
+        rec = reconcile(df, p, result, resolver=resolver)
+        print(f"\nConciliación con el backtest: {'EXACTA' if rec['exact'] else 'DIFERENCIAS'} | "
+              f"equity final {rec['final_equity_paper']:.2f} vs {rec['final_equity_batch']:.2f}, "
+              f"operaciones {rec['trades_paper']} vs {rec['trades_batch']}")
+        with open("outputs/paper_reconcile.json", "w", encoding="utf-8") as f:
+            json.dump(rec, f, indent=2)
+    print("Resultados: outputs/paper_fills.csv | outputs/paper_latency.csv | outputs/paper_metrics.json")
+
+def cmd_report(args):
+    bundle = _open_bundle(args.bundle, args.splits)
+    _report({n: bundle.equity(n) for n in args.splits}, args.n_boot,
+            {n: bundle.returns_tables(n) for n in args.splits})
+
+def cmd_plot(args):
+    bundle = _open_bundle(args.bundle, args.splits)
+    _plot({n: bundle.equity(n) for n in args.splits}, n_workers=args.n_workers)
+
+def cmd_export(args):
+    from bundle import export_legacy
+
+    written = export_legacy(_open_bundle(args.bundle), args.out_dir)
+    print(f"{len(written)} archivos escritos en {args.out_dir}/")
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Estrategia BTCUSDT: datos, optimización, evaluación y reportes")
+    sub = ap.add_subparsers(dest="command")
+
+    def data_args(p):
+        p.add_argument("--start", default="2018-01-01")
+        p.add_argument("--end", default=None)
+        p.add_argument("--update", action="store_true", help="descargar velas nuevas antes de correr")
+
+    def cache_args(p):
+        p.add_argument("--cache-dir", default=CACHE_DIR)
+        p.add_argument("--no-cache", action="store_true")
+
+    def optimize_args(p):
+        p.add_argument("--n-trials", type=int, default=60)
+        p.add_argument("--n-workers", type=int, default=1)
+        p.add_argument("--storage", default=None, help="journal .log o sqlite:///... (reanudable)")
+        p.add_argument("--engine", default="numpy", choices=("numpy", "pandas"))
+        p.add_argument("--chunk-order", default="natural", choices=("natural", "reverse", "volatility"))
+        p.add_argument("--profile", action="store_true")
+        p.add_argument("--track-memory", action="store_true")
+
+    p = sub.add_parser("run", help="pipeline completo (por defecto)")
+    optimize_args(p)
+    cache_args(p)
+    p.add_argument("--legacy", action="store_true", help="escribir también los CSV/JSON del formato anterior")
+    p.add_argument("--n-boot", type=int, default=10_000)
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("fetch", help="descargar/actualizar el almacén de velas")
+    p.add_argument("--symbol", default="BTCUSDT")
+    p.add_argument("--interval", default="1h")
+    p.add_argument("--start", default="2018-01-01")
+    p.add_argument("--end", default=None)
+    p.set_defaults(func=cmd_fetch)
+
+    p = sub.add_parser("optimize", help="estudio Optuna sobre TRAIN -> best_params.json")
+    data_args(p)
+    optimize_args(p)
+    cache_args(p)
+    p.set_defaults(func=cmd_optimize)
+
+    p = sub.add_parser("evaluate", help="evaluar parámetros guardados en test/validación")
+    data_args(p)
+    cache_args(p)
+    p.add_argument("--params", default=PARAMS_PATH)
+    p.add_argument("--splits", nargs="+", default=list(SPLITS), choices=SPLITS + ("full",))
+    p.add_argument("--legacy", action="store_true", help="escribir también los CSV/JSON del formato anterior")
+    p.add_argument("--intrabar", default=None, metavar="DIR",
+                   help="almacén de velas de 1m (p. ej. data/BTCUSDT_1m) para resolver velas que cruzan SL y TP")
+    p.set_defaults(func=cmd_evaluate)
+
+    p = sub.add_parser("walkforward", help="re-optimización por ventanas rolling/anchored en paralelo")
+    data_args(p)
+    cache_args(p)
+    p.add_argument("--train-months", type=int, default=12)
+    p.add_argument("--test-months", type=int, default=1)
+    p.add_argument("--step-months", type=int, default=1)
+    p.add_argument("--anchored", action="store_true")
+    p.add_argument("--n-trials", type=int, default=30)
+    p.add_argument("--n-workers", type=int, default=None)
+    p.add_argument("--top-k", type=int, default=5, help="trials de la ventana previa para el warm start")
+    p.add_argument("--engine", default="numpy", choices=("numpy", "pandas"))
+    p.set_defaults(func=cmd_walkforward)
+
+    p = sub.add_parser("batch", help="señales+backtest por símbolo e intervalo en paralelo")
+    p.add_argument("--symbols", nargs="+", default=["BTCUSDT"])
+    p.add_argument("--intervals", nargs="+", default=["1h"])
+    p.add_argument("--source", default="binance", choices=("binance", "synthetic"))
+    p.add_argument("--start", default="2018-01-01")
+    p.add_argument("--end", default=None)
+    p.add_argument("--params", default=PARAMS_PATH)
+    p.add_argument("--n-workers", type=int, default=None)
+    p.add_argument("--max-memory-mb", type=float, default=2048)
+    p.set_defaults(func=cmd_batch)
+
+    p = sub.add_parser("paper", help="paper trading asíncrono sobre un replay del almacén de velas")
+    data_args(p)
+    p.add_argument("--params", default=PARAMS_PATH)
+    p.add_argument("--speed", type=float, default=None,
+                   help="múltiplo del tiempo real (3600 = una vela de 1h por segundo); sin valor, sin esperas")
+    p.add_argument("--verbose", action="store_true", help="imprimir cada fill")
+    p.add_argument("--no-reconcile", action="store_true")
+    p.add_argument("--intrabar", default=None, metavar="DIR",
+                   help="almacén de velas de 1m para resolver velas que cruzan SL y TP")
+    p.set_defaults(func=cmd_paper)
+
+    p = sub.add_parser("report", help="tablas de rendimientos y robustez desde outputs/")
+    p.add_argument("--splits", nargs="+", default=list(SPLITS))
+    p.add_argument("--bundle", default=BUNDLE_PATH)
+    p.add_argument("--n-boot", type=int, default=10_000)
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser("plot", help="gráficas de equity y drawdown desde outputs/")
+    p.add_argument("--splits", nargs="+", default=list(SPLITS))
+    p.add_argument("--bundle", default=BUNDLE_PATH)
+    p.add_argument("--n-workers", type=int, default=None, help="procesos de dibujo (por defecto, uno por CPU)")
+    p.set_defaults(func=cmd_plot)
+
+    p = sub.add_parser("export", help="CSV/JSON del formato anterior a partir de outputs/results.npz")
+    p.add_argument("--bundle", default=BUNDLE_PATH)
+    p.add_argument("--out-dir", default=OUT_DIR)
+    p.set_defaults(func=cmd_export)
+    return ap
+
+def cli(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in COMMANDS + ("-h", "--help"):
+        # Sin subcomando: pipeline completo (comportamiento original), también con opciones
+        # de run sueltas como `main.py --n-trials 5`
+        argv = ["run"] + argv
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
 if __name__ == "__main__":
-    main()
+    cli()
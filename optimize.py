@@ -1,12 +1,74 @@
 # optimize.py
+import gc
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import optuna
-from signals import add_indicators_and_signals
-from backtest import backtest
-from utils import calmar_ratio
+from signals import (add_indicators_and_signals, signals_from_bank,
+                     compute_signal_arrays, signal_arrays_from_bank, warmup_bars)
+from indicator_bank import IndicatorBank
+from backtest import backtest, backtest_arrays, backtest_context, DEFAULT_ENGINE
+from shared_frame import SharedFrame, attach_frame
+from profiling import Profiler, get_profiler, stage, use_profiler
+from cache import ResultCache, frame_fingerprint, result_key
+
+# Órdenes de evaluación de los trozos walk-forward
+CHUNK_ORDERS = ("natural", "reverse", "volatility")
+
+def chunk_order_for(train_df, n_splits: int, chunk_order="natural") -> list:
+    """
+    Orden (fijo para todo el estudio) en que se evalúan los trozos walk-forward.
+    - "natural": cronológico; "reverse": más reciente primero.
+    - "volatility": mayor volatilidad de retornos primero (el trozo que más discrimina
+      entre parámetros, para que el pruner decida con el primer reporte).
+    - También acepta una secuencia explícita de índices de trozo.
+    El orden debe ser estable entre trials: el MedianPruner compara reportes del mismo step.
+    """
+    if not isinstance(chunk_order, str):
+        order = [int(k) for k in chunk_order]
+        if sorted(order) != list(range(n_splits)):
+            raise ValueError("chunk_order debe ser una permutación de range(n_splits)")
+        return order
+    if chunk_order == "natural":
+        return list(range(n_splits))
+    if chunk_order == "reverse":
+        return list(range(n_splits))[::-1]
+    if chunk_order == "volatility":
+        rets = np.diff(np.log(train_df["Close"].to_numpy(dtype=np.float64)))
+        vols = [float(np.std(part)) for part in np.array_split(rets, n_splits)]
+        return [int(k) for k in np.argsort(vols)[::-1]]
+    raise ValueError(f"chunk_order debe ser uno de {CHUNK_ORDERS} o una secuencia de índices")
+
+def objective_factory(train_df, n_splits: int = 5, min_trades_per_chunk: int = 15,
+                      engine: str = DEFAULT_ENGINE, use_bank: bool = True,
+                      chunk_order="natural", profile: bool = False, cache=None):
+    # Banco de indicadores compartido entre trials; se arma en el primer fallo de caché
+    # (si todos los trozos están en caché, no se calcula ningún indicador)
+    bank = None
+    close = train_df["Close"].to_numpy(dtype=np.float64)
+    # Caché de resultados por trozo (ResultCache o ruta de directorio, p. ej. desde un worker)
+    if isinstance(cache, str):
+        cache = ResultCache(cache)
+    data_fp = frame_fingerprint(train_df) if cache is not None else None
+    context = backtest_context(engine=engine, use_bank=use_bank) if cache is not None else None
+    order = chunk_order_for(train_df, n_splits, chunk_order)
 
-def objective_factory(train_df, n_splits: int = 5, min_trades_per_chunk: int = 15):
     def objective(trial: optuna.trial.Trial) -> float:
+        if not profile:
+            return _objective(trial)
+        # Tiempos por etapa del trial -> user_attrs (y al profiler activo, si lo hay)
+        trial_prof = Profiler(enabled=True)
+        try:
+            with use_profiler(trial_prof):
+                return _objective(trial)
+        finally:
+            for name, secs in trial_prof.totals().items():
+                trial.set_user_attr(f"t_{name}_s", secs)
+            if get_profiler().enabled:
+                get_profiler().merge(trial_prof)
+
+    def _objective(trial: optuna.trial.Trial) -> float:
         # ===== RANGOS (más "sueltos" para actividad) =====
         rsi_window  = trial.suggest_int("rsi_window", 8, 20)
         rsi_low     = trial.suggest_int("rsi_low", 20, 40)
@@ -27,34 +89,191 @@ def objective_factory(train_df, n_splits: int = 5, min_trades_per_chunk: int = 1
         tp = trial.suggest_float("tp", 0.02, 0.06)      # 2%–6%
         n_shares = trial.suggest_float("n_shares", 0.1, 5.0, step=0.1)
 
-        data_sig = add_indicators_and_signals(
-            train_df, rsi_window, rsi_low, rsi_high,
-            sma_fast, sma_slow, macd_fast, macd_slow, macd_signal
-        )
+        # Motor numpy: señales como arreglos compactos (sin copias del DataFrame)
+        use_arrays = engine == "numpy"
+        sig_args = (rsi_window, rsi_low, rsi_high,
+                    sma_fast, sma_slow, macd_fast, macd_slow, macd_signal)
+        data_sig = None
+
+        def _signals():
+            # Con caché, las señales sólo se calculan si algún trozo no está guardado
+            nonlocal data_sig, bank
+            if data_sig is None:
+                with stage("signals"):
+                    if use_bank and bank is None:
+                        bank = IndicatorBank(train_df)
+                    if use_arrays and bank is not None:
+                        data_sig = signal_arrays_from_bank(bank, *sig_args)
+                    elif use_arrays:
+                        data_sig = compute_signal_arrays(close, *sig_args)
+                    elif bank is not None:
+                        data_sig = signals_from_bank(bank, *sig_args)
+                    else:
+                        data_sig = add_indicators_and_signals(train_df, *sig_args)
+            return data_sig
 
-        L = len(data_sig)
+        def _run_chunk(idx):
+            sig = _signals()
+            if use_arrays:
+                return backtest_arrays(train_df, sig, sl, tp, n_shares,
+                                       lo=int(idx[0]), hi=int(idx[-1]) + 1)
+            return backtest(sig.iloc[idx], sl, tp, n_shares, engine=engine)
+
+        if cache is not None:
+            # Sin NaNs en Close, el dropna de las señales quita exactamente las velas de calentamiento
+            L = len(train_df) - min(warmup_bars(rsi_window, sma_fast, sma_slow, macd_slow, macd_signal),
+                                    len(train_df))
+        elif use_arrays:
+            L = len(_signals().buy)
+        else:
+            L = len(_signals())
         if L < n_splits * 200:
             raise optuna.TrialPruned()
 
-        # walk-forward: trozos contiguos
+        # walk-forward: trozos contiguos, evaluados en el orden elegido
         indices = np.array_split(np.arange(L), n_splits)
 
         calmars = []
-        for idx in indices:
-            chunk = data_sig.iloc[idx]
-            if len(chunk) < 100:
+        chunk_times = []
+
+        def _record_stats():
+            # Estadísticas por trial: trozos corridos y tiempo ahorrado estimado
+            mean_t = float(np.mean(chunk_times)) if chunk_times else 0.0
+            trial.set_user_attr("chunks_run", len(chunk_times))
+            trial.set_user_attr("chunk_time_s", mean_t)
+            trial.set_user_attr("time_saved_s", mean_t * (n_splits - len(chunk_times)))
+
+        for step, k in enumerate(order):
+            idx = indices[k]
+            if len(idx) < 100:
+                _record_stats()
                 raise optuna.TrialPruned()
 
-            equity, metrics = backtest(chunk, sl, tp, n_shares)
+            t0 = time.perf_counter()
+            with stage("chunk_backtest"):
+                if cache is not None:
+                    key = result_key(data_fp, {**trial.params, "n_splits": n_splits, "chunk": int(k)},
+                                     context)
+                    equity, metrics, _ = cache.get_or_compute(key, lambda: _run_chunk(idx))
+                else:
+                    equity, metrics = _run_chunk(idx)
+            chunk_times.append(time.perf_counter() - t0)
 
             # exigir actividad mínima
             if metrics.get("Trades", 0) < min_trades_per_chunk:
+                _record_stats()
                 raise optuna.TrialPruned()
 
-            c = calmar_ratio(equity)
+            c = metrics["Calmar"]
             if np.isnan(c):
+                _record_stats()
                 raise optuna.TrialPruned()
             calmars.append(c)
 
+            # Reporte intermedio: Calmar medio acumulado -> MedianPruner
+            trial.report(float(np.mean(calmars)), step)
+            if step < n_splits - 1 and trial.should_prune():
+                _record_stats()
+                raise optuna.TrialPruned()
+
+        _record_stats()
         return float(np.mean(calmars))
+
+    objective.cache = cache
     return objective
+
+# ===== Optimización paralela y reanudable =====
+def make_storage(path: str):
+    """
+    Storage local de Optuna: "sqlite:///archivo.db" -> RDB; cualquier otra ruta -> journal en archivo.
+    """
+    if path.startswith("sqlite:///"):
+        return optuna.storages.RDBStorage(path)
+    try:
+        from optuna.storages.journal import JournalFileBackend
+    except ImportError:  # optuna < 4
+        from optuna.storages import JournalFileStorage as JournalFileBackend
+    return optuna.storages.JournalStorage(JournalFileBackend(path))
+
+def _study_worker(worker_id: int, spec: dict, storage: str, study_name: str, n_trials: int,
+                  seed: int, n_startup_trials: int, objective_kwargs: dict) -> dict:
+    train_df, handles = attach_frame(spec)
+    study = optuna.load_study(
+        study_name=study_name,
+        storage=make_storage(storage),
+        sampler=optuna.samplers.TPESampler(seed=seed + worker_id),
+        pruner=optuna.pruners.MedianPruner(n_startup_trials=n_startup_trials),
+    )
+    objective = objective_factory(train_df, **objective_kwargs)
+    t0 = time.perf_counter()
+    study.optimize(objective, n_trials=n_trials)
+    elapsed = time.perf_counter() - t0
+    cache_stats = objective.cache.stats() if objective.cache is not None else None
+
+    # Soltar las vistas antes de cerrar la memoria compartida
+    del objective, train_df, study
+    gc.collect()
+    for shm in handles:
+        try:
+            shm.close()
+        except BufferError:
+            pass
+    return {
+        "worker": worker_id,
+        "trials": n_trials,
+        "seconds": elapsed,
+        "trials_per_min": 60.0 * n_trials / elapsed if elapsed > 0 else float("nan"),
+        "cache": cache_stats,
+    }
+
+STUDY_PREFIX = "btcusdt_calmar"
+# Opciones del objetivo que no cambian los valores de los trials (no entran en el nombre del estudio)
+RUNTIME_KWARGS = ("profile", "cache")
+
+def study_name_for(train_df, **objective_kwargs) -> str:
+    """
+    Nombre de estudio ligado al tramo de entrenamiento (fingerprint de datos, que ya fija el split)
+    y a las opciones del objetivo: un estudio guardado sólo se reanuda sobre los mismos datos.
+    """
+    settings = {k: v for k, v in objective_kwargs.items() if k not in RUNTIME_KWARGS}
+    return f"{STUDY_PREFIX}_{result_key(frame_fingerprint(train_df), settings)[:16]}"
+
+def run_parallel_study(train_df, n_trials: int, n_workers=None,
+                       storage: str = "outputs/optuna_journal.log",
+                       study_name: str = None, seed: int = 42, n_startup_trials: int = 10,
+                       resume: bool = True, **objective_kwargs):
+    """
+    Corre n_trials trials adicionales repartidos en un pool de procesos.
+    - train_df se publica en memoria compartida (SharedFrame); los workers no lo reciben pickleado.
+    - Los workers se coordinan por un storage en archivo (journal o SQLite). study_name por
+      defecto sale de study_name_for, así que volver a llamar con el mismo storage reanuda o
+      extiende el estudio sólo si los datos y el objetivo son los mismos.
+    - resume=False descarta un estudio previo con el mismo nombre y empieza de cero.
+    - Cada worker usa TPESampler(seed=seed + worker_id): el muestreo de cada worker es
+      reproducible, aunque el intercalado entre workers depende de los tiempos.
+    Devuelve (study, stats_por_worker).
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    if not storage.startswith("sqlite:///") and os.path.dirname(storage):
+        os.makedirs(os.path.dirname(storage), exist_ok=True)
+    study_name = study_name or study_name_for(train_df, **objective_kwargs)
+    if not resume:
+        try:
+            optuna.delete_study(study_name=study_name, storage=make_storage(storage))
+        except KeyError:
+            pass
+    optuna.create_study(study_name=study_name, storage=make_storage(storage),
+                        direction="maximize", load_if_exists=True)
+
+    quotas = [n_trials // n_workers + (1 if w < n_trials % n_workers else 0)
+              for w in range(n_workers)]
+    with SharedFrame(train_df) as shared, ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = [
+            pool.submit(_study_worker, w, shared.spec, storage, study_name, q,
+                        seed, n_startup_trials, objective_kwargs)
+            for w, q in enumerate(quotas) if q > 0
+        ]
+        stats = [f.result() for f in futures]
+
+    study = optuna.load_study(study_name=study_name, storage=make_storage(storage))
+    return study, stats
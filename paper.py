@@ -0,0 +1,275 @@
+# paper.py
+import asyncio
+import math
+import time
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+from backtest import TX_FEE, INITIAL_CASH, step_bar, close_position
+from ledger import TradeLedger, finalize_trades, EXIT_FORCED
+from streaming import StreamingSignals
+from utils import MetricsAccumulator
+
+# ===== Paper trading: feed asíncrono -> señales incrementales -> decisiones =====
+SIGNAL_PARAMS = ("rsi_window", "rsi_low", "rsi_high", "sma_fast", "sma_slow",
+                 "macd_fast", "macd_slow", "macd_signal")
+STAGES = ("feed", "signal", "decision", "total")
+# Cola corta: en replay sin esperas la latencia del feed mide backlog, no sólo el salto de tarea
+QUEUE_SIZE = 16
+
+class Bar(NamedTuple):
+    """Vela cerrada tal como la entrega un feed; emitted_ns = reloj (perf_counter_ns) al emitirla."""
+    open_time: pd.Timestamp
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    emitted_ns: int
+
+class ReplayFeed:
+    """
+    Reproduce velas guardadas (CandleStore o DataFrame OHLCV) como si llegaran del websocket.
+    - speed: múltiplo del tiempo real (3600 -> una vela de 1h por segundo); None = sin esperas.
+    - El calendario se ancla al inicio para que las esperas no acumulen deriva.
+    Cualquier iterable asíncrono de Bar sirve como feed de run_paper.
+    """
+
+    def __init__(self, source, start=None, end=None, speed: float = None):
+        if isinstance(source, pd.DataFrame):
+            self.df = source.loc[start:end] if start is not None or end is not None else source
+        else:
+            self.df = source.load(start, end)
+        self.speed = speed
+        index = self.df.index
+        self.bar_s = (index[1] - index[0]).total_seconds() if len(index) > 1 else 0.0
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    async def __aiter__(self):
+        cols = [self.df[c].to_numpy(dtype=np.float64).tolist()
+                for c in ("Open", "High", "Low", "Close", "Volume")]
+        step = self.bar_s / self.speed if self.speed else 0.0
+        loop = asyncio.get_running_loop()
+        t_start = loop.time()
+        clock = time.perf_counter_ns
+        for i, t in enumerate(self.df.index):
+            if step:
+                delay = t_start + (i + 1) * step - loop.time()
+                await asyncio.sleep(max(delay, 0.0))
+            yield Bar(t, cols[0][i], cols[1][i], cols[2][i], cols[3][i], cols[4][i], clock())
+
+class LatencyHistogram:
+    """Histograma log-espaciado (10 cubetas por década, en µs) con percentiles aproximados."""
+    BUCKETS_PER_DECADE = 10
+    MAX_DECADES = 8            # hasta 100 s
+
+    def __init__(self):
+        self.counts = np.zeros(self.BUCKETS_PER_DECADE * self.MAX_DECADES + 1, dtype=np.int64)
+        self.n = 0
+        self.total_us = 0.0
+        self.max_us = 0.0
+
+    def record(self, ns: int):
+        us = ns / 1e3
+        b = int(math.log10(us) * self.BUCKETS_PER_DECADE) + 1 if us >= 1.0 else 0
+        self.counts[min(b, len(self.counts) - 1)] += 1
+        self.n += 1
+        self.total_us += us
+        if us > self.max_us:
+            self.max_us = us
+
+    def edges_us(self) -> np.ndarray:
+        """Borde superior de cada cubeta en µs."""
+        return 10.0 ** (np.arange(len(self.counts)) / self.BUCKETS_PER_DECADE)
+
+    def percentile(self, q: float) -> float:
+        if self.n == 0:
+            return float("nan")
+        k = int(np.searchsorted(np.cumsum(self.counts), q / 100 * self.n, side="left"))
+        return float(min(self.edges_us()[k], self.max_us))
+
+    def summary(self) -> dict:
+        return {
+            "count": self.n,
+            "mean_us": self.total_us / self.n if self.n else float("nan"),
+            "p50_us": self.percentile(50),
+            "p90_us": self.percentile(90),
+            "p99_us": self.percentile(99),
+            "max_us": self.max_us,
+        }
+
+    def to_frame(self) -> pd.DataFrame:
+        nz = np.flatnonzero(self.counts)
+        edges = self.edges_us()
+        return pd.DataFrame({"le_us": edges[nz], "count": self.counts[nz]})
+
+class PaperAccount:
+    """
+    Estado de la cuenta simulada vela a vela. Cada vela pasa por backtest.step_bar, el mismo paso
+    que recorre el backtest: SL/TP (resuelto con velas finas si se da resolver), cierre por señal
+    contraria, aperturas recortadas por caja y nocional, y cierre forzado al final (close()).
+    """
+
+    def __init__(self, sl: float, tp: float, n_shares: float,
+                 tx_fee: float = TX_FEE, initial_cash: float = INITIAL_CASH, on_fill=None,
+                 resolver=None):
+        self.sl, self.tp, self.n_shares = sl, tp, n_shares
+        self.tx_fee = tx_fee
+        self.resolver = resolver
+        self.cash = initial_cash
+        self.shares = 0.0
+        self.entry_price = None
+        self.entry_i = -1
+        self.i = -1
+        self.time = None
+        self.last_close = None
+        self.ledger = TradeLedger()
+        self.fills = []
+        self.on_fill = on_fill
+
+    def _fill(self, i: int, action: str, qty: float, price: float, reason: str, cash: float):
+        fill = {"time": self.time, "action": action, "qty": qty, "price": price,
+                "reason": reason, "cash": cash}
+        self.fills.append(fill)
+        if self.on_fill is not None:
+            self.on_fill(fill)
+
+    def on_bar(self, time_, high: float, low: float, close: float, buy: bool, sell: bool) -> float:
+        """Procesa una vela cerrada con sus señales; devuelve la equity al cierre."""
+        self.i += 1
+        self.time = time_
+        self.last_close = close
+        t = pd.Timestamp(time_).value if self.resolver is not None else None
+        self.cash, self.shares, self.entry_price, self.entry_i = step_bar(
+            self.i, high, low, close, buy, sell, self.cash, self.shares, self.entry_price,
+            self.entry_i, self.sl, self.tp, self.n_shares, self.tx_fee, self.ledger,
+            t, self.resolver, self._fill)
+        return self.cash + self.shares * close
+
+    def close(self, time_):
+        """Cierre forzado de la posición abierta al precio de la última vela; devuelve la caja."""
+        if self.shares != 0 and self.entry_price is not None:
+            self.time = time_
+            self.cash = close_position(self.i, self.last_close, EXIT_FORCED, self.cash, self.shares,
+                                       self.entry_price, self.entry_i, self.tx_fee, self.ledger,
+                                       self._fill)
+            self.shares = 0.0
+            self.entry_price = None
+        return self.cash
+
+async def run_paper(feed, params: dict, tx_fee: float = TX_FEE, initial_cash: float = INITIAL_CASH,
+                    on_fill=None, queue_size: int = QUEUE_SIZE, resolver=None) -> dict:
+    """
+    Bucle de paper trading: una tarea consume el feed y encola velas; otra actualiza las señales
+    (StreamingSignals) y decide con PaperAccount. Las velas de calentamiento (señales aún no listas)
+    no operan, igual que las filas que dropna quita en el backtest. resolver (intrabar.IntrabarResolver)
+    decide el orden de SL/TP dentro de la vela como en backtest.backtest.
+    Las métricas se acumulan vela a vela (MetricsAccumulator) con un retraso de una vela,
+    para que el cierre forzado del final reemplace la última equity antes de contarla.
+    Devuelve {"equity", "metrics", "trades", "fills", "latency", "bars", "warmup_bars", "wall_s"}.
+    """
+    queue = asyncio.Queue(maxsize=queue_size)
+    signals = StreamingSignals(**{k: params[k] for k in SIGNAL_PARAMS})
+    account = PaperAccount(params["sl"], params["tp"], params["n_shares"], tx_fee=tx_fee,
+                           initial_cash=initial_cash, on_fill=on_fill, resolver=resolver)
+    hist = {s: LatencyHistogram() for s in STAGES}
+    acc = MetricsAccumulator()
+    times, equity, highs, lows = [], [], [], []
+    warmup = 0
+
+    async def produce():
+        async for bar in feed:
+            await queue.put(bar)
+        await queue.put(None)
+
+    async def consume():
+        nonlocal warmup
+        clock = time.perf_counter_ns
+        while True:
+            bar = await queue.get()
+            if bar is None:
+                break
+            t_in = clock()
+            sig = signals.update(bar.close)
+            t_sig = clock()
+            if sig["ready"]:
+                equity.append(account.on_bar(bar.open_time, bar.high, bar.low, bar.close,
+                                             sig["BUY_SIG"], sig["SELL_SIG"]))
+                if times:
+                    acc.push(equity[-2])
+                times.append(bar.open_time)
+                highs.append(bar.high)
+                lows.append(bar.low)
+            else:
+                warmup += 1
+            t_out = clock()
+            hist["feed"].record(t_in - bar.emitted_ns)
+            hist["signal"].record(t_sig - t_in)
+            hist["decision"].record(t_out - t_sig)
+            hist["total"].record(t_out - bar.emitted_ns)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(produce(), consume())
+    if equity and account.shares != 0:
+        # Cierre forzado al final del feed, como en el backtest
+        equity[-1] = account.close(times[-1])
+    if equity:
+        acc.push(equity[-1])
+
+    index = pd.DatetimeIndex(times, name="Open time")
+    trades = finalize_trades(account.ledger.to_array(), index,
+                             np.asarray(highs, dtype=np.float64), np.asarray(lows, dtype=np.float64))
+    return {
+        "equity": pd.Series(np.asarray(equity, dtype=np.float64), index=index, name="Equity"),
+        "metrics": acc.result(times[0], times[-1]) if times else {},
+        "trades": trades,
+        "fills": pd.DataFrame(account.fills, columns=["time", "action", "qty", "price", "reason", "cash"]),
+        "latency": hist,
+        "bars": len(times) + warmup,
+        "warmup_bars": warmup,
+        "wall_s": time.perf_counter() - t0,
+    }
+
+def paper_trade(source, params: dict, start=None, end=None, speed: float = None, **kwargs) -> dict:
+    """Atajo síncrono: ReplayFeed sobre source (CandleStore o DataFrame) + run_paper."""
+    return asyncio.run(run_paper(ReplayFeed(source, start, end, speed), params, **kwargs))
+
+def latency_table(result: dict) -> pd.DataFrame:
+    """Resumen por etapa (feed->señal->decisión) de los histogramas de latencia."""
+    return pd.DataFrame({s: h.summary() for s, h in result["latency"].items()}).T
+
+def reconcile(df: pd.DataFrame, params: dict, result: dict, tx_fee: float = TX_FEE,
+              initial_cash: float = INITIAL_CASH, resolver=None) -> dict:
+    """
+    Compara una corrida de paper trading (replay de df) con backtest.backtest sobre el mismo df.
+    exact=True si equity (mismo índice) y ledger de operaciones coinciden bit a bit.
+    """
+    from signals import add_indicators_and_signals
+    from backtest import backtest
+
+    sig = add_indicators_and_signals(df, **{k: params[k] for k in SIGNAL_PARAMS})
+    eq, metrics, trades = backtest(sig, params["sl"], params["tp"], params["n_shares"],
+                                   tx_fee=tx_fee, initial_cash=initial_cash, return_trades=True,
+                                   resolver=resolver)
+    paper_eq, paper_trades = result["equity"], result["trades"]
+    same_index = bool(eq.index.equals(paper_eq.index))
+    same_equity = same_index and bool(np.array_equal(eq.to_numpy(), paper_eq.to_numpy()))
+    same_trades = len(trades) == len(paper_trades) and all(
+        np.array_equal(trades[f], paper_trades[f], equal_nan=trades[f].dtype.kind == "f")
+        for f in trades.dtype.names
+    )
+    return {
+        "bars": len(eq),
+        "same_index": same_index,
+        "same_equity": same_equity,
+        "max_abs_equity_diff": float(np.max(np.abs(eq.to_numpy() - paper_eq.to_numpy())))
+                               if same_index and len(eq) else float("nan"),
+        "trades_batch": int(len(trades)),
+        "trades_paper": int(len(paper_trades)),
+        "same_trades": bool(same_trades),
+        "final_equity_batch": float(eq.iloc[-1]) if len(eq) else float("nan"),
+        "final_equity_paper": float(paper_eq.iloc[-1]) if len(paper_eq) else float("nan"),
+        "exact": same_equity and bool(same_trades),
+    }
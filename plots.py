@@ -1,33 +1,137 @@
 # plots.py
 import os
-import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
 from typing import Optional
+import numpy as np
 
-def plot_equity(equity, title: str, show: bool = False, save: Optional[str] = None):
-    os.makedirs("outputs", exist_ok=True)
-    plt.figure(figsize=(10, 4))
-    plt.plot(equity.index, equity.values)
-    plt.title(title)
-    plt.xlabel("Fecha")
-    plt.ylabel("Equity")
-    plt.tight_layout()
-    if save:
-        plt.savefig(f"outputs/{save}", dpi=150)
+# ===== Gráficas: figuras Agg orientadas a objetos + decimación por píxel =====
+OUT_DIR = "outputs"
+DPI = 150
+FIGSIZE_EQUITY = (10, 4)
+FIGSIZE_DRAWDOWN = (10, 3)
+FIGSIZE_PANEL = (10, 6)
+KINDS = ("equity", "drawdown", "panel")
+
+def minmax_indices(y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """
+    Índices a conservar para dibujar y con n_buckets columnas de píxel: por columna la primera,
+    la última, la mínima y la máxima (en orden). Conserva picos y valles, así que la línea
+    se ve igual que con todos los puntos. Si ya hay pocos puntos devuelve todos.
+    """
+    n = len(y)
+    if n <= 4 * n_buckets:
+        return np.arange(n)
+    k = -(-n // n_buckets)                      # puntos por columna (techo)
+    n_b = -(-n // k)
+    pad = n_b * k - n
+    blocks = (np.concatenate((y, np.full(pad, y[-1]))) if pad else y).reshape(n_b, k)
+    base = np.arange(n_b) * k
+    keep = np.concatenate((
+        base,
+        base + blocks.argmin(axis=1),
+        base + blocks.argmax(axis=1),
+        np.minimum(base + k - 1, n - 1),
+    ))
+    return np.unique(np.minimum(keep, n - 1))
+
+def drawdown(values: np.ndarray) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    return values / np.maximum.accumulate(values) - 1
+
+def _pixels(figsize) -> int:
+    return int(figsize[0] * DPI)
+
+def _decimate(x: np.ndarray, y: np.ndarray, figsize):
+    keep = minmax_indices(y, _pixels(figsize))
+    return x[keep], y[keep]
+
+def _prepare(equity, kind: str) -> dict:
+    """Arreglos ya decimados para una figura (lo único que viaja a los procesos de dibujo)."""
+    x = np.asarray(equity.index.values)
+    y = equity.to_numpy(dtype=np.float64)
+    out = {}
+    if kind in ("equity", "panel"):
+        figsize = FIGSIZE_PANEL if kind == "panel" else FIGSIZE_EQUITY
+        out["equity"] = _decimate(x, y, figsize)
+    if kind in ("drawdown", "panel"):
+        figsize = FIGSIZE_PANEL if kind == "panel" else FIGSIZE_DRAWDOWN
+        out["drawdown"] = _decimate(x, drawdown(y), figsize)
+    return out
+
+def _figure(figsize, show: bool):
+    # Sin show: Figure + lienzo Agg propios, sin estado global de pyplot (seguro en paralelo)
     if show:
-        plt.show()
-    plt.close()
+        import matplotlib.pyplot as plt
+        return plt.figure(figsize=figsize)
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
 
-def plot_drawdown(equity, title: str, show: bool = False, save: Optional[str] = None):
-    os.makedirs("outputs", exist_ok=True)
-    dd = equity / equity.cummax() - 1
-    plt.figure(figsize=(10, 3))
-    plt.plot(dd.index, dd.values)
-    plt.title(title + " - Drawdown")
-    plt.xlabel("Fecha")
-    plt.ylabel("Drawdown")
-    plt.tight_layout()
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+def _finish(fig, show: bool, save: Optional[str]):
+    fig.tight_layout()
     if save:
-        plt.savefig(f"outputs/{save}", dpi=150)
+        os.makedirs(OUT_DIR, exist_ok=True)
+        fig.savefig(os.path.join(OUT_DIR, save), dpi=DPI)
     if show:
+        import matplotlib.pyplot as plt
         plt.show()
-    plt.close()
+        plt.close(fig)
+
+def _render(data: dict, kind: str, title: str, show: bool = False, save: Optional[str] = None):
+    if kind == "equity":
+        fig = _figure(FIGSIZE_EQUITY, show)
+        ax = fig.add_subplot()
+        ax.plot(*data["equity"])
+        ax.set_title(title)
+        ax.set_xlabel("Fecha")
+        ax.set_ylabel("Equity")
+    elif kind == "drawdown":
+        fig = _figure(FIGSIZE_DRAWDOWN, show)
+        ax = fig.add_subplot()
+        ax.plot(*data["drawdown"])
+        ax.set_title(title + " - Drawdown")
+        ax.set_xlabel("Fecha")
+        ax.set_ylabel("Drawdown")
+    elif kind == "panel":
+        fig = _figure(FIGSIZE_PANEL, show)
+        ax_eq, ax_dd = fig.subplots(2, 1, sharex=True, gridspec_kw={"height_ratios": (2, 1)})
+        ax_eq.plot(*data["equity"])
+        ax_eq.set_title(title)
+        ax_eq.set_ylabel("Equity")
+        x, dd = data["drawdown"]
+        ax_dd.fill_between(x, dd, 0.0, alpha=0.4, linewidth=0)
+        ax_dd.plot(x, dd, linewidth=0.8)
+        ax_dd.set_xlabel("Fecha")
+        ax_dd.set_ylabel("Drawdown")
+    else:
+        raise ValueError(f"kind debe ser uno de {KINDS}")
+    _finish(fig, show, save)
+
+def plot_equity(equity, title: str, show: bool = False, save: Optional[str] = None):
+    _render(_prepare(equity, "equity"), "equity", title, show, save)
+
+def plot_drawdown(equity, title: str, show: bool = False, save: Optional[str] = None):
+    _render(_prepare(equity, "drawdown"), "drawdown", title, show, save)
+
+def plot_panel(equity, title: str, show: bool = False, save: Optional[str] = None):
+    """Equity y drawdown en un panel con eje de fechas compartido (un solo cálculo de drawdown)."""
+    _render(_prepare(equity, "panel"), "panel", title, show, save)
+
+def render_many(jobs, n_workers: int = None):
+    """
+    Dibuja varias figuras a archivo. jobs: lista de (kind, equity, title, save).
+    La decimación se hace aquí, así que a cada proceso sólo viajan unos miles de puntos;
+    con n_workers=1 (o un solo trabajo) se dibuja en el proceso actual.
+    """
+    prepared = [(_prepare(eq, kind), kind, title, False, save) for kind, eq, title, save in jobs]
+    n_workers = min(n_workers or os.cpu_count() or 1, len(prepared))
+    if n_workers <= 1:
+        for args in prepared:
+            _render(*args)
+        return
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        for fut in [pool.submit(_render, *args) for args in prepared]:
+            fut.result()
@@ -0,0 +1,136 @@
+# profiling.py
+import functools
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+_NULL = nullcontext()
+
+class Profiler:
+    """
+    Temporizadores por etapa (anidables) con seguimiento opcional de memoria.
+    - stage(name) es un context manager; timed(name) es el decorador equivalente.
+    - Deshabilitado, stage() devuelve siempre el mismo nullcontext (costo despreciable).
+    - Las etapas se agregan por ruta ("main;optimize;backtest"), con llamadas,
+      tiempo total, tiempo propio y pico de memoria asignada (si track_memory).
+    - Exporta JSON (to_json) y pilas colapsadas para flame graphs (to_collapsed).
+    """
+
+    def __init__(self, enabled: bool = True, track_memory: bool = False):
+        self.enabled = enabled
+        self.track_memory = track_memory and enabled
+        self.records = {}
+        self._stack = []
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _NULL
+        return self._stage(name)
+
+    @contextmanager
+    def _stage(self, name: str):
+        path = self._stack[-1]["path"] + (name,) if self._stack else (name,)
+        frame = {"path": path, "child_s": 0.0, "child_peak": 0}
+        if self.track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                parent = self._stack[-1]
+                parent["child_peak"] = max(parent["child_peak"], peak)
+            tracemalloc.reset_peak()
+            frame["mem_start"] = current
+        self._stack.append(frame)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            self._stack.pop()
+            rec = self.records.setdefault(path, {"calls": 0, "total_s": 0.0, "self_s": 0.0, "peak_alloc_mb": 0.0})
+            rec["calls"] += 1
+            rec["total_s"] += elapsed
+            rec["self_s"] += elapsed - frame["child_s"]
+            if self.track_memory:
+                peak = max(tracemalloc.get_traced_memory()[1], frame["child_peak"])
+                rec["peak_alloc_mb"] = max(rec["peak_alloc_mb"], (peak - frame["mem_start"]) / 2 ** 20)
+            if self._stack:
+                parent = self._stack[-1]
+                parent["child_s"] += elapsed
+                if self.track_memory:
+                    parent["child_peak"] = max(parent["child_peak"], peak)
+
+    def timed(self, name: str = None):
+        def deco(fn):
+            label = name or fn.__qualname__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with self._stage(label):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return deco
+
+    def merge(self, other: "Profiler"):
+        """Agrega los registros de otro profiler bajo la etapa actual (p.ej. el de un trial)."""
+        prefix = self._stack[-1]["path"] if self._stack else ()
+        for path, rec in other.records.items():
+            dst = self.records.setdefault(prefix + path, {"calls": 0, "total_s": 0.0, "self_s": 0.0, "peak_alloc_mb": 0.0})
+            dst["calls"] += rec["calls"]
+            dst["total_s"] += rec["total_s"]
+            dst["self_s"] += rec["self_s"]
+            dst["peak_alloc_mb"] = max(dst["peak_alloc_mb"], rec["peak_alloc_mb"])
+        if self._stack:
+            top = sum(rec["total_s"] for path, rec in other.records.items() if len(path) == 1)
+            self._stack[-1]["child_s"] += top
+
+    def totals(self) -> dict:
+        """Tiempo total por nombre de etapa (sin ruta), útil para user_attrs de Optuna."""
+        out = {}
+        for path, rec in self.records.items():
+            out[path[-1]] = out.get(path[-1], 0.0) + rec["total_s"]
+        return out
+
+    def report(self) -> dict:
+        stages = [dict(stage=";".join(path), **rec) for path, rec in self.records.items()]
+        stages.sort(key=lambda r: r["total_s"], reverse=True)
+        return {"track_memory": self.track_memory, "stages": stages}
+
+    def to_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def to_collapsed(self, path: str):
+        """Formato 'a;b;c <microsegundos propios>' (flamegraph.pl, speedscope, inferno)."""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, rec in sorted(self.records.items()):
+                us = int(round(rec["self_s"] * 1e6))
+                if us > 0:
+                    f.write(f"{';'.join(stack)} {us}\n")
+
+# ===== Profiler activo (global por proceso) =====
+_ACTIVE = Profiler(enabled=False)
+
+def get_profiler() -> Profiler:
+    return _ACTIVE
+
+def set_profiler(profiler: Profiler) -> Profiler:
+    """Activa `profiler` y devuelve el anterior."""
+    global _ACTIVE
+    previous, _ACTIVE = _ACTIVE, profiler
+    return previous
+
+@contextmanager
+def use_profiler(profiler: Profiler):
+    previous = set_profiler(profiler)
+    try:
+        yield profiler
+    finally:
+        set_profiler(previous)
+
+def stage(name: str):
+    """Etapa en el profiler activo (no-op si está deshabilitado)."""
+    return _ACTIVE.stage(name)
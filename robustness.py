@@ -0,0 +1,137 @@
+# robustness.py
+import numpy as np
+import pandas as pd
+from utils import compute_all_metrics
+
+# ===== Robustez: bootstrap por bloques estacionario (Politis & Romano) =====
+METRICS = ("final_equity", "CAGR", "MaxDD", "Sharpe", "Sortino", "Calmar")
+MAX_BLOCK_MB = 256     # tope de memoria por bloque de trayectorias
+
+def stationary_bootstrap_indices(n: int, n_paths: int, mean_block: float,
+                                 rng: np.random.Generator) -> np.ndarray:
+    """
+    Índices (n_paths, n) de un bootstrap estacionario: cada posición abre un bloque nuevo
+    con probabilidad 1/mean_block (origen uniforme) o continúa el anterior (circular).
+    mean_block=1 equivale a remuestreo i.i.d.
+    """
+    p = 1.0 / max(float(mean_block), 1.0)
+    new = rng.random((n_paths, n), dtype=np.float32) < p
+    new[:, 0] = True
+    r, c = np.nonzero(new)
+    origin = rng.integers(0, n, size=len(r))
+    # Sólo se sortean los arranques; en cada uno se guarda el salto respecto al
+    # índice anterior (dentro del bloque el salto es +1) y un cumsum arma los índices.
+    prev_end = np.empty_like(origin)
+    prev_end[1:] = origin[:-1] + (c[1:] - c[:-1] - 1)
+    jump = origin - prev_end
+    first = c == 0
+    jump[first] = origin[first]
+    step = np.ones((n_paths, n), dtype=np.int64)
+    step[r, c] = jump
+    idx = np.cumsum(step, axis=1, out=step)
+    idx %= n
+    return idx
+
+def _paths_per_block(n: int, max_block_mb: float) -> int:
+    # ~8 arreglos temporales (K, n) de 8 bytes entre índices, trayectorias y métricas
+    return max(1, int(max_block_mb * 2**20 // (8 * 8 * max(n, 1))))
+
+def _run_blocks(n_paths: int, n: int, max_block_mb: float, make_paths, timestamps, ruin_level: float):
+    """Genera y evalúa trayectorias por bloques acotados en memoria."""
+    per_block = _paths_per_block(n, max_block_mb)
+    cols = {k: np.empty(n_paths) for k in METRICS}
+    ruined = np.empty(n_paths, dtype=bool)
+    for lo in range(0, n_paths, per_block):
+        hi = min(lo + per_block, n_paths)
+        paths = make_paths(hi - lo)
+        m = compute_all_metrics(paths, timestamps)
+        for k in METRICS:
+            cols[k][lo:hi] = m[k]
+        ruined[lo:hi] = paths.min(axis=1) <= ruin_level
+        del paths
+    return pd.DataFrame(cols), ruined
+
+def summarize(samples: pd.DataFrame, point: dict = None, ci: float = 0.95) -> pd.DataFrame:
+    """Media, desviación, mediana e intervalo de confianza (percentiles) por métrica."""
+    a = (1 - ci) / 2
+    q = samples.quantile([a, 0.5, 1 - a])
+    out = pd.DataFrame({
+        "mean": samples.mean(),
+        "std": samples.std(),
+        "ci_low": q.iloc[0],
+        "median": q.iloc[1],
+        "ci_high": q.iloc[2],
+    })
+    if point is not None:
+        out.insert(0, "point", pd.Series({k: point.get(k, np.nan) for k in out.index}))
+    return out
+
+def bootstrap_returns(equity: pd.Series, n_paths: int = 10_000, mean_block: float = 24,
+                      seed: int = 42, ci: float = 0.95, ruin_drawdown: float = 0.5,
+                      max_block_mb: float = MAX_BLOCK_MB) -> dict:
+    """
+    Remuestrea los rendimientos por vela de la curva de equity (bloques de largo medio
+    mean_block velas, para conservar autocorrelación) y recalcula las métricas de utils
+    sobre cada trayectoria. Ruina: la equity toca (1 - ruin_drawdown) del capital inicial.
+    Devuelve {"samples", "summary", "prob_ruin"}.
+    """
+    eq = equity.to_numpy(dtype=np.float64)
+    rets = eq[1:] / eq[:-1]
+    n = len(rets)
+    rng = np.random.default_rng(seed)
+
+    def make_paths(k):
+        idx = stationary_bootstrap_indices(n, k, mean_block, rng)
+        paths = np.empty((k, n + 1))
+        paths[:, 0] = eq[0]
+        np.take(rets, idx, out=paths[:, 1:])
+        np.cumprod(paths, axis=1, out=paths)
+        return paths
+
+    samples, ruined = _run_blocks(n_paths, n + 1, max_block_mb, make_paths,
+                                  equity.index, eq[0] * (1 - ruin_drawdown))
+    point = compute_all_metrics(eq, equity.index)
+    return {
+        "samples": samples,
+        "summary": summarize(samples, point, ci),
+        "prob_ruin": float(ruined.mean()),
+    }
+
+def bootstrap_trades(trades: np.ndarray, initial_cash: float, n_paths: int = 10_000,
+                     mean_block: float = 1, seed: int = 42, ci: float = 0.95,
+                     ruin_drawdown: float = 0.5, max_block_mb: float = MAX_BLOCK_MB) -> dict:
+    """
+    Remuestrea los rendimientos por operación (PnL / equity al entrar, ledger.TRADE_DTYPE)
+    y los compone desde initial_cash, marcando las curvas en los tiempos de salida originales.
+    Componer (y no sumar PnL en $) mantiene cada trayectoria en >= 0: una pérdida mayor que la
+    equity se recorta a -100% (ruina) y la curva queda en cero.
+    mean_block=1 -> orden i.i.d.; >1 conserva rachas.
+    """
+    pnl = np.asarray(trades["pnl"], dtype=np.float64)
+    n = len(pnl)
+    if n == 0:
+        raise ValueError("el ledger no tiene operaciones")
+    timestamps = np.concatenate((trades["entry_time"][:1], trades["exit_time"]))
+    # Sin posición abierta al entrar, la equity es la caja: inicial + PnL de las previas
+    equity = initial_cash + np.concatenate(([0.0], np.cumsum(pnl)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.where(equity[:-1] > 0, 1.0 + pnl / equity[:-1], 0.0)
+    growth = np.maximum(growth, 0.0)
+    rng = np.random.default_rng(seed)
+
+    def make_paths(k):
+        idx = stationary_bootstrap_indices(n, k, mean_block, rng)
+        paths = np.empty((k, n + 1))
+        paths[:, 0] = initial_cash
+        np.take(growth, idx, out=paths[:, 1:])
+        np.cumprod(paths, axis=1, out=paths)
+        return paths
+
+    samples, ruined = _run_blocks(n_paths, n + 1, max_block_mb, make_paths,
+                                  timestamps, initial_cash * (1 - ruin_drawdown))
+    point = compute_all_metrics(equity, timestamps)
+    return {
+        "samples": samples,
+        "summary": summarize(samples, point, ci),
+        "prob_ruin": float(ruined.mean()),
+    }
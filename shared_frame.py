@@ -0,0 +1,75 @@
+# shared_frame.py
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+class SharedFrame:
+    """
+    DataFrame numérico (índice datetime) publicado en memoria compartida.
+    El proceso dueño crea los bloques; los workers llaman attach_frame(spec)
+    y obtienen vistas NumPy sin copia en lugar de recibir el DataFrame pickleado.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self._blocks = []
+        columns = []
+        for name in df.columns:
+            columns.append((name, self._publish(df[name].to_numpy())))
+        idx = pd.DatetimeIndex(df.index)
+        self.spec = {
+            "columns": columns,
+            "index": self._publish(idx.as_unit("ns").asi8),  # ns desde epoch (UTC)
+            "index_name": idx.name,
+            "tz": str(idx.tz) if idx.tz is not None else None,
+        }
+
+    def _publish(self, arr: np.ndarray) -> dict:
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        self._blocks.append(shm)
+        return {"name": shm.name, "dtype": arr.dtype.str, "shape": arr.shape}
+
+    def close(self):
+        """Libera los bloques (solo el proceso dueño)."""
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _open_block(name: str) -> shared_memory.SharedMemory:
+    # El worker solo se adjunta; el dueño es quien hace unlink.
+    # (Antes de 3.13 los workers del pool comparten el resource_tracker del padre.)
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python >= 3.13
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+def _attach(block: dict, handles: list) -> np.ndarray:
+    shm = _open_block(block["name"])
+    handles.append(shm)
+    return np.ndarray(block["shape"], dtype=np.dtype(block["dtype"]), buffer=shm.buf)
+
+def attach_frame(spec: dict):
+    """
+    Reconstruye el DataFrame a partir de spec (vistas de solo lectura).
+    Devuelve (df, handles); mantener handles vivos mientras se use df.
+    """
+    handles = []
+    ts = _attach(spec["index"], handles)
+    index = pd.DatetimeIndex(ts.view("datetime64[ns]"), name=spec["index_name"])
+    if spec["tz"] is not None:
+        index = index.tz_localize("UTC").tz_convert(spec["tz"])
+    data = {}
+    for name, block in spec["columns"]:
+        arr = _attach(block, handles)
+        arr.flags.writeable = False
+        data[name] = arr
+    df = pd.DataFrame(data, index=index, copy=False)
+    return df, handles
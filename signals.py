@@ -1,6 +1,11 @@
 # signals.py
+from typing import TYPE_CHECKING, NamedTuple
+import numpy as np
 import pandas as pd
-import ta
+
+# ta, scipy e indicator_bank se importan al usarse: `main.py evaluate` no los paga al arrancar
+if TYPE_CHECKING:
+    from indicator_bank import IndicatorBank
 
 def add_indicators_and_signals(
     df: pd.DataFrame,
@@ -17,6 +22,8 @@ def add_indicators_and_signals(
 
     # ==== Indicadores ====
     # RSI
+    import ta
+
     data["RSI"] = ta.momentum.RSIIndicator(close=data["Close"], window=rsi_window).rsi()
 
     # SMAs
@@ -33,6 +40,35 @@ def add_indicators_and_signals(
     data["MACD"] = macd.macd()
     data["MACD_sig"] = macd.macd_signal()
 
+    return _vote_and_clean(data, rsi_low, rsi_high)
+
+def signals_from_bank(
+    bank: "IndicatorBank",
+    rsi_window: int,
+    rsi_low: int,
+    rsi_high: int,
+    sma_fast: int,
+    sma_slow: int,
+    macd_fast: int,
+    macd_slow: int,
+    macd_signal: int,
+) -> pd.DataFrame:
+    """
+    Igual que add_indicators_and_signals sobre bank.df, pero los indicadores
+    se recogen del banco precalculado en lugar de recalcularse.
+    """
+    data = bank.df.copy()
+
+    data["RSI"] = bank.rsi(rsi_window)
+    data["SMA_fast"] = bank.sma(sma_fast)
+    data["SMA_slow"] = bank.sma(sma_slow)
+    macd_line, macd_sig = bank.macd(macd_fast, macd_slow, macd_signal)
+    data["MACD"] = macd_line
+    data["MACD_sig"] = macd_sig
+
+    return _vote_and_clean(data, rsi_low, rsi_high)
+
+def _vote_and_clean(data: pd.DataFrame, rsi_low: int, rsi_high: int) -> pd.DataFrame:
     # ==== Señales individuales ====
     # RSI por CRUCE de umbrales (más actividad que niveles fijos)
     rsi_prev = data["RSI"].shift(1)
@@ -55,3 +91,179 @@ def add_indicators_and_signals(
     # Limpieza por NaNs de ventanas
     data = data.dropna(subset=["RSI", "SMA_fast", "SMA_slow", "MACD", "MACD_sig"])
     return data
+
+# ===== Camino NumPy (sin copias de DataFrame) =====
+class SignalArrays(NamedTuple):
+    """
+    Indicadores y señales como arreglos compactos.
+    Todos empiezan en `start` (primera vela sin NaN, equivalente al dropna de
+    add_indicators_and_signals). Los indicadores pueden ser None si no se pidieron.
+    """
+    start: int
+    rsi: np.ndarray
+    sma_fast: np.ndarray
+    sma_slow: np.ndarray
+    macd: np.ndarray
+    macd_sig: np.ndarray
+    buy: np.ndarray
+    sell: np.ndarray
+
+def _ewm(x: np.ndarray, com: float) -> np.ndarray:
+    """ewm(adjust=False).mean() sin min_periods, vía filtro IIR de primer orden."""
+    from scipy.signal import lfilter
+
+    alpha = 1.0 / (1.0 + com)
+    out = np.empty_like(x)
+    out[0] = x[0]
+    if len(x) > 1:
+        out[1:], _ = lfilter([alpha], [1.0, -(1.0 - alpha)], x[1:], zi=[(1.0 - alpha) * x[0]])
+    return out
+
+def _rsi(close: np.ndarray, window: int) -> np.ndarray:
+    """RSI de Wilder con la misma definición (y aritmética) que ta.momentum.RSIIndicator."""
+    diff = np.empty_like(close)
+    diff[0] = 0.0
+    np.subtract(close[1:], close[:-1], out=diff[1:])
+    up = np.maximum(diff, 0.0)
+    np.negative(diff, out=diff)
+    np.maximum(diff, 0.0, out=diff)          # diff -> movimientos a la baja
+    alpha = 1 / window
+    com = (1 - alpha) / alpha
+    rsi = _ewm(up, com)
+    del up
+    emadn = _ewm(diff, com)
+    del diff
+    # 100 - 100 / (1 + up/dn), en sitio
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(rsi, emadn, out=rsi)
+        rsi += 1
+        np.divide(100, rsi, out=rsi)
+        np.subtract(100, rsi, out=rsi)
+    rsi[emadn == 0] = 100.0
+    rsi[:window - 1] = np.nan
+    return rsi
+
+def _rolling_mean(x: np.ndarray, window: int, block: int = 1024) -> np.ndarray:
+    """
+    Media móvil con sumas prefijo por bloques (re-centradas en cada bloque) para que
+    el error de redondeo no crezca con la longitud de la serie. NaN en las primeras window-1.
+    """
+    n = len(x)
+    if n < window:
+        return np.full(n, np.nan)
+    block = max(block, window)
+    n_out = n - window + 1
+    n_blocks = -(-n_out // block)
+    buf = np.empty(n_blocks * block + window - 1)
+    buf[:n] = x
+    buf[n:] = x[-1]
+    rows = np.lib.stride_tricks.sliding_window_view(buf, block + window - 1)[::block]
+    base = rows[:, :1].copy()
+    csum = np.zeros((n_blocks, block + window))
+    np.subtract(rows, base, out=csum[:, 1:])
+    np.cumsum(csum[:, 1:], axis=1, out=csum[:, 1:])
+    # buf ya no se necesita: se reutiliza como salida (NaN + medias)
+    sums = buf[window - 1:].reshape(n_blocks, block)
+    np.subtract(csum[:, window:], csum[:, :-window], out=sums)
+    del csum
+    sums /= window
+    sums += base
+    buf[:window - 1] = np.nan
+    return buf[:n]
+
+def _vote_rsi(buys: np.ndarray, sells: np.ndarray, rsi: np.ndarray, start: int,
+              rsi_low: int, rsi_high: int):
+    """Suma (en sitio) el voto RSI por cruce de umbrales a partir de `start`."""
+    rsi_prev = rsi[start - 1:-1] if start > 0 else np.concatenate(([np.nan], rsi[:-1]))
+    r = rsi[start:]
+    with np.errstate(invalid="ignore"):
+        buys += (rsi_prev >= rsi_low) & (r < rsi_low)
+        sells += (rsi_prev <= rsi_high) & (r > rsi_high)
+
+def _vote_cross(buys: np.ndarray, sells: np.ndarray, fast: np.ndarray, slow: np.ndarray, start: int):
+    """Suma (en sitio) el voto fast > slow (compra) / fast < slow (venta)."""
+    f, s = fast[start:], slow[start:]
+    with np.errstate(invalid="ignore"):
+        buys += f > s
+        sells += f < s
+
+def warmup_bars(rsi_window: int, sma_fast: int, sma_slow: int, macd_slow: int, macd_signal: int) -> int:
+    """Velas de calentamiento (filas que dropna quitaría si Close no tiene NaN)."""
+    return max(rsi_window - 1, sma_fast - 1, sma_slow - 1, macd_slow + macd_signal - 2)
+
+def _macd(close: np.ndarray, macd_fast: int, macd_slow: int, macd_signal: int):
+    macd = _ewm(close, (macd_fast - 1) / 2)
+    macd -= _ewm(close, (macd_slow - 1) / 2)
+    macd[:macd_slow - 1] = np.nan
+    macd_sig = np.full_like(macd, np.nan)
+    s0 = macd_slow - 1
+    if s0 < len(macd):
+        macd_sig[s0:] = _ewm(macd[s0:], (macd_signal - 1) / 2)
+        macd_sig[:s0 + macd_signal - 1] = np.nan
+    return macd, macd_sig
+
+def compute_signal_arrays(
+    close,
+    rsi_window: int,
+    rsi_low: int,
+    rsi_high: int,
+    sma_fast: int,
+    sma_slow: int,
+    macd_fast: int,
+    macd_slow: int,
+    macd_signal: int,
+    keep_indicators: bool = False,
+) -> SignalArrays:
+    """
+    Mismas señales que add_indicators_and_signals, calculadas directo sobre el
+    arreglo float64 de cierres (sin copiar el DataFrame ni usar pd.concat/dropna).
+    Los votos se acumulan en enteros indicador por indicador, así que cada indicador
+    se libera al terminar; con keep_indicators=True se conservan en el resultado.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    n = len(close)
+    start = min(warmup_bars(rsi_window, sma_fast, sma_slow, macd_slow, macd_signal), n)
+    buys = np.zeros(n - start, dtype=np.int8)
+    sells = np.zeros(n - start, dtype=np.int8)
+
+    rsi = _rsi(close, rsi_window)
+    _vote_rsi(buys, sells, rsi, start, rsi_low, rsi_high)
+    if not keep_indicators:
+        del rsi
+    sf = _rolling_mean(close, sma_fast)
+    ss = _rolling_mean(close, sma_slow)
+    _vote_cross(buys, sells, sf, ss, start)
+    if not keep_indicators:
+        del sf, ss
+    macd, macd_sig = _macd(close, macd_fast, macd_slow, macd_signal)
+    _vote_cross(buys, sells, macd, macd_sig, start)
+
+    if keep_indicators:
+        return SignalArrays(start, rsi[start:], sf[start:], ss[start:],
+                            macd[start:], macd_sig[start:], buys >= 2, sells >= 2)
+    return SignalArrays(start, None, None, None, None, None, buys >= 2, sells >= 2)
+
+def signal_arrays_from_bank(
+    bank: "IndicatorBank",
+    rsi_window: int,
+    rsi_low: int,
+    rsi_high: int,
+    sma_fast: int,
+    sma_slow: int,
+    macd_fast: int,
+    macd_slow: int,
+    macd_signal: int,
+) -> SignalArrays:
+    """Como compute_signal_arrays, pero recogiendo los indicadores (exactos de ta) del banco."""
+    rsi = bank.rsi(rsi_window)
+    sf, ss = bank.sma(sma_fast), bank.sma(sma_slow)
+    macd, macd_sig = bank.macd(macd_fast, macd_slow, macd_signal)
+    n = len(rsi)
+    start = min(warmup_bars(rsi_window, sma_fast, sma_slow, macd_slow, macd_signal), n)
+    buys = np.zeros(n - start, dtype=np.int8)
+    sells = np.zeros(n - start, dtype=np.int8)
+    _vote_rsi(buys, sells, rsi, start, rsi_low, rsi_high)
+    _vote_cross(buys, sells, sf, ss, start)
+    _vote_cross(buys, sells, macd, macd_sig, start)
+    return SignalArrays(start, rsi[start:], sf[start:], ss[start:],
+                        macd[start:], macd_sig[start:], buys >= 2, sells >= 2)
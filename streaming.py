@@ -0,0 +1,200 @@
+# streaming.py
+import math
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+
+NAN = float("nan")
+
+class _Ewm:
+    """
+    EMA incremental con la misma aritmética que pandas ewm(adjust=False).mean():
+    alpha se deriva del centro de masa y cada paso hace w = (f*w + a*x) / (f + a).
+    """
+    __slots__ = ("alpha", "old_wt", "min_periods", "value", "nobs")
+
+    def __init__(self, com: float, min_periods: int):
+        self.alpha = 1.0 / (1.0 + com)
+        self.old_wt = 1.0 - self.alpha
+        self.min_periods = min_periods
+        self.value = NAN
+        self.nobs = 0
+
+    def update(self, x: float) -> float:
+        if x == x:
+            self.nobs += 1
+            w = self.value
+            if w != w:
+                self.value = x
+            elif w != x:
+                self.value = (self.old_wt * w + self.alpha * x) / (self.old_wt + self.alpha)
+        return self.value if self.nobs >= self.min_periods else NAN
+
+    def state(self) -> tuple:
+        return (self.value, self.nobs)
+
+    def set_state(self, state: tuple):
+        self.value, self.nobs = state
+
+def _ewm_span(span: int) -> _Ewm:
+    return _Ewm(com=(span - 1) / 2, min_periods=span)
+
+def _ewm_alpha(alpha: float, min_periods: int) -> _Ewm:
+    return _Ewm(com=(1 - alpha) / alpha, min_periods=min_periods)
+
+class _RollingMean:
+    """Media móvil con buffer circular y suma compensada (Kahan), O(1) por vela."""
+    __slots__ = ("window", "buf", "total", "comp")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.buf = deque(maxlen=window)
+        self.total = 0.0
+        self.comp = 0.0
+
+    def _add(self, x: float):
+        y = x - self.comp
+        t = self.total + y
+        self.comp = (t - self.total) - y
+        self.total = t
+
+    def update(self, x: float) -> float:
+        if len(self.buf) == self.window:
+            self._add(-self.buf[0])
+        self.buf.append(x)
+        self._add(x)
+        return self.total / self.window if len(self.buf) == self.window else NAN
+
+    def state(self) -> tuple:
+        return (list(self.buf), self.total, self.comp)
+
+    def set_state(self, state: tuple):
+        buf, self.total, self.comp = state
+        self.buf = deque(buf, maxlen=self.window)
+
+class StreamingSignals:
+    """
+    Versión incremental de signals.add_indicators_and_signals: cada vela cuesta O(1).
+    - RSI de Wilder (ewm alpha=1/window), SMAs con buffer circular, MACD/señal con EMAs.
+    - update() devuelve los indicadores y la decisión 2 de 3 (BUY_SIG / SELL_SIG);
+      'ready' es False mientras alguna ventana no se ha llenado (filas que dropna quitaría).
+    - snapshot()/restore() permiten guardar y reanudar el estado.
+    """
+
+    def __init__(self, rsi_window: int, rsi_low: int, rsi_high: int,
+                 sma_fast: int, sma_slow: int,
+                 macd_fast: int, macd_slow: int, macd_signal: int):
+        self.params = dict(rsi_window=rsi_window, rsi_low=rsi_low, rsi_high=rsi_high,
+                           sma_fast=sma_fast, sma_slow=sma_slow, macd_fast=macd_fast,
+                           macd_slow=macd_slow, macd_signal=macd_signal)
+        self.rsi_low = rsi_low
+        self.rsi_high = rsi_high
+        self._up = _ewm_alpha(1 / rsi_window, rsi_window)
+        self._dn = _ewm_alpha(1 / rsi_window, rsi_window)
+        self._sma_fast = _RollingMean(sma_fast)
+        self._sma_slow = _RollingMean(sma_slow)
+        self._ema_fast = _ewm_span(macd_fast)
+        self._ema_slow = _ewm_span(macd_slow)
+        self._macd_sig = _ewm_span(macd_signal)
+        self._prev_close = NAN
+        self._prev_rsi = NAN
+        self.n_bars = 0
+
+    def update(self, close: float) -> dict:
+        """Procesa el cierre de una vela y devuelve indicadores + señales."""
+        close = float(close)
+        diff = close - self._prev_close
+        self._prev_close = close
+        up = diff if diff > 0 else 0.0
+        dn = -diff if diff < 0 else -0.0
+
+        emaup = self._up.update(up)
+        emadn = self._dn.update(dn)
+        if emadn == 0:
+            rsi = 100.0
+        else:
+            rsi = 100 - (100 / (1 + emaup / emadn))
+
+        sma_f = self._sma_fast.update(close)
+        sma_s = self._sma_slow.update(close)
+
+        ema_f = self._ema_fast.update(close)
+        ema_s = self._ema_slow.update(close)
+        macd = ema_f - ema_s
+        macd_sig = self._macd_sig.update(macd)
+
+        rsi_prev = self._prev_rsi
+        self._prev_rsi = rsi
+        votes_buy = ((rsi_prev >= self.rsi_low) and (rsi < self.rsi_low)) \
+            + (sma_f > sma_s) + (macd > macd_sig)
+        votes_sell = ((rsi_prev <= self.rsi_high) and (rsi > self.rsi_high)) \
+            + (sma_f < sma_s) + (macd < macd_sig)
+
+        self.n_bars += 1
+        ready = not (math.isnan(rsi) or math.isnan(sma_f) or math.isnan(sma_s)
+                     or math.isnan(macd) or math.isnan(macd_sig))
+        return {
+            "RSI": rsi, "SMA_fast": sma_f, "SMA_slow": sma_s,
+            "MACD": macd, "MACD_sig": macd_sig,
+            "BUY_SIG": votes_buy >= 2, "SELL_SIG": votes_sell >= 2,
+            "ready": ready,
+        }
+
+    def update_bar(self, bar) -> dict:
+        """Acepta una vela OHLCV como Series/namedtuple (bar.Close) o dict (bar["Close"])."""
+        return self.update(bar.Close if hasattr(bar, "Close") else bar["Close"])
+
+    # ==== Estado ====
+    def snapshot(self) -> dict:
+        return {
+            "params": dict(self.params),
+            "up": self._up.state(), "dn": self._dn.state(),
+            "sma_fast": self._sma_fast.state(), "sma_slow": self._sma_slow.state(),
+            "ema_fast": self._ema_fast.state(), "ema_slow": self._ema_slow.state(),
+            "macd_sig": self._macd_sig.state(),
+            "prev_close": self._prev_close, "prev_rsi": self._prev_rsi, "n_bars": self.n_bars,
+        }
+
+    @classmethod
+    def restore(cls, snap: dict) -> "StreamingSignals":
+        eng = cls(**snap["params"])
+        eng._up.set_state(snap["up"])
+        eng._dn.set_state(snap["dn"])
+        eng._sma_fast.set_state(snap["sma_fast"])
+        eng._sma_slow.set_state(snap["sma_slow"])
+        eng._ema_fast.set_state(snap["ema_fast"])
+        eng._ema_slow.set_state(snap["ema_slow"])
+        eng._macd_sig.set_state(snap["macd_sig"])
+        eng._prev_close = snap["prev_close"]
+        eng._prev_rsi = snap["prev_rsi"]
+        eng.n_bars = snap["n_bars"]
+        return eng
+
+# ===== Corrida sobre un DataFrame y latencia =====
+INDICATOR_COLUMNS = ("RSI", "SMA_fast", "SMA_slow", "MACD", "MACD_sig")
+
+def run_streaming(df: pd.DataFrame, params: dict) -> pd.DataFrame:
+    """Corre el motor incremental sobre df y devuelve solo las filas 'ready' (como tras dropna)."""
+    eng = StreamingSignals(**params)
+    rows, idx = [], []
+    for t, close in zip(df.index, df["Close"].to_numpy(dtype=np.float64).tolist()):
+        out = eng.update(close)
+        if out.pop("ready"):
+            rows.append(out)
+            idx.append(t)
+    return pd.DataFrame(rows, index=pd.DatetimeIndex(idx, name=df.index.name))
+
+def latency_per_bar(df: pd.DataFrame, params: dict) -> dict:
+    """Latencia de update() por vela en microsegundos (media, p50, p99)."""
+    eng = StreamingSignals(**params)
+    closes = df["Close"].to_numpy(dtype=np.float64).tolist()
+    lat = np.empty(len(closes), dtype=np.float64)
+    clock = time.perf_counter_ns
+    for i, c in enumerate(closes):
+        t0 = clock()
+        eng.update(c)
+        lat[i] = clock() - t0
+    lat /= 1e3
+    return {"bars": len(closes), "mean_us": float(lat.mean()),
+            "p50_us": float(np.percentile(lat, 50)), "p99_us": float(np.percentile(lat, 99))}
@@ -0,0 +1,40 @@
+# synthetic.py
+import numpy as np
+import pandas as pd
+from utils import INTERVAL_MS
+
+def make_ohlcv(n_bars: int, seed: int = 42, start="2018-01-01", interval: str = "1h",
+               s0: float = 10_000.0, mu: float = 0.3, sigma: float = 0.7,
+               wick: float = 0.35, base_volume: float = 1_000.0) -> pd.DataFrame:
+    """
+    Velas OHLCV sintéticas y reproducibles (GBM) con el mismo formato que data_loader:
+    columnas Open, High, Low, Close, Volume e índice 'Open time' (UTC).
+    - mu/sigma: deriva y volatilidad anuales del log-precio.
+    - wick: tamaño relativo de las mechas respecto a la volatilidad de la vela.
+    - El volumen es log-normal y crece con el tamaño del movimiento.
+    """
+    rng = np.random.default_rng(seed)
+    step_ms = INTERVAL_MS[interval]
+    dt = step_ms / (365.25 * 24 * 3600 * 1000)
+    vol = sigma * np.sqrt(dt)
+
+    log_ret = rng.normal((mu - 0.5 * sigma ** 2) * dt, vol, n_bars)
+    close = s0 * np.exp(np.cumsum(log_ret))
+    open_ = np.empty(n_bars)
+    open_[0] = s0
+    open_[1:] = close[:-1] * np.exp(rng.normal(0.0, 0.05 * vol, n_bars - 1))  # pequeño gap
+
+    body_hi = np.maximum(open_, close)
+    body_lo = np.minimum(open_, close)
+    high = body_hi * np.exp(np.abs(rng.normal(0.0, wick * vol, n_bars)))
+    low = body_lo * np.exp(-np.abs(rng.normal(0.0, wick * vol, n_bars)))
+
+    move = np.abs(log_ret) / vol
+    volume = base_volume * np.exp(rng.normal(0.0, 0.5, n_bars) + 0.5 * move)
+
+    index = pd.DatetimeIndex(
+        pd.Timestamp(start, tz="UTC") + pd.to_timedelta(np.arange(n_bars) * step_ms, unit="ms"),
+        name="Open time",
+    )
+    return pd.DataFrame({"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+                        index=index)
@@ -0,0 +1,36 @@
+# tests/conftest.py
+import os
+import sys
+import pytest
+
+# Módulos planos en la raíz del repo
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from synthetic import make_ohlcv  # noqa: E402
+
+SIGNAL_PARAMS = {
+    "rsi_window": 15, "rsi_low": 23, "rsi_high": 75,
+    "sma_fast": 10, "sma_slow": 95, "macd_fast": 11, "macd_slow": 19, "macd_signal": 11,
+}
+EXIT_PARAMS = {"sl": 0.026, "tp": 0.055, "n_shares": 1.5}
+
+@pytest.fixture(scope="session")
+def ohlcv():
+    return make_ohlcv(6_000, seed=7)
+
+@pytest.fixture(scope="session")
+def params():
+    return {**SIGNAL_PARAMS, **EXIT_PARAMS}
+
+@pytest.fixture(scope="session")
+def signal_frame(ohlcv):
+    from signals import add_indicators_and_signals
+    return add_indicators_and_signals(ohlcv, **SIGNAL_PARAMS)
+
+SAMPLE_CSV = os.path.join(os.path.dirname(__file__), "data", "BTCUSDT_1h_sample.csv")
+
+@pytest.fixture(scope="session")
+def sample_csv():
+    """Velas 1h de muestra en el formato CSV de data_loader (precios a 2 decimales)."""
+    import pandas as pd
+    return pd.read_csv(SAMPLE_CSV, parse_dates=["Open time"]).set_index("Open time")
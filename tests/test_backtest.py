@@ -0,0 +1,61 @@
+# tests/test_backtest.py
+import numpy as np
+import pytest
+from backtest import backtest
+from signals import add_indicators_and_signals
+from synthetic import make_ohlcv
+from utils import (calmar_ratio, cagr_from_equity, compute_all_metrics, max_drawdown,
+                   sharpe_ratio, sortino_ratio)
+from conftest import SIGNAL_PARAMS
+
+def test_numpy_engine_matches_pandas_reference(signal_frame, params):
+    eq_np, m_np = backtest(signal_frame, params["sl"], params["tp"], params["n_shares"], engine="numpy")
+    eq_pd, m_pd = backtest(signal_frame, params["sl"], params["tp"], params["n_shares"], engine="pandas")
+    assert eq_np.index.equals(eq_pd.index)
+    np.testing.assert_array_equal(eq_np.to_numpy(), eq_pd.to_numpy())
+    assert m_np == m_pd
+
+def test_numpy_engine_matches_pandas_with_tight_exits(signal_frame):
+    # SL/TP cortos: muchas salidas por nivel, no sólo por señal
+    eq_np, m_np = backtest(signal_frame, 0.004, 0.006, 2.0, engine="numpy")
+    eq_pd, m_pd = backtest(signal_frame, 0.004, 0.006, 2.0, engine="pandas")
+    np.testing.assert_array_equal(eq_np.to_numpy(), eq_pd.to_numpy())
+    assert m_np == m_pd
+
+@pytest.mark.parametrize("seed", [1, 2, 3, 4, 5])
+@pytest.mark.parametrize("interval", ["1h", "1d"])
+def test_metrics_match_utils_reference(seed, interval):
+    # Ambos motores pasan por compute_all_metrics: se contrasta contra las funciones originales
+    # de utils. No es bit a bit (p. ej. Sortino difiere ~1 ulp en algunas semillas).
+    frame = add_indicators_and_signals(make_ohlcv(6_000, seed=seed, interval=interval), **SIGNAL_PARAMS)
+    eq, m = backtest(frame, 0.01, 0.03, 1.5)
+    reference = {
+        "CAGR": cagr_from_equity(eq), "MaxDD": max_drawdown(eq), "Sharpe": sharpe_ratio(eq),
+        "Sortino": sortino_ratio(eq), "Calmar": calmar_ratio(eq),
+    }
+    assert compute_all_metrics(eq.to_numpy(), eq.index) == {k: m[k] for k in ("final_equity", *reference)}
+    for name, value in reference.items():
+        assert np.isclose(m[name], value, rtol=1e-12, atol=0.0, equal_nan=True), (name, m[name], value)
+
+def _lane_equivalence(frame, grid):
+    from backtest import backtest_batch, make_param_grid
+    grid = make_param_grid(*grid)
+    equity, metrics = backtest_batch(frame, grid)
+    for k, row in grid.iterrows():
+        eq, m = backtest(frame, row["sl"], row["tp"], row["n_shares"])
+        # Mismo recorrido; métricas 1-D vs 2-D de compute_all_metrics difieren en ~1e-13
+        np.testing.assert_array_equal(equity[k], eq.to_numpy())
+        for name, value in m.items():
+            np.testing.assert_allclose(metrics.loc[k, name], value, rtol=1e-9, atol=1e-12, err_msg=name)
+
+def test_backtest_batch_lanes_match_single_runs(signal_frame):
+    _lane_equivalence(signal_frame, ([0.004, 0.026], [0.006, 0.055], [0.5, 1.5]))
+
+def test_backtest_batch_handles_simultaneous_signals(signal_frame):
+    # La votación 2 de 3 nunca da ambas señales, pero backtest_batch acepta cualquier frame
+    frame = signal_frame.copy()
+    rng = np.random.default_rng(3)
+    both = rng.random(len(frame)) < 0.05
+    frame.loc[both, "BUY_SIG"] = True
+    frame.loc[both, "SELL_SIG"] = True
+    _lane_equivalence(frame, ([0.01, 0.026], [0.02, 0.055], [1.5]))
@@ -0,0 +1,62 @@
+# tests/test_bundle.py
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from backtest import backtest
+from bundle import ResultsBundle, export_legacy, write_bundle
+from utils import returns_table, returns_tables
+
+@pytest.fixture(scope="module")
+def results(signal_frame, params):
+    # Índice en ns, como las velas que entrega CandleStore (el paquete guarda ns)
+    signal_frame = signal_frame.set_axis(signal_frame.index.as_unit("ns"))
+    half = len(signal_frame) // 2
+    out = {}
+    for name, part in (("test", signal_frame.iloc[:half]), ("validation", signal_frame.iloc[half:])):
+        eq, metrics, trades = backtest(part, params["sl"], params["tp"], params["n_shares"],
+                                       return_trades=True)
+        counts = np.array([int(part["BUY_SIG"].sum()), int(part["SELL_SIG"].sum())])
+        out[name] = (eq, metrics, trades, counts)
+    return out
+
+@pytest.fixture(scope="module")
+def bundle_path(results, params, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("bundle") / "results.npz")
+    tables = {name: returns_tables(eq) for name, (eq, *_) in results.items()}
+    return write_bundle(path, results, params, tables)
+
+def test_bundle_round_trip(results, params, bundle_path):
+    bundle = ResultsBundle(bundle_path)
+    assert bundle.splits == list(results)
+    assert bundle.params == params
+    for name, (eq, metrics, trades, counts) in results.items():
+        got = bundle.equity(name)
+        assert isinstance(got.values.base, np.memmap) or isinstance(got.values, np.memmap)
+        pd.testing.assert_series_equal(got, eq, check_freq=False)
+        assert bundle.metrics(name) == json.loads(json.dumps(metrics))
+        np.testing.assert_array_equal(bundle.trades(name), trades)
+        assert bundle.trades(name).dtype == trades.dtype
+        np.testing.assert_array_equal(bundle.signal_counts(name), counts)
+        for freq in ("ME", "QE", "YE"):
+            pd.testing.assert_frame_equal(bundle.returns(name, freq), returns_table(eq, freq))
+
+def test_bundle_missing_table_raises(results, tmp_path):
+    path = write_bundle(str(tmp_path / "r.npz"), results)
+    with pytest.raises(KeyError):
+        ResultsBundle(path).returns("test", "ME")
+
+def test_export_legacy_matches_bundle(results, bundle_path, tmp_path):
+    written = export_legacy(bundle_path, str(tmp_path))
+    assert all(os.path.exists(p) for p in written)
+    for name, (eq, metrics, trades, _) in results.items():
+        csv = pd.read_csv(tmp_path / f"equity_{name}.csv", index_col=0)
+        np.testing.assert_allclose(csv["Equity"].to_numpy(), eq.to_numpy(), rtol=1e-15)   # texto CSV
+        with open(tmp_path / f"metrics_{name}.json", encoding="utf-8") as f:
+            assert json.load(f) == json.loads(json.dumps(metrics))
+        ledger = pd.read_csv(tmp_path / f"trades_{name}.csv")
+        assert len(ledger) == len(trades)
+        np.testing.assert_allclose(ledger["pnl"].to_numpy(), trades["pnl"])
+        monthly = pd.read_csv(tmp_path / f"returns_{name}_monthly.csv", index_col=0)
+        np.testing.assert_allclose(monthly["Return"].to_numpy(), returns_table(eq, "ME")["Return"].to_numpy())
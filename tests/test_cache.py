@@ -0,0 +1,61 @@
+# tests/test_cache.py
+import os
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pytest
+import backtest
+import cache
+from cache import ResultCache, frame_fingerprint, result_key
+
+def _key(params=None, **context):
+    return result_key("fp", params or {"sl": 0.01, "n_shares": 2}, backtest.backtest_context(**context))
+
+def test_result_key_canonicalizes_numpy_scalars():
+    assert _key({"sl": 0.01, "n_shares": 2}) == _key({"n_shares": np.int64(2), "sl": np.float64(0.01)})
+
+@pytest.mark.parametrize("context", [
+    {"tx_fee": 0.001},
+    {"initial_cash": 50_000.0},
+    {"engine": "pandas"},
+    {"use_bank": False},
+    {"resolver": SimpleNamespace(fingerprint="1m/1h:600:0")},
+])
+def test_result_key_depends_on_engine_context(context):
+    assert _key(**context) != _key()
+
+@pytest.mark.parametrize("name, value", [("MAX_NOTIONAL", 500_000.0), ("MIN_QTY", 0.01)])
+def test_result_key_depends_on_backtest_constants(monkeypatch, name, value):
+    before = _key()
+    monkeypatch.setattr(backtest, name, value)
+    assert _key() != before
+
+def test_result_key_depends_on_cache_version(monkeypatch):
+    before = _key()
+    monkeypatch.setattr(cache, "CACHE_VERSION", cache.CACHE_VERSION + 1)
+    assert _key() != before
+
+def _entry(n=500, seed=0):
+    idx = pd.date_range("2021-01-01", periods=n, freq="h", tz="UTC", name="Open time", unit="ns")
+    eq = pd.Series(1e5 + np.random.default_rng(seed).normal(0, 100, n).cumsum(), index=idx, name="Equity")
+    return eq, {"Calmar": 1.5, "Trades": 12}
+
+def test_round_trip_through_disk(tmp_path):
+    eq, metrics = _entry()
+    ResultCache(str(tmp_path)).put("k", eq, metrics, {"trades": np.arange(3)})
+    got_eq, got_metrics, extra = ResultCache(str(tmp_path)).get("k")
+    pd.testing.assert_series_equal(got_eq, eq, check_freq=False)
+    assert got_metrics == metrics
+    np.testing.assert_array_equal(extra["trades"], np.arange(3))
+    assert frame_fingerprint(eq.to_frame("Close")) == frame_fingerprint(got_eq.to_frame("Close"))
+
+def test_evict_tolerates_files_removed_by_other_processes(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    listdir = os.listdir
+    # Otro proceso borró "ghost" entre el listdir y el stat/remove
+    monkeypatch.setattr(cache.os, "listdir", lambda path: listdir(path) + ["ghost.npz"])
+    c = ResultCache(root, max_bytes=1)
+    for k in range(3):
+        c.put(f"k{k}", *_entry(seed=k))
+    assert c.evictions > 0
+    assert c.stats()["entries"] <= 1
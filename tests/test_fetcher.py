@@ -0,0 +1,165 @@
+# tests/test_fetcher.py
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pandas as pd
+import pytest
+import data_loader
+from batch import run_batch
+from candle_store import CandleStore
+from conftest import EXIT_PARAMS, SIGNAL_PARAMS
+from data_loader import load_klines
+from fetcher import KlineFetcher
+from synthetic import make_ohlcv
+
+N_BARS = 3000
+START = "2020-01-01"
+HOUR_MS = 3_600_000
+
+def _kline_rows(df) -> list:
+    rows = []
+    for t, r in zip(df.index, df.itertuples(index=False)):
+        open_ms = int(t.timestamp() * 1000)
+        rows.append([open_ms, f"{r.Open:.2f}", f"{r.High:.2f}", f"{r.Low:.2f}", f"{r.Close:.2f}",
+                     f"{r.Volume:.4f}", open_ms + HOUR_MS - 1, "0", 0, "0", "0", "0"])
+    return rows
+
+class StubBinance:
+    """Servidor local que reproduce páginas de klines; puede responder 429 o 500 a pedido."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.throttle = 0          # próximas N respuestas: 429 con Retry-After
+        self.fail_from_ms = None   # ventanas que empiezan en o después: 500
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                q = {k: int(v[0]) for k, v in parse_qs(urlparse(self.path).query).items()
+                     if k in ("startTime", "endTime", "limit")}
+                stub.requests += 1
+                if stub.throttle > 0:
+                    stub.throttle -= 1
+                    self.send_response(429)
+                    self.send_header("Retry-After", "0")
+                    self.end_headers()
+                    return
+                if stub.fail_from_ms is not None and q["startTime"] >= stub.fail_from_ms:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                page = [r for r in stub.rows if q["startTime"] <= r[0] <= q["endTime"]][:q["limit"]]
+                body = json.dumps(page).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/v3/klines"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture()
+def stub():
+    srv = StubBinance(_kline_rows(make_ohlcv(N_BARS, seed=11, start=START)))
+    yield srv
+    srv.close()
+
+def _fetcher(stub, checkpoint_dir, **kwargs):
+    return KlineFetcher(base_url=stub.url, max_workers=4, weight_per_minute=60_000,
+                        backoff=0.01, checkpoint_dir=str(checkpoint_dir), progress=False, **kwargs)
+
+def _bar_ms(i: int) -> int:
+    return int(pd.Timestamp(START, tz="UTC").timestamp() * 1000) + i * HOUR_MS
+
+def test_retries_on_429_with_retry_after(stub, tmp_path):
+    stub.throttle = 3
+    f = _fetcher(stub, tmp_path / "ckpt")
+    rows = f.fetch("BTCUSDT", "1h", _bar_ms(0), _bar_ms(N_BARS))
+    assert [r[0] for r in rows] == [r[0] for r in stub.rows]
+    assert f.stats["retries"] == 3
+
+def test_resume_after_interruption_reuses_complete_windows(stub, tmp_path):
+    ckpt = tmp_path / "ckpt"
+    # 1) Corrida interrumpida: las ventanas desde la vela 2000 fallan sin reintentos
+    stub.fail_from_ms = _bar_ms(2000)
+    with pytest.raises(Exception):
+        _fetcher(stub, ckpt, max_retries=0).fetch("BTCUSDT", "1h", _bar_ms(0), _bar_ms(N_BARS))
+
+    # 2) Reanudación: las ventanas completas salen del checkpoint, el resto se descarga
+    stub.fail_from_ms = None
+    f = _fetcher(stub, ckpt)
+    rows = f.fetch("BTCUSDT", "1h", _bar_ms(0), _bar_ms(N_BARS))
+    assert [r[0] for r in rows] == [r[0] for r in stub.rows]
+    assert f.stats["from_checkpoint"] >= 1
+
+def test_resume_with_later_end_refetches_truncated_window(stub, tmp_path):
+    ckpt = tmp_path / "ckpt"
+    # Primera corrida hasta la vela 500 (la ventana [0, 1000) queda truncada en el checkpoint)
+    _fetcher(stub, ckpt).fetch("BTCUSDT", "1h", _bar_ms(0), _bar_ms(500), keep_checkpoint=True)
+
+    f = _fetcher(stub, ckpt)
+    rows = f.fetch("BTCUSDT", "1h", _bar_ms(0), _bar_ms(N_BARS))
+    assert len(rows) == N_BARS
+    assert f.stats["from_checkpoint"] == 0
+
+def test_load_klines_resume_leaves_no_gaps(stub, tmp_path):
+    ckpt = tmp_path / "ckpt"
+    _fetcher(stub, ckpt).fetch("BTCUSDT", "1h", _bar_ms(0), _bar_ms(500), keep_checkpoint=True)
+
+    end = pd.Timestamp(START, tz="UTC") + pd.Timedelta(hours=N_BARS)   # fin exclusivo de la descarga
+    df = load_klines("BTCUSDT", "1h", start=START, end=str(end),
+                     cache_path=str(tmp_path / "k.csv"), store_path=str(tmp_path / "store"),
+                     fetcher=_fetcher(stub, ckpt))
+    assert len(df) == N_BARS
+    assert CandleStore(str(tmp_path / "store"), "1h").gaps() == []
+
+def test_load_klines_never_stores_the_open_candle(stub, tmp_path, monkeypatch):
+    final = list(stub.rows)
+    paths = dict(cache_path=str(tmp_path / "k.csv"), store_path=str(tmp_path / "store"))
+
+    # "Ahora" a mitad de la vela 1999: el servidor la entrega abierta, con OHLCV parcial
+    open_row = list(final[1999])
+    open_row[2] = open_row[3] = open_row[4] = open_row[1]
+    stub.rows = final[:1999] + [open_row]
+    monkeypatch.setattr(data_loader, "_now_ms", lambda: _bar_ms(1999) + HOUR_MS // 2)
+    df = load_klines("BTCUSDT", "1h", start=START, fetcher=_fetcher(stub, tmp_path / "c1"), **paths)
+    assert len(df) == 1999
+    assert df.index[-1] == pd.Timestamp(_bar_ms(1998), unit="ms", tz="UTC")
+
+    # Actualización una vez cerrada: la vela 1999 llega completa
+    stub.rows = final[:2500]
+    monkeypatch.setattr(data_loader, "_now_ms", lambda: _bar_ms(2500) + 1)
+    df = load_klines("BTCUSDT", "1h", start=START, update=True,
+                     fetcher=_fetcher(stub, tmp_path / "c2"), **paths)
+    assert len(df) == 2500
+    row = df.loc[pd.Timestamp(_bar_ms(1999), unit="ms", tz="UTC")]
+    assert [row["Open"], row["High"], row["Low"], row["Close"]] == [float(v) for v in final[1999][1:5]]
+
+def test_run_batch_downloads_serially_before_the_pool(stub, tmp_path, monkeypatch):
+    # Los trabajadores sólo leen el almacén: si descargaran irían a la URL real, sin stub
+    monkeypatch.chdir(tmp_path)
+    end = pd.Timestamp(START, tz="UTC") + pd.Timedelta(hours=N_BARS)
+    universe = [("BTCUSDT", "1h"), ("ETHUSDT", "1h")]
+    f = _fetcher(stub, tmp_path / "ckpt")
+    table = run_batch(universe, {**SIGNAL_PARAMS, **EXIT_PARAMS}, start=START, end=str(end),
+                      source="binance", n_workers=2, fetcher=f)
+    assert "error" not in table.columns
+    assert list(table["bars"]) == [N_BARS, N_BARS]
+    assert f.stats["requests"] > 0
+    requests = stub.requests
+
+    # Segunda corrida: todo sale del cache, sin pedidos nuevos
+    run_batch(universe, {**SIGNAL_PARAMS, **EXIT_PARAMS}, start=START, end=str(end),
+              source="binance", n_workers=2, fetcher=_fetcher(stub, tmp_path / "ckpt"))
+    assert stub.requests == requests
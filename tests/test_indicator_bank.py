@@ -0,0 +1,48 @@
+# tests/test_indicator_bank.py
+import numpy as np
+import optuna
+import ta
+import optimize
+from cache import ResultCache
+from indicator_bank import IndicatorBank, MIN_CACHED_COLUMNS, SMA_WINDOWS
+
+def test_bank_computes_columns_on_first_use(ohlcv):
+    bank = IndicatorBank(ohlcv)
+    assert bank.cache_info()["filled_columns"] == 0 and bank.nbytes == 0
+    expected = ta.momentum.RSIIndicator(close=ohlcv["Close"], window=14).rsi().to_numpy()
+    np.testing.assert_array_equal(bank.rsi(14), expected)
+    np.testing.assert_array_equal(bank.rsi(14), expected)
+    assert bank.cache_info()["filled_columns"] == 1
+    assert (bank.hits, bank.misses) == (1, 1)
+
+def test_bank_memory_is_bounded(ohlcv):
+    col_mb = 8 * len(ohlcv) / 2**20
+    # Sólo entran ~10 columnas en el bloque fijo y ~10 en el LRU
+    bank = IndicatorBank(ohlcv, max_eager_mb=10 * col_mb, max_cached_mb=10 * col_mb)
+    info = bank.cache_info()
+    assert info["eager_columns"] == 10 and info["max_cached"] == max(10, MIN_CACHED_COLUMNS)
+    close = ohlcv["Close"]
+    for w in SMA_WINDOWS:
+        expected = close.rolling(window=w, min_periods=w).mean().to_numpy()
+        np.testing.assert_array_equal(bank.sma(w), expected)
+    assert bank.nbytes <= (info["eager_columns"] + info["max_cached"]) * 8 * len(ohlcv)
+
+def test_objective_builds_bank_only_on_cache_miss(ohlcv, tmp_path, monkeypatch):
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    built = []
+
+    class CountingBank(IndicatorBank):
+        def __init__(self, df, **kw):
+            built.append(len(df))
+            super().__init__(df, **kw)
+
+    monkeypatch.setattr(optimize, "IndicatorBank", CountingBank)
+    values = []
+    for _ in range(2):
+        study = optuna.create_study(direction="maximize",
+                                    sampler=optuna.samplers.TPESampler(seed=1))
+        study.optimize(optimize.objective_factory(ohlcv, n_splits=3, min_trades_per_chunk=1,
+                                                  cache=ResultCache(str(tmp_path))), n_trials=4)
+        values.append([t.value for t in study.trials])
+    assert len(built) == 1          # la segunda corrida sale entera de la caché
+    assert values[0] == values[1]
@@ -0,0 +1,96 @@
+# tests/test_ledger.py
+import numpy as np
+import pandas as pd
+import pytest
+from backtest import backtest, INITIAL_CASH, TX_FEE
+from ledger import (EXIT_SIGNAL, EXIT_SL, EXIT_TP, LONG, SHORT, TradeLedger, finalize_trades,
+                    pnl_by_exit_reason, trades_to_frame, win_rate_by_side)
+
+EXITS = [
+    {"sl": 0.026, "tp": 0.055, "n_shares": 1.5},
+    {"sl": 0.004, "tp": 0.006, "n_shares": 12.0},      # salidas SL/TP frecuentes y qty recortada
+]
+
+@pytest.fixture(scope="module", params=EXITS, ids=["base", "tight"])
+def run(request, signal_frame):
+    p = request.param
+    eq, metrics, trades = backtest(signal_frame, p["sl"], p["tp"], p["n_shares"], return_trades=True)
+    assert len(trades) > 10
+    return eq, metrics, trades
+
+def test_ledger_pnl_sums_to_equity_change(run):
+    eq, metrics, trades = run
+    # Al final no queda posición abierta (cierre forzado), así que la equity es caja pura
+    np.testing.assert_allclose(eq.iloc[-1] - INITIAL_CASH, trades["pnl"].sum(), rtol=0, atol=1e-6)
+    assert metrics["final_equity"] == eq.iloc[-1]
+
+def test_ledger_pnl_matches_equity_after_each_exit(run):
+    eq, _, trades = run
+    # En la vela de salida sin reapertura la cuenta queda plana: equity = caja inicial + PnL acumulado
+    flat = np.r_[trades["entry_idx"][1:] != trades["exit_idx"][:-1], True]
+    expected = INITIAL_CASH + np.cumsum(trades["pnl"])
+    np.testing.assert_allclose(eq.to_numpy()[trades["exit_idx"][flat]], expected[flat], rtol=0, atol=1e-6)
+
+def test_ledger_records_are_consistent(run):
+    eq, _, trades = run
+    assert np.all(trades["entry_idx"] <= trades["exit_idx"])
+    assert np.all(trades["exit_idx"][:-1] <= trades["entry_idx"][1:])          # sin solapes
+    np.testing.assert_array_equal(trades["entry_time"], eq.index.values[trades["entry_idx"]])
+    np.testing.assert_array_equal(trades["exit_time"], eq.index.values[trades["exit_idx"]])
+    np.testing.assert_allclose(trades["fees"],
+                               (trades["entry_price"] + trades["exit_price"]) * trades["qty"] * TX_FEE)
+    sign = np.where(trades["side"] == LONG, 1.0, -1.0)
+    gross = sign * (trades["exit_price"] - trades["entry_price"]) * trades["qty"]
+    np.testing.assert_allclose(trades["pnl"], gross - trades["fees"], rtol=1e-12, atol=1e-9)
+    assert np.all(trades["mae"] >= 0) and np.all(trades["mfe"] >= 0)
+
+def test_ledger_analytics_partition_pnl(run):
+    _, _, trades = run
+    total = trades["pnl"].sum()
+    by_reason = pnl_by_exit_reason(trades)
+    by_side = win_rate_by_side(trades)
+    assert by_reason["Trades"].sum() == len(trades) == by_side["Trades"].sum()
+    np.testing.assert_allclose(by_reason["PnL"].sum(), total)
+    np.testing.assert_allclose(by_side["PnL"].sum(), total)
+    assert len(trades_to_frame(trades)) == len(trades)
+
+def _finalize(rows, high, low):
+    led = TradeLedger()
+    for entry_idx, exit_idx, side, entry_price, exit_price, reason in rows:
+        led.add(entry_idx, exit_idx, side, 1.0, entry_price, exit_price, 0.0, 0.0, reason)
+    index = pd.date_range("2024-01-01", periods=len(high), freq="1h")
+    return finalize_trades(led.to_array(), index, np.asarray(high, float), np.asarray(low, float))
+
+def test_mae_mfe_clip_the_exit_bar_at_sl_and_tp():
+    # Vela 2: mecha hasta 130/70 que la posición no vivió (salió a 110 o 95 antes)
+    high = [100, 104, 130, 100, 104, 130, 100]
+    low = [100, 98, 70, 100, 98, 70, 100]
+    trades = _finalize([
+        (0, 2, LONG, 100.0, 110.0, EXIT_TP),       # TP +10%
+        (3, 5, LONG, 100.0, 95.0, EXIT_SL),        # SL -5%
+    ], high, low)
+    tp, sl = trades
+    assert tp["mfe"] == pytest.approx(0.10)        # no 0.30
+    assert tp["mae"] == pytest.approx(0.30)        # el Low de la vela pudo ocurrir antes del TP
+    assert sl["mae"] == pytest.approx(0.05)        # no 0.30
+    assert sl["mfe"] == pytest.approx(0.30)
+
+def test_mae_mfe_clip_the_exit_bar_for_shorts_only_at_sl_and_tp():
+    high = [100, 102, 130, 100, 102, 130, 100, 102, 130]
+    low = [100, 97, 70, 100, 97, 70, 100, 97, 70]
+    tp, sl, sig = _finalize([
+        (0, 2, SHORT, 100.0, 92.0, EXIT_TP),
+        (3, 5, SHORT, 100.0, 104.0, EXIT_SL),
+        (6, 8, SHORT, 100.0, 101.0, EXIT_SIGNAL),  # al cierre: vio la vela completa
+    ], high, low)
+    assert tp["mfe"] == pytest.approx(0.08) and tp["mae"] == pytest.approx(0.30)
+    assert sl["mae"] == pytest.approx(0.04) and sl["mfe"] == pytest.approx(0.30)
+    assert sig["mae"] == pytest.approx(0.30) and sig["mfe"] == pytest.approx(0.30)
+
+def test_mae_mfe_bounded_by_sl_and_tp_in_backtest(signal_frame):
+    sl, tp = 0.004, 0.006
+    _, _, trades = backtest(signal_frame, sl, tp, 12.0, return_trades=True)
+    hit_tp, hit_sl = trades["reason"] == EXIT_TP, trades["reason"] == EXIT_SL
+    assert hit_tp.any() and hit_sl.any()
+    assert np.all(trades["mfe"][hit_tp] <= tp + 1e-12)
+    assert np.all(trades["mae"][hit_sl] <= sl + 1e-12)
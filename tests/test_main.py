@@ -0,0 +1,39 @@
+# tests/test_main.py
+import sys
+import pytest
+import main
+
+@pytest.fixture
+def calls(monkeypatch):
+    seen = []
+    for name in ("cmd_run", "cmd_evaluate", "cmd_paper"):
+        monkeypatch.setattr(main, name, lambda args, name=name: seen.append((name, args)))
+    return seen
+
+def test_commands_match_parser():
+    sub = next(a for a in main.build_parser()._actions if a.dest == "command")
+    assert tuple(sub.choices) == main.COMMANDS
+
+@pytest.mark.parametrize("argv", [[], ["--n-trials", "5"], ["--no-cache", "--n-boot", "10"]])
+def test_cli_defaults_to_run(calls, argv):
+    main.cli(argv)
+    (name, args), = calls
+    assert name == "cmd_run" and args.command == "run"
+    if "--n-trials" in argv:
+        assert args.n_trials == 5
+
+def test_cli_reads_sys_argv(calls, monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["main.py", "--n-trials", "7"])
+    main.cli()
+    assert calls[0][0] == "cmd_run" and calls[0][1].n_trials == 7
+
+def test_cli_dispatches_subcommands(calls):
+    main.cli(["evaluate", "--no-cache"])
+    main.cli(["paper", "--no-reconcile"])
+    assert [name for name, _ in calls] == ["cmd_evaluate", "cmd_paper"]
+
+def test_cli_help_lists_subcommands(capsys):
+    with pytest.raises(SystemExit) as exc:
+        main.cli(["--help"])
+    assert exc.value.code == 0
+    assert "walkforward" in capsys.readouterr().out
@@ -0,0 +1,33 @@
+# tests/test_optimize.py
+import optuna
+import pytest
+from optimize import make_storage, run_parallel_study, study_name_for
+
+KW = dict(n_splits=3, min_trades_per_chunk=1)
+
+@pytest.fixture
+def journal(tmp_path):
+    return str(tmp_path / "journal.log")
+
+def _run(df, storage, **kw):
+    study, _ = run_parallel_study(df, n_trials=3, n_workers=1, storage=storage, **KW, **kw)
+    return study
+
+def test_study_name_depends_on_data_and_objective(ohlcv):
+    half = ohlcv.iloc[: len(ohlcv) // 2]
+    name = study_name_for(ohlcv, **KW)
+    assert name == study_name_for(ohlcv, **KW, profile=True, cache="outputs/cache")
+    assert name != study_name_for(half, **KW)
+    assert name != study_name_for(ohlcv, **{**KW, "n_splits": 4})
+
+def test_parallel_study_resumes_only_same_data(ohlcv, journal):
+    assert len(_run(ohlcv, journal).trials) == 3
+    assert len(_run(ohlcv, journal).trials) == 6              # mismo tramo: se extiende
+    other = _run(ohlcv.iloc[: len(ohlcv) // 2], journal)       # otro tramo: estudio nuevo
+    assert len(other.trials) == 3
+    names = {s.study_name for s in optuna.get_all_study_summaries(make_storage(journal))}
+    assert names == {study_name_for(ohlcv, **KW), other.study_name}
+
+def test_parallel_study_without_resume_starts_fresh(ohlcv, journal):
+    _run(ohlcv, journal)
+    assert len(_run(ohlcv, journal, resume=False).trials) == 3
@@ -0,0 +1,47 @@
+# tests/test_paper.py
+import numpy as np
+import pytest
+from candle_store import CandleStore
+from intrabar import IntrabarResolver, aggregate_ohlcv
+from paper import paper_trade, reconcile
+from synthetic import make_ohlcv
+from conftest import SIGNAL_PARAMS
+
+TIGHT = {**SIGNAL_PARAMS, "sl": 0.004, "tp": 0.005, "n_shares": 3.0}
+
+def _assert_reconciles(df, params, **kwargs):
+    fills = []
+    result = paper_trade(df, params, on_fill=fills.append, **kwargs)
+    rec = reconcile(df, params, result, resolver=kwargs.get("resolver"))
+    assert rec["same_index"] and rec["same_equity"] and rec["same_trades"], rec
+    assert rec["exact"]
+    # Cada operación es una apertura más una salida, en orden
+    assert len(fills) == len(result["fills"]) == 2 * len(result["trades"])
+    assert fills[0]["reason"] in ("open_long", "open_short")
+    return result
+
+def test_paper_reconciles_with_backtest(ohlcv, params):
+    assert len(_assert_reconciles(ohlcv, params)["trades"]) > 10
+
+def test_paper_reconciles_with_tight_exits(ohlcv):
+    _assert_reconciles(ohlcv, TIGHT)
+
+def test_paper_reconciles_on_sample_csv(sample_csv, params):
+    _assert_reconciles(sample_csv, params)
+
+@pytest.fixture(scope="module")
+def fine_store(tmp_path_factory):
+    fine = make_ohlcv(60 * 24 * 90, seed=9, interval="1m")
+    root = str(tmp_path_factory.mktemp("fine"))
+    CandleStore(root, interval="1m").append(fine)
+    return root, aggregate_ohlcv(fine)
+
+def test_paper_reconciles_with_intrabar_resolver(fine_store):
+    root, hourly = fine_store
+    resolver = IntrabarResolver(root)
+    result = _assert_reconciles(hourly, TIGHT, resolver=resolver)
+    stats = resolver.stats()
+    # Paper y backtest bajaron de resolución las mismas velas, y alguna resolvió TP primero
+    assert stats["drilldowns"] > 0 and stats["drilldowns"] % 2 == 0 and stats["tp_first"] > 0
+    plain = paper_trade(hourly, TIGHT)
+    assert not np.array_equal(plain["equity"].to_numpy(), result["equity"].to_numpy())
@@ -0,0 +1,45 @@
+# tests/test_robustness.py
+import numpy as np
+import pandas as pd
+import pytest
+from backtest import backtest, INITIAL_CASH
+from ledger import TRADE_DTYPE
+from robustness import bootstrap_returns, bootstrap_trades
+from utils import compute_all_metrics
+
+def _ledger(pnl, start="2020-01-01"):
+    trades = np.zeros(len(pnl), dtype=TRADE_DTYPE)
+    times = pd.date_range(start, periods=2 * len(pnl), freq="h").values
+    trades["entry_time"] = times[0::2]
+    trades["exit_time"] = times[1::2]
+    trades["pnl"] = pnl
+    return trades
+
+@pytest.mark.parametrize("mean_block", [1, 5])
+def test_bootstrap_trades_paths_never_lose_more_than_everything(mean_block):
+    # Pérdidas grandes respecto a la caja: sumando PnL en $ las curvas cruzaban cero (MaxDD < -100%)
+    rng = np.random.default_rng(0)
+    cash = 10_000.0
+    pnl = rng.normal(-200.0, 1_500.0, 60)
+    pnl[10] = -6_000.0
+    out = bootstrap_trades(_ledger(pnl), cash, n_paths=2_000, mean_block=mean_block, seed=1)
+    mdd = out["samples"]["MaxDD"]
+    assert (mdd >= -1.0).all()
+    assert (out["samples"]["final_equity"] >= 0.0).all()
+    assert 0.0 < out["prob_ruin"] <= 1.0
+
+def test_bootstrap_trades_point_is_the_original_curve(signal_frame, params):
+    _, _, trades = backtest(signal_frame, params["sl"], params["tp"], params["n_shares"],
+                            return_trades=True)
+    out = bootstrap_trades(trades, INITIAL_CASH, n_paths=500, seed=3)
+    curve = INITIAL_CASH + np.concatenate(([0.0], np.cumsum(trades["pnl"])))
+    timestamps = np.concatenate((trades["entry_time"][:1], trades["exit_time"]))
+    expected = compute_all_metrics(curve, timestamps)
+    assert out["summary"]["point"].to_dict() == expected
+    assert (out["samples"]["MaxDD"] >= -1.0).all()
+
+def test_bootstrap_returns_paths_stay_positive(ohlcv):
+    eq = ohlcv["Close"] / ohlcv["Close"].iloc[0] * INITIAL_CASH
+    out = bootstrap_returns(eq, n_paths=300, mean_block=24, seed=5)
+    assert (out["samples"]["MaxDD"] >= -1.0).all()
+    assert (out["samples"]["final_equity"] > 0.0).all()
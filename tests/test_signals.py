@@ -0,0 +1,55 @@
+# tests/test_signals.py
+import numpy as np
+import pytest
+from backtest import backtest, backtest_arrays
+from indicator_bank import IndicatorBank
+from signals import add_indicators_and_signals, compute_signal_arrays, signal_arrays_from_bank
+from synthetic import make_ohlcv
+from conftest import SIGNAL_PARAMS
+
+PARAM_SETS = [
+    SIGNAL_PARAMS,
+    {"rsi_window": 9, "rsi_low": 30, "rsi_high": 70, "sma_fast": 40, "sma_slow": 104,
+     "macd_fast": 9, "macd_slow": 18, "macd_signal": 7},
+    {"rsi_window": 27, "rsi_low": 20, "rsi_high": 80, "sma_fast": 5, "sma_slow": 200,
+     "macd_fast": 14, "macd_slow": 30, "macd_signal": 12},
+]
+INDICATORS = {"rsi": "RSI", "sma_fast": "SMA_fast", "sma_slow": "SMA_slow",
+              "macd": "MACD", "macd_sig": "MACD_sig"}
+
+def _assert_matches_ta(df, sig, params):
+    batch = add_indicators_and_signals(df, **params)
+    assert len(sig.buy) == len(batch)
+    assert df.index[sig.start] == batch.index[0]
+    np.testing.assert_array_equal(sig.buy, batch["BUY_SIG"].to_numpy())
+    np.testing.assert_array_equal(sig.sell, batch["SELL_SIG"].to_numpy())
+    for field, col in INDICATORS.items():
+        if field.startswith("sma"):
+            # Sumas prefijas por bloque vs rolling de pandas: sólo redondeo
+            np.testing.assert_allclose(getattr(sig, field), batch[col].to_numpy(), rtol=1e-12)
+        else:
+            np.testing.assert_array_equal(getattr(sig, field), batch[col].to_numpy(), err_msg=col)
+
+@pytest.mark.parametrize("params", PARAM_SETS)
+@pytest.mark.parametrize("seed", [3, 5])
+def test_signal_arrays_match_ta(params, seed):
+    df = make_ohlcv(20_000, seed=seed)
+    sig = compute_signal_arrays(df["Close"].to_numpy(), **params, keep_indicators=True)
+    _assert_matches_ta(df, sig, params)
+
+def test_signal_arrays_match_ta_on_sample_csv(sample_csv):
+    for params in PARAM_SETS:
+        sig = compute_signal_arrays(sample_csv["Close"].to_numpy(), **params, keep_indicators=True)
+        _assert_matches_ta(sample_csv, sig, params)
+
+def test_signal_arrays_from_bank_match_ta(ohlcv):
+    bank = IndicatorBank(ohlcv)
+    for params in PARAM_SETS:
+        _assert_matches_ta(ohlcv, signal_arrays_from_bank(bank, **params), params)
+
+def test_backtest_arrays_matches_backtest(ohlcv, signal_frame, params):
+    sig = compute_signal_arrays(ohlcv["Close"].to_numpy(), **SIGNAL_PARAMS)
+    eq, metrics = backtest(signal_frame, params["sl"], params["tp"], params["n_shares"])
+    eq_arr, metrics_arr = backtest_arrays(ohlcv, sig, params["sl"], params["tp"], params["n_shares"])
+    np.testing.assert_array_equal(np.asarray(eq_arr), eq.to_numpy())
+    assert metrics_arr == metrics
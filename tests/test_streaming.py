@@ -0,0 +1,46 @@
+# tests/test_streaming.py
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from signals import add_indicators_and_signals
+from streaming import INDICATOR_COLUMNS, StreamingSignals, run_streaming
+from synthetic import make_ohlcv
+from conftest import SIGNAL_PARAMS
+
+EXACT = ("RSI", "MACD", "MACD_sig")
+
+def _assert_matches_batch(df, params):
+    batch = add_indicators_and_signals(df, **params)
+    stream = run_streaming(df, params)
+    assert stream.index.equals(batch.index)
+    for c in ("BUY_SIG", "SELL_SIG"):
+        np.testing.assert_array_equal(stream[c].to_numpy(), batch[c].to_numpy(), err_msg=c)
+    for c in EXACT:
+        np.testing.assert_array_equal(stream[c].to_numpy(), batch[c].to_numpy(), err_msg=c)
+    # SMAs: suma compensada incremental vs rolling de ta -> diferencias de redondeo
+    for c in set(INDICATOR_COLUMNS) - set(EXACT):
+        np.testing.assert_allclose(stream[c].to_numpy(), batch[c].to_numpy(), rtol=1e-13, err_msg=c)
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_streaming_matches_batch_on_synthetic(seed):
+    _assert_matches_batch(make_ohlcv(20_000, seed=seed), SIGNAL_PARAMS)
+
+def test_streaming_matches_batch_on_sample_csv(sample_csv):
+    _assert_matches_batch(sample_csv, SIGNAL_PARAMS)
+    _assert_matches_batch(sample_csv, {**SIGNAL_PARAMS, "rsi_window": 9, "sma_fast": 40,
+                                       "sma_slow": 104, "macd_fast": 9, "macd_slow": 18})
+
+def test_snapshot_restore_round_trip(sample_csv):
+    closes = sample_csv["Close"].to_numpy(dtype=np.float64).tolist()
+    full = StreamingSignals(**SIGNAL_PARAMS)
+    expected = pd.DataFrame([full.update(c) for c in closes])
+
+    first = StreamingSignals(**SIGNAL_PARAMS)
+    for c in closes[:1000]:
+        first.update(c)
+    # El snapshot tiene que sobrevivir a JSON (así se persiste entre reinicios)
+    resumed = StreamingSignals.restore(json.loads(json.dumps(first.snapshot())))
+    got = pd.DataFrame([resumed.update(c) for c in closes[1000:]], index=range(1000, len(closes)))
+    pd.testing.assert_frame_equal(got, expected.iloc[1000:])
+    assert resumed.n_bars == len(closes)
@@ -0,0 +1,32 @@
+# tests/test_utils.py
+import numpy as np
+import pytest
+from backtest import backtest
+from paper import paper_trade
+from synthetic import make_ohlcv
+from utils import INTERVAL_MS, MetricsAccumulator, compute_all_metrics
+
+def _accumulate(values):
+    acc = MetricsAccumulator()
+    for v in values:
+        acc.push(float(v))
+    return acc
+
+def _assert_metrics_close(got, expected):
+    assert got.keys() == expected.keys()
+    for k in expected:
+        np.testing.assert_allclose(got[k], expected[k], rtol=1e-9, err_msg=k)
+
+@pytest.mark.parametrize("interval", ["1h", "1d"])
+def test_accumulator_matches_compute_all_metrics(interval):
+    eq = make_ohlcv(3_000, seed=11, interval=interval)["Close"]
+    expected = compute_all_metrics(eq.to_numpy(), eq.index)
+    acc = _accumulate(eq.to_numpy())
+    _assert_metrics_close(acc.result(eq.index[0], eq.index[-1]), expected)
+    _assert_metrics_close(acc.result(eq.index[0], eq.index[-1],
+                                     bar_s=INTERVAL_MS[interval] / 1000), expected)
+
+def test_paper_metrics_match_backtest(signal_frame, ohlcv, params):
+    result = paper_trade(ohlcv, params)
+    _, metrics = backtest(signal_frame, params["sl"], params["tp"], params["n_shares"])
+    _assert_metrics_close(result["metrics"], {k: metrics[k] for k in result["metrics"]})
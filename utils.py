@@ -2,6 +2,15 @@
 import numpy as np
 import pandas as pd
 
+# Intervalos de Binance -> milisegundos
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000,
+    "8h": 28_800_000, "12h": 43_200_000, "1d": 86_400_000, "3d": 259_200_000,
+    "1w": 604_800_000,
+}
+SECONDS_PER_YEAR = 365.25 * 24 * 3600
+
 def split_by_ratio(df: pd.DataFrame, train=0.6, test=0.2):
     n = len(df)
     i_train = int(n * train)
@@ -22,9 +31,38 @@ def max_drawdown(equity: pd.Series) -> float:
     dd = equity / roll_max - 1.0
     return float(dd.min())
 
-def _ann_factor_from_index(idx: pd.DatetimeIndex) -> float:
-    # datos horarios -> 24*365.25 periodos/año
-    return np.sqrt(24 * 365.25)
+# Muestra de marcas usada para estimar el espaciado típico de las velas
+ANN_SAMPLE = 1024
+
+def bar_seconds(idx) -> float:
+    """
+    Espaciado típico (mediana) entre velas, en segundos, estimado sobre las primeras
+    ANN_SAMPLE marcas. Acepta DatetimeIndex, datetime64 o int64 en ns. NaN si no se puede.
+    """
+    if idx is None or len(idx) < 2:
+        return float("nan")
+    if isinstance(idx, pd.Index) and not isinstance(idx, pd.DatetimeIndex):
+        return float("nan")     # RangeIndex u otro índice sin tiempo
+    head = np.asarray(idx[:ANN_SAMPLE])
+    if np.issubdtype(head.dtype, np.datetime64):
+        ns = head.astype("datetime64[ns]").view(np.int64)
+    elif np.issubdtype(head.dtype, np.integer):
+        ns = head.astype(np.int64)
+    else:
+        try:
+            ns = pd.DatetimeIndex(head).as_unit("ns").asi8
+        except (TypeError, ValueError):
+            return float("nan")
+    step = float(np.median(np.diff(ns))) / 1e9
+    return step if step > 0 else float("nan")
+
+def _ann_factor_from_index(idx) -> float:
+    # sqrt(periodos por año) según el espaciado real; 1h -> sqrt(24*365.25) exacto.
+    # Sin marcas utilizables se asumen velas horarias (comportamiento histórico).
+    step = bar_seconds(idx)
+    if np.isnan(step):
+        return np.sqrt(24 * 365.25)
+    return np.sqrt(SECONDS_PER_YEAR / step)
 
 def sharpe_ratio(equity: pd.Series, rf: float = 0.0) -> float:
     rets = equity.pct_change().dropna()
@@ -48,6 +86,125 @@ def calmar_ratio(equity: pd.Series) -> float:
         return np.nan
     return float(cagr / abs(mdd))
 
+# ===== Métricas en una sola pasada =====
+
+def _span_years(timestamps) -> float:
+    """Años entre la primera y la última marca (DatetimeIndex, datetime64 o int64 ns)."""
+    if len(timestamps) < 2:
+        return 0.0
+    t0, t1 = pd.Timestamp(timestamps[0]), pd.Timestamp(timestamps[-1])
+    return (t1 - t0).total_seconds() / SECONDS_PER_YEAR
+
+def compute_all_metrics(equity, timestamps, rf: float = 0.0) -> dict:
+    """
+    CAGR, MaxDD, Sharpe, Sortino y Calmar en una pasada NumPy, con las mismas
+    definiciones que cagr_from_equity, max_drawdown, sharpe_ratio, sortino_ratio y calmar_ratio.
+    - equity: arreglo (N,) o (K, N) (una curva por fila); timestamps: N marcas de tiempo.
+    Con entrada 1-D devuelve floats; con 2-D, arreglos de tamaño K.
+    """
+    eq = np.asarray(equity, dtype=np.float64)
+    n = eq.shape[-1]
+    nan = np.full(eq.shape[:-1], np.nan)
+    years = _span_years(timestamps)
+    ann = _ann_factor_from_index(timestamps)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        start, end = eq[..., 0], eq[..., -1]
+        if n >= 2 and years > 0:
+            cagr = np.where(start > 0, (end / start) ** (1 / years) - 1, np.nan)
+        else:
+            cagr = nan
+
+        peak = np.maximum.accumulate(eq, axis=-1)
+        mdd = (eq / peak - 1.0).min(axis=-1)
+
+        rets = eq[..., 1:] / eq[..., :-1] - 1.0
+        n_rets = rets.shape[-1]
+        mean = rets.mean(axis=-1) if n_rets else nan
+        sd = rets.std(axis=-1, ddof=1) if n_rets > 1 else nan
+
+        neg = rets < 0
+        k = neg.sum(axis=-1)
+        d_mean = np.where(neg, rets, 0.0).sum(axis=-1) / k
+        d_dev = np.where(neg, rets - d_mean[..., None], 0.0)
+        d_sd = np.sqrt((d_dev * d_dev).sum(axis=-1) / (k - 1))
+        d_sd = np.where(k > 1, d_sd, np.nan)
+
+        sharpe = np.where((sd == 0) | (n_rets == 0), np.nan, (mean - rf) / sd * ann)
+        sortino = np.where((d_sd == 0) | (n_rets == 0), np.nan, (mean - rf) / d_sd * ann)
+        calmar = np.where((mdd == 0) | np.isnan(cagr) | np.isnan(mdd), np.nan, cagr / np.abs(mdd))
+
+    out = {"final_equity": end, "CAGR": cagr, "MaxDD": mdd,
+           "Sharpe": sharpe, "Sortino": sortino, "Calmar": calmar}
+    if eq.ndim == 1:
+        out = {k: float(v) for k, v in out.items()}
+    return out
+
+class MetricsAccumulator:
+    """
+    Métricas incrementales para consumidores vela a vela (sin guardar la curva):
+    pico y drawdown corrientes, media/varianza de retornos (Welford) y varianza a la baja.
+    push() es O(1) y no crea objetos; result() aplica las mismas reglas que compute_all_metrics.
+    """
+    __slots__ = ("n", "first", "last", "peak", "mdd",
+                 "k", "mean", "m2", "kd", "d_mean", "d_m2")
+
+    def __init__(self):
+        self.n = 0
+        self.first = self.last = self.peak = np.nan
+        self.mdd = np.nan
+        self.k = 0
+        self.mean = self.m2 = 0.0
+        self.kd = 0
+        self.d_mean = self.d_m2 = 0.0
+
+    def push(self, value: float):
+        if self.n == 0:
+            self.first = self.peak = value
+            self.mdd = value / value - 1.0
+        else:
+            r = value / self.last - 1.0
+            self.k += 1
+            delta = r - self.mean
+            self.mean += delta / self.k
+            self.m2 += delta * (r - self.mean)
+            if r < 0:
+                self.kd += 1
+                delta = r - self.d_mean
+                self.d_mean += delta / self.kd
+                self.d_m2 += delta * (r - self.d_mean)
+            if value > self.peak:
+                self.peak = value
+            dd = value / self.peak - 1.0
+            if dd < self.mdd:
+                self.mdd = dd
+        self.last = value
+        self.n += 1
+
+    def result(self, start_time, end_time, bar_s: float = None, rf: float = 0.0) -> dict:
+        """
+        start_time/end_time: primera y última marca de tiempo de la curva.
+        bar_s: segundos entre velas para anualizar Sharpe/Sortino; por defecto
+        (end_time - start_time) / (n - 1), que en series regulares coincide con bar_seconds().
+        """
+        nan = float("nan")
+        span = (pd.Timestamp(end_time) - pd.Timestamp(start_time)).total_seconds()
+        years = span / SECONDS_PER_YEAR
+        cagr = nan
+        if self.n >= 2 and years > 0 and self.first > 0:
+            cagr = (self.last / self.first) ** (1 / years) - 1
+        if bar_s is None:
+            bar_s = span / (self.n - 1) if self.n >= 2 else nan
+        ann = np.sqrt(SECONDS_PER_YEAR / bar_s) if bar_s > 0 else nan
+        sd = np.sqrt(self.m2 / (self.k - 1)) if self.k > 1 else nan
+        d_sd = np.sqrt(self.d_m2 / (self.kd - 1)) if self.kd > 1 else nan
+        sharpe = nan if (sd == 0 or self.k == 0) else (self.mean - rf) / sd * ann
+        sortino = nan if (d_sd == 0 or self.k == 0) else (self.mean - rf) / d_sd * ann
+        mdd = float(self.mdd)
+        calmar = nan if (mdd == 0 or np.isnan(cagr) or np.isnan(mdd)) else cagr / abs(mdd)
+        return {"final_equity": float(self.last), "CAGR": float(cagr), "MaxDD": mdd,
+                "Sharpe": float(sharpe), "Sortino": float(sortino), "Calmar": float(calmar)}
+
 def returns_table(equity: pd.Series, freq: str = "ME") -> pd.DataFrame:
     """
     Construye tabla de retornos para equity.
@@ -61,11 +218,25 @@ def returns_table(equity: pd.Series, freq: str = "ME") -> pd.DataFrame:
 
     # Fin de periodo sin FutureWarning (antes usabas 'M','Q','A')
     eq = equity.resample(freq).last()
-    ret = eq.pct_change().fillna(0.0)
+    return _returns_frame(eq, equity.index.name)
 
+def returns_tables(equity: pd.Series) -> dict:
+    """
+    Las tres tablas de returns_table ({"ME", "QE", "YE"}) con una sola pasada sobre la equity:
+    el último valor por mes se agrupa una vez y trimestres/años salen de esos cierres mensuales.
+    """
+    month = equity.resample("ME").last()
+    return {
+        "ME": _returns_frame(month, equity.index.name),
+        "QE": _returns_frame(month.resample("QE").last(), equity.index.name),
+        "YE": _returns_frame(month.resample("YE").last(), equity.index.name),
+    }
+
+def _returns_frame(eq: pd.Series, index_name) -> pd.DataFrame:
+    ret = eq.pct_change().fillna(0.0)
     out = pd.DataFrame(
         {"Return": ret, "Return_%": (ret * 100)},
         index=eq.index,
     )
-    out.index.name = equity.index.name or "Open time"
+    out.index.name = index_name or "Open time"
     return out
@@ -0,0 +1,194 @@
+# walkforward.py
+import gc
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+import pandas as pd
+import optuna
+from optimize import objective_factory
+from signals import compute_signal_arrays, warmup_bars
+from backtest import backtest_arrays, INITIAL_CASH
+from shared_frame import SharedFrame, attach_frame
+from utils import compute_all_metrics
+
+# ===== Walk-forward: ventanas train/OOS re-optimizadas =====
+SIGNAL_PARAMS = ("rsi_window", "rsi_low", "rsi_high", "sma_fast", "sma_slow",
+                 "macd_fast", "macd_slow", "macd_signal")
+
+def make_windows(index: pd.DatetimeIndex, train_months: int = 12, test_months: int = 1,
+                 step_months: int = 1, anchored: bool = False) -> list:
+    """
+    Ventanas [train_start, train_end) + [test_start, test_end) sobre el rango del índice.
+    - rolling: el train de largo fijo avanza step_months por ventana.
+    - anchored: el train siempre empieza al inicio de los datos y crece step_months.
+    Sólo se generan ventanas con el tramo OOS completo.
+    """
+    first, last = index[0], index[-1]
+    windows = []
+    i = 0
+    while True:
+        shift = pd.DateOffset(months=step_months * i)
+        train_start = first if anchored else first + shift
+        train_end = first + pd.DateOffset(months=train_months) + shift
+        test_end = train_end + pd.DateOffset(months=test_months)
+        if test_end > last:
+            break
+        windows.append({"window": i, "train_start": train_start, "train_end": train_end,
+                        "test_start": train_end, "test_end": test_end})
+        i += 1
+    return windows
+
+def _warm_worker():
+    """
+    Inicializador del pool: scipy.signal y ta se importan perezosamente en signals; sin esto
+    la primera ventana de cada worker paga la importación dentro de optimize_s/oos_s.
+    """
+    import scipy.signal  # noqa: F401
+    import ta  # noqa: F401
+
+def _window_worker(spec: dict, window: dict, seeds: list, n_trials: int, seed: int,
+                   n_startup_trials: int, top_k: int, objective_kwargs: dict) -> dict:
+    """Optimiza una ventana sobre su train y evalúa los mejores parámetros en su tramo OOS."""
+    optuna.logging.set_verbosity(optuna.logging.WARNING)    # un log por trial y ventana es ruido
+    df, handles = attach_frame(spec)
+    try:
+        idx = df.index
+        a, b = idx.searchsorted(window["train_start"]), idx.searchsorted(window["train_end"])
+        c = idx.searchsorted(window["test_end"])
+
+        # 1) Estudio en memoria, arrancado con los mejores trials de la ventana previa
+        t0 = time.perf_counter()
+        study = optuna.create_study(
+            direction="maximize",
+            sampler=optuna.samplers.TPESampler(seed=seed + window["window"]),
+            pruner=optuna.pruners.MedianPruner(n_startup_trials=n_startup_trials),
+        )
+        for params in seeds:
+            study.enqueue_trial(params, skip_if_exists=True)
+        study.optimize(objective_factory(df.iloc[a:b], **objective_kwargs), n_trials=n_trials)
+        optimize_s = time.perf_counter() - t0
+
+        complete = [t for t in study.trials if t.state == optuna.trial.TrialState.COMPLETE]
+        if not complete:
+            return {**window, "optimize_s": optimize_s, "oos_s": 0.0, "n_trials": len(study.trials),
+                    "best_value": np.nan, "best_params": None, "top_params": [],
+                    "equity": None, "oos": {}}
+        top = sorted(complete, key=lambda t: t.value, reverse=True)[:top_k]
+        p = top[0].params
+
+        # 2) OOS: señales con historia previa suficiente para que sean válidas desde test_start
+        t0 = time.perf_counter()
+        warm = warmup_bars(p["rsi_window"], p["sma_fast"], p["sma_slow"], p["macd_slow"], p["macd_signal"])
+        ctx = df.iloc[max(b - warm, 0):c]
+        sig = compute_signal_arrays(ctx["Close"].to_numpy(), *(p[k] for k in SIGNAL_PARAMS))
+        lo = b - max(b - warm, 0) - sig.start
+        equity, metrics = backtest_arrays(ctx, sig, p["sl"], p["tp"], p["n_shares"], lo=max(lo, 0))
+        oos_s = time.perf_counter() - t0
+
+        result = {
+            **window,
+            "optimize_s": optimize_s,
+            "oos_s": oos_s,
+            "n_trials": len(study.trials),
+            "best_value": float(top[0].value),
+            "best_params": dict(p),
+            "top_params": [dict(t.params) for t in top],
+            "equity": equity.copy(),       # copia: no debe apuntar a la memoria compartida
+            "oos": metrics,
+        }
+        del study, df, ctx, sig, equity
+        return result
+    finally:
+        gc.collect()
+        for shm in handles:
+            try:
+                shm.close()
+            except BufferError:
+                pass
+
+def stitch_equity(curves: list, initial_cash: float = INITIAL_CASH) -> pd.Series:
+    """
+    Une las curvas OOS (cada una arranca en initial_cash) en una sola, componiendo el capital:
+    cada tramo se escala por la equity final del anterior. Si hay solapes, manda la ventana posterior
+    a partir del final de la anterior.
+    """
+    parts = []
+    level, last_t = initial_cash, None
+    for eq in curves:
+        if eq is None or eq.empty:
+            continue
+        base = initial_cash
+        if last_t is not None:
+            before = eq[eq.index <= last_t]
+            if len(before):
+                base = float(before.iloc[-1])
+            eq = eq[eq.index > last_t]
+            if eq.empty:
+                continue
+        part = eq * (level / base)
+        parts.append(part)
+        level, last_t = float(part.iloc[-1]), part.index[-1]
+    if not parts:
+        return pd.Series(dtype=np.float64, name="Equity")
+    return pd.concat(parts).rename("Equity")
+
+def run_walkforward(df: pd.DataFrame, train_months: int = 12, test_months: int = 1,
+                    step_months: int = 1, anchored: bool = False, n_trials: int = 30,
+                    n_workers=None, seed: int = 42, top_k: int = 5,
+                    n_startup_trials: int = 10, **objective_kwargs):
+    """
+    Re-optimiza cada ventana en un pool de procesos (df publicado una vez en memoria compartida).
+    Warm start: al lanzar una ventana se encolan los top_k trials de la ventana previa más
+    cercana ya terminada (con 1 worker, siempre la inmediatamente anterior).
+    Devuelve (tabla de resultados por ventana, equity OOS unida, métricas de la curva unida).
+    """
+    windows = make_windows(df.index, train_months, test_months, step_months, anchored)
+    if not windows:
+        raise ValueError("no hay datos suficientes para ninguna ventana")
+    n_workers = n_workers or os.cpu_count() or 1
+
+    done = {}
+    warm_from = {}
+    t_start = time.perf_counter()
+    with SharedFrame(df) as shared, \
+            ProcessPoolExecutor(max_workers=n_workers, initializer=_warm_worker) as pool:
+        pending = list(range(len(windows)))
+        running = {}
+        while pending or running:
+            while pending and len(running) < n_workers:
+                w = pending.pop(0)
+                prev = max((j for j in done if j < w), default=None)
+                warm_from[w] = prev
+                seeds = done[prev]["top_params"] if prev is not None else []
+                fut = pool.submit(_window_worker, shared.spec, windows[w], seeds, n_trials,
+                                  seed, n_startup_trials, top_k, objective_kwargs)
+                running[fut] = w
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                done[running.pop(fut)] = fut.result()
+    wall_s = time.perf_counter() - t_start
+
+    rows, curves = [], []
+    for w in range(len(windows)):
+        r = done[w]
+        row = {k: r[k] for k in ("window", "train_start", "train_end", "test_start", "test_end")}
+        row["warm_start_from"] = warm_from[w] if warm_from[w] is not None else -1
+        row["n_trials"] = r["n_trials"]
+        row["best_value"] = r["best_value"]
+        for k, v in (r["best_params"] or {}).items():
+            row[k] = v
+        for k in ("CAGR", "MaxDD", "Sharpe", "Calmar", "Trades"):
+            row[f"oos_{k}"] = r["oos"].get(k, np.nan)
+        row["optimize_s"] = r["optimize_s"]
+        row["oos_s"] = r["oos_s"]
+        rows.append(row)
+
+        curves.append(r["equity"])
+
+    results = pd.DataFrame(rows)
+    stitched = stitch_equity(curves)
+    metrics = compute_all_metrics(stitched.to_numpy(), stitched.index) if len(stitched) > 1 else {}
+    metrics["windows"] = len(windows)
+    metrics["wall_s"] = wall_s
+    return results, stitched, metrics